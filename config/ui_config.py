@@ -1,14 +1,12 @@
-from PyQt5.QtGui import QColor
-
-# Colors
+# Colors as RGB tuples (wrapped in QColor by the GUI, so this module loads without Qt)
 COLORS = {
     'dial_gradient': {
-        'start': QColor(255, 50, 50),    # Red
-        'middle': QColor(255, 255, 50),  # Yellow
-        'end': QColor(255, 50, 50)       # Red
+        'start': (255, 50, 50),    # Red
+        'middle': (255, 255, 50),  # Yellow
+        'end': (255, 50, 50)       # Red
     },
-    'dial_indicator': QColor(255, 255, 255),  # White
-    'text': QColor(0, 0, 0),             # Black
+    'dial_indicator': (255, 255, 255),  # White
+    'text': (0, 0, 0),             # Black
 }
 
 # Text Labels
@@ -28,7 +26,10 @@ LABELS = {
         'midi_output': 'Use MIDI Output',
         'midi_port': 'MIDI Port:',
         'no_midi_ports': 'No MIDI ports available',
-        'play_scale': 'Play Scale'
+        'play_scale': 'Play Scale',
+        'stop': 'Stop',
+        'analysis': 'Live Analysis',
+        'profile': 'Capture Profile'
     }
 }
 
@@ -85,5 +86,14 @@ PLOT = {
     'labels': {
         'x': 'Note Index',
         'y': 'Frequency (Hz)'
+    },
+    'analysis': {
+        'figsize': (8, 3),
+        'scope_label': 'Time (ms)',
+        'spectrum_label': 'Frequency (Hz)',
+        'level_label': 'Level (dBFS)',
+        'min_db': -100,
+        'marker_alpha': 0.4,
+        'refresh_hz': 30
     }
 }
@@ -0,0 +1,184 @@
+import inspect
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+DEFAULT_FFT_SIZE = 4096
+DEFAULT_DISPLAY_BINS = 512
+DEFAULT_SCOPE_SIZE = 1024
+DEFAULT_RATE = 30.0
+MIN_DB = -120.0
+
+# numpy >= 2.0 can write the FFT into a preallocated array
+_RFFT_HAS_OUT = 'out' in inspect.signature(np.fft.rfft).parameters
+
+
+class RingBuffer:
+    """
+    Fixed-size circular buffer of the most recent audio samples.
+
+    write() is called from the audio callback and only copies into the
+    preallocated storage; latest() copies the newest samples out in order.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._position = 0
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def write(self, samples: np.ndarray):
+        samples = samples[-self.capacity:]
+        count = len(samples)
+        with self._lock:
+            end = self._position + count
+            if end <= self.capacity:
+                self._data[self._position:end] = samples
+            else:
+                split = self.capacity - self._position
+                self._data[self._position:] = samples[:split]
+                self._data[:count - split] = samples[split:]
+            self._position = end % self.capacity
+            self.written += count
+
+    def latest(self, out: np.ndarray) -> np.ndarray:
+        """Copy the len(out) newest samples into out, oldest first."""
+        count = len(out)
+        with self._lock:
+            start = (self._position - count) % self.capacity
+            if start + count <= self.capacity:
+                out[:] = self._data[start:start + count]
+            else:
+                split = self.capacity - start
+                out[:split] = self._data[start:]
+                out[split:] = self._data[:count - split]
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._data[:] = 0
+            self._position = 0
+
+
+def log_bin_edges(fft_size: int, sample_rate: int, display_bins: int,
+                  min_frequency: float = 20.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group FFT bins into at most display_bins log-spaced display bins.
+
+    Returns:
+        (start index of every display bin in the rfft output, centre frequency of every display bin)
+    """
+    bin_width = sample_rate / fft_size
+    num_bins = fft_size // 2 + 1
+    frequencies = np.geomspace(min_frequency, sample_rate / 2, display_bins + 1)
+    edges = np.unique(np.clip(np.round(frequencies / bin_width).astype(np.int64), 1, num_bins - 1))
+    centres = np.sqrt(np.maximum(edges[:-1], 1) * edges[1:]) * bin_width
+    return edges[:-1], centres
+
+
+class SpectrumAnalyzer:
+    """
+    Windowed FFT and oscilloscope trace of the newest samples of a RingBuffer.
+
+    Every buffer (window, FFT input and output, magnitudes, display arrays)
+    is allocated once, so analyze() costs the same fixed amount whatever the
+    audio and does not allocate per frame. The spectrum is reduced to
+    log-spaced display bins by taking the peak of the FFT bins in each.
+    """
+
+    def __init__(self, sample_rate: int = 44100, fft_size: int = DEFAULT_FFT_SIZE,
+                 display_bins: int = DEFAULT_DISPLAY_BINS, scope_size: int = DEFAULT_SCOPE_SIZE):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.scope_size = scope_size
+        self.ring = RingBuffer(max(fft_size, scope_size) * 2)
+
+        self._window = np.hanning(fft_size).astype(np.float32)
+        # Full scale sine -> 0 dB
+        self._scale = 2.0 / self._window.sum()
+        self._frame = np.empty(fft_size, dtype=np.float32)
+        self._fft = np.empty(fft_size // 2 + 1, dtype=np.complex64)
+        self._magnitude = np.empty(fft_size // 2 + 1, dtype=np.float32)
+        self._edges, self.frequencies = log_bin_edges(fft_size, sample_rate, display_bins)
+        self.spectrum = np.full(len(self._edges), MIN_DB, dtype=np.float32)
+        self.scope = np.zeros(scope_size, dtype=np.float32)
+        self.scope_time = np.arange(scope_size, dtype=np.float32) / sample_rate * 1000.0
+
+    def analyze(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Refresh the oscilloscope trace and the spectrum from the ring buffer.
+
+        Returns:
+            (scope, spectrum in dBFS), both reused on the next call
+        """
+        self.ring.latest(self._frame)
+        self.scope[:] = self._frame[-self.scope_size:]
+
+        np.multiply(self._frame, self._window, out=self._frame)
+        if _RFFT_HAS_OUT:
+            np.fft.rfft(self._frame, out=self._fft)
+        else:
+            self._fft[:] = np.fft.rfft(self._frame)
+        np.abs(self._fft, out=self._magnitude)
+        np.maximum.reduceat(self._magnitude, self._edges, out=self.spectrum)
+        np.multiply(self.spectrum, self._scale, out=self.spectrum)
+        np.maximum(self.spectrum, 10 ** (MIN_DB / 20), out=self.spectrum)
+        np.log10(self.spectrum, out=self.spectrum)
+        np.multiply(self.spectrum, 20.0, out=self.spectrum)
+        return self.scope, self.spectrum
+
+
+class AnalysisThread:
+    """
+    Run a SpectrumAnalyzer at a fixed rate on a background thread.
+
+    Frames are only computed when new audio arrived, so an idle stream costs
+    nothing. Results are published by copying into a second pair of arrays
+    under a lock; read() copies them into the caller's arrays, so neither
+    side ever sees a half-written frame.
+    """
+
+    def __init__(self, analyzer: SpectrumAnalyzer, rate: float = DEFAULT_RATE):
+        self.analyzer = analyzer
+        self.interval = 1.0 / rate
+        self.frame = 0
+        self._scope = analyzer.scope.copy()
+        self._spectrum = analyzer.spectrum.copy()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='SpectrumAnalyzer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        ring = self.analyzer.ring
+        seen = ring.written
+        while not self._stop.wait(self.interval):
+            if ring.written == seen:
+                continue
+            seen = ring.written
+            scope, spectrum = self.analyzer.analyze()
+            with self._lock:
+                self._scope[:] = scope
+                self._spectrum[:] = spectrum
+                self.frame += 1
+
+    def read(self, scope: np.ndarray, spectrum: np.ndarray) -> int:
+        """Copy the latest frame into scope and spectrum; returns its frame number."""
+        with self._lock:
+            scope[:] = self._scope
+            spectrum[:] = self._spectrum
+            return self.frame
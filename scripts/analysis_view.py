@@ -0,0 +1,123 @@
+import threading
+from typing import Optional
+
+import numpy as np
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from analysis import AnalysisThread, SpectrumAnalyzer
+from scale_plot import import_matplotlib
+from config.ui_config import PLOT
+
+
+class AnalysisPanel(QWidget):
+    """
+    Oscilloscope and spectrum of the audio being played, with the scale's
+    expected frequencies marked on the spectrum.
+
+    Playback feeds samples into `ring` (see gui_workers.play_buffer); the FFT
+    runs on an AnalysisThread, and a GUI timer copies finished frames into
+    the two traces and blits them. Like ScalePlot, matplotlib is imported in
+    the background and the canvas is built when it is ready.
+    """
+    ready = pyqtSignal()
+
+    def __init__(self, sample_rate: int = 44100, parent=None):
+        super().__init__(parent)
+        self.analyzer = SpectrumAnalyzer(sample_rate)
+        self.ring = self.analyzer.ring
+        self.thread = AnalysisThread(self.analyzer, PLOT['analysis']['refresh_hz'])
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self.figure = None
+        self.canvas = None
+        self._frame = 0
+        self._background = None
+        self._expected: Optional[np.ndarray] = None
+        # Display copies of the latest frame, filled in place by AnalysisThread.read
+        self._scope = self.analyzer.scope.copy()
+        self._spectrum = self.analyzer.spectrum.copy()
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / PLOT['analysis']['refresh_hz']))
+        self.timer.timeout.connect(self._refresh)
+        self.ready.connect(self._build)
+        threading.Thread(target=self._prewarm, name='AnalysisPanelImport', daemon=True).start()
+
+    def _prewarm(self):
+        import_matplotlib()
+        self.ready.emit()
+
+    def _build(self):
+        from matplotlib.collections import LineCollection
+
+        settings = PLOT['analysis']
+        Figure, FigureCanvas = import_matplotlib()
+        self.figure = Figure(figsize=settings['figsize'])
+        self.canvas = FigureCanvas(self.figure)
+        self._layout.addWidget(self.canvas)
+
+        scope_axes, spectrum_axes = self.figure.subplots(1, 2, gridspec_kw={'width_ratios': (1, 2)})
+        scope_axes.set_xlim(0, self.analyzer.scope_time[-1])
+        scope_axes.set_ylim(-1.1, 1.1)
+        scope_axes.set_xlabel(settings['scope_label'])
+        scope_axes.grid(True, alpha=PLOT['grid_alpha'])
+        self._scope_line, = scope_axes.plot(self.analyzer.scope_time, self._scope, lw=1, animated=True)
+
+        spectrum_axes.set_xscale('log')
+        spectrum_axes.set_xlim(self.analyzer.frequencies[0], self.analyzer.sample_rate / 2)
+        spectrum_axes.set_ylim(settings['min_db'], 0)
+        spectrum_axes.set_xlabel(settings['spectrum_label'])
+        spectrum_axes.set_ylabel(settings['level_label'])
+        spectrum_axes.grid(True, alpha=PLOT['grid_alpha'])
+        self._markers = LineCollection([], colors='C3', linestyles='dashed', alpha=settings['marker_alpha'])
+        spectrum_axes.add_collection(self._markers)
+        self._spectrum_line, = spectrum_axes.plot(self.analyzer.frequencies, self._spectrum, lw=1, animated=True)
+
+        self._axes = (scope_axes, spectrum_axes)
+        self.figure.tight_layout()
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        if self._expected is not None:
+            self.set_expected_frequencies(self._expected)
+
+    def set_expected_frequencies(self, frequencies: np.ndarray):
+        """Mark the frequencies the scale should produce on the spectrum."""
+        self._expected = frequencies
+        if self.canvas is None:
+            return
+        bottom, top = PLOT['analysis']['min_db'], 0
+        self._markers.set_segments([((f, bottom), (f, top)) for f in np.asarray(frequencies).tolist()])
+        # The markers are part of the background, so it has to be redrawn
+        self.canvas.draw_idle()
+
+    def start(self):
+        """Begin analysing whatever is written to the ring buffer."""
+        self.ring.clear()
+        self.thread.start()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.thread.stop()
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_traces()
+
+    def _draw_traces(self):
+        self._axes[0].draw_artist(self._scope_line)
+        self._axes[1].draw_artist(self._spectrum_line)
+
+    def _refresh(self):
+        if self.canvas is None or self._background is None:
+            return
+        frame = self.thread.read(self._scope, self._spectrum)
+        if frame == self._frame:
+            return
+        self._frame = frame
+        # The lines reference the display arrays, which were updated in place
+        self._scope_line.set_ydata(self._scope)
+        self._spectrum_line.set_ydata(self._spectrum)
+        self.canvas.restore_region(self._background)
+        self._draw_traces()
+        self.canvas.blit(self.figure.bbox)
@@ -0,0 +1,73 @@
+# python scripts/benchmark_render.py
+
+import time
+import numpy as np
+from microtonal import Scale, Synthesizer
+from wavetable import WavetableOscillator
+
+
+def legacy_play_scale(synth: Synthesizer, scale: Scale, note_duration: float = 0.5, waveform: str = 'sine') -> np.ndarray:
+    """Original play_scale audio path: concatenate inside the per-note loop."""
+    waveform_data = np.array([])
+    for note in scale.notes:
+        note_wave = synth.generate_wave(note.frequency, note_duration, waveform)
+        silence = np.zeros(int(0.1 * synth.sample_rate))
+        waveform_data = np.concatenate([waveform_data, note_wave, silence])
+    return waveform_data
+
+
+def best_time(func, repeats: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(cases=((12, 1), (24, 1), (53, 1), (53, 4)), waveform: str = 'sine', note_duration: float = 0.5):
+    synth = Synthesizer()
+    print(f"{'scale':>14} {'notes':>6} {'legacy (s)':>11} {'float64 (s)':>12} {'float32 (s)':>12} {'speedup':>8}")
+    for divisions, octaves in cases:
+        scale = Scale().generate_equal_temperament(divisions, octaves)
+
+        reference = legacy_play_scale(synth, scale, note_duration, waveform)
+        rendered = synth.play_scale(scale, note_duration, waveform)
+        assert np.array_equal(reference, rendered), "renderer output differs from legacy path"
+
+        legacy = best_time(lambda: legacy_play_scale(synth, scale, note_duration, waveform))
+        batched = best_time(lambda: synth.play_scale(scale, note_duration, waveform))
+        batched32 = best_time(lambda: synth.play_scale(scale, note_duration, waveform, dtype=np.float32))
+        name = f"{divisions}-EDO x{octaves}"
+        print(f"{name:>14} {len(scale):>6} {legacy:>11.4f} {batched:>12.4f} {batched32:>12.4f} {legacy / batched:>7.1f}x")
+
+
+def additive_wave(frequency: float, num_samples: int, waveform: str, sample_rate: int) -> np.ndarray:
+    """Band-limited reference: sum every harmonic below Nyquist with np.sin."""
+    t = np.arange(num_samples) / sample_rate
+    out = np.zeros(num_samples)
+    step = 2 if waveform == 'square' else 1
+    for k in range(1, int(sample_rate / 2 // frequency) + 1, step):
+        sign = -1 if waveform == 'sawtooth' and k % 2 == 0 else 1
+        out += sign * np.sin(2 * np.pi * k * frequency * t) / k
+        if waveform == 'sine':
+            break
+    return out
+
+
+def run_oscillator_benchmark(frequencies=(110.0, 440.0, 1760.0), duration: float = 1.0, sample_rate: int = 44100):
+    synth = Synthesizer(sample_rate)
+    num_samples = int(sample_rate * duration)
+    print(f"\n{'waveform':>9} {'freq':>7} {'naive (s)':>10} {'wavetable (s)':>14} {'additive (s)':>13}")
+    for waveform in ('sine', 'sawtooth', 'square'):
+        for frequency in frequencies:
+            oscillator = WavetableOscillator(waveform, sample_rate)
+            naive = best_time(lambda: synth.generate_wave(frequency, duration, waveform))
+            table = best_time(lambda: oscillator.render(frequency, num_samples))
+            additive = best_time(lambda: additive_wave(frequency, num_samples, waveform, sample_rate))
+            print(f"{waveform:>9} {frequency:>7.0f} {naive:>10.4f} {table:>14.4f} {additive:>13.4f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
+    run_oscillator_benchmark()
@@ -0,0 +1,349 @@
+# python scripts/benchmark_suite.py [--quick] [--save-baseline] [--threshold 0.2]
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from microtonal import Scale, Synthesizer
+from midi_output import MemoryOutputPort, MIDIOutput
+from midi_tuning import MicrotonalMIDI
+from render import ScaleRenderer
+
+BASELINE_PATH = Path(__file__).parent.parent / 'benchmarks' / 'baseline.json'
+DEFAULT_THRESHOLD = 0.2
+
+WAVEFORMS = ('sine', 'sawtooth', 'square')
+SAMPLE_RATES = (22050, 44100, 96000)
+DURATIONS = (0.05, 0.5)
+NOTE_COUNTS = (5, 50, 500, 5000)
+MIDI_NOTE_COUNTS = (50, 5000)
+
+# Cases rendering more samples than this are skipped (5000 notes at 96 kHz would need gigabytes)
+MAX_CASE_SAMPLES = 40_000_000
+# Start-up checks run in a fresh interpreter: (label, code, modules the code must not load)
+GUI_AND_AUDIO = ('PyQt5', 'matplotlib', 'sounddevice')
+IMPORT_CHECKS = (
+    ('import microtonal', "import microtonal", GUI_AND_AUDIO + ('mido',)),
+    ('list scales', "import play_microtonal; play_microtonal.main(['--list'])", GUI_AND_AUDIO),
+    ('import export_scales', "import export_scales", GUI_AND_AUDIO + ('mido',)),
+    ('render a scale', "import microtonal; microtonal.Synthesizer().play_scale("
+                       "microtonal.create_example_scales()['12-TET'], 0.05)", GUI_AND_AUDIO + ('mido',)),
+    ('import ui_config', "import config.ui_config", GUI_AND_AUDIO),
+)
+WATCHED_MODULES = ('PyQt5', 'matplotlib', 'sounddevice', 'mido', 'yaml')
+
+# Keep repeating a case until it has run this long, to smooth out timer noise
+MIN_CASE_TIME = 0.2
+MIN_REPEATS = 3
+# Fast cases are timed in batches of calls lasting at least this long each
+MIN_BATCH_TIME = 0.01
+# A case that looks slower than the baseline is measured again this many times before it counts
+REGRESSION_RETRIES = 2
+
+
+@dataclass
+class Case:
+    """One benchmark: `run` does `work` units of `unit` (samples, notes, messages)."""
+    name: str
+    group: str
+    unit: str
+    work: int
+    run: Callable[[], object]
+
+
+@dataclass
+class Result:
+    """
+    Timing of a case (best of several runs) and its memory use on one traced run.
+
+    peak_bytes is the tracemalloc peak above the starting level; allocations
+    counts the memory blocks the run left allocated (its result included).
+    """
+    name: str
+    group: str
+    unit: str
+    work: int
+    seconds: float
+    throughput: float
+    peak_bytes: int
+    allocations: int
+    baseline: Optional[float] = None
+    ratio: Optional[float] = None
+    regressed: bool = False
+
+
+def wave_cases(sample_rates=SAMPLE_RATES, durations=DURATIONS) -> List[Case]:
+    cases = []
+    for sample_rate in sample_rates:
+        synth = Synthesizer(sample_rate)
+        for waveform in WAVEFORMS:
+            for duration in durations:
+                cases.append(Case(f"generate_wave/{waveform}/{sample_rate}Hz/{duration}s", 'generate_wave',
+                                  'samples', int(sample_rate * duration),
+                                  lambda s=synth, w=waveform, d=duration: s.generate_wave(440.0, d, w)))
+    return cases
+
+
+def play_scale_cases(note_counts=NOTE_COUNTS, sample_rates=SAMPLE_RATES, durations=DURATIONS) -> List[Case]:
+    cases = []
+    for sample_rate in sample_rates:
+        synth = Synthesizer(sample_rate)
+        renderer = ScaleRenderer(sample_rate)
+        for count in note_counts:
+            # Spread the notes over ten octaves above 20 Hz whatever the count
+            scale = Scale().set_frequencies(20.0 * np.exp2(np.arange(count) * 10.0 / count))
+            for duration in durations:
+                samples = renderer.total_samples(count, duration)
+                if samples > MAX_CASE_SAMPLES:
+                    continue
+                for waveform in WAVEFORMS:
+                    cases.append(Case(f"play_scale/{count}/{waveform}/{sample_rate}Hz/{duration}s", 'play_scale',
+                                      'samples', samples,
+                                      lambda s=synth, sc=scale, d=duration, w=waveform:
+                                      s.play_scale(sc, d, w, dtype=np.float32)))
+    return cases
+
+
+def scale_cases(note_counts=NOTE_COUNTS) -> List[Case]:
+    cases = []
+    for count in note_counts:
+        cases.append(Case(f"generate_equal_temperament/{count}", 'scale', 'notes', count,
+                          lambda c=count: Scale().generate_equal_temperament(c)))
+        cases.append(Case(f"generate_harmonic_series/{count}", 'scale', 'notes', count,
+                          lambda c=count: Scale().generate_harmonic_series(c)))
+        # Unmemoized density generator (the densities change on every call)
+        densities = iter(np.linspace(1.0, 2.0, 10 ** 7))
+        octaves = 5.0
+        cases.append(Case(f"generate_density/{count}", 'scale', 'notes', count,
+                          lambda c=count, it=densities:
+                          Scale().generate_density([next(it) * c / octaves, c / octaves], octaves)))
+    return cases
+
+
+def midi_cases(note_counts=MIDI_NOTE_COUNTS) -> List[Case]:
+    cases = []
+    for count in note_counts:
+        port = MemoryOutputPort()
+        output = MIDIOutput(port=port)
+
+        def send_notes(o=output, p=port, c=count):
+            p.messages.clear()
+            for i in range(c):
+                key = 36 + i % 60
+                o.send_note_on(key, 64)
+                o.send_note_off(key, 64)
+
+        cases.append(Case(f"midi_send/{count}", 'midi', 'messages', 2 * count, send_notes))
+
+        for mode in ('mpe', 'mts'):
+            scale = Scale().generate_equal_temperament(min(count, 120) // 2 or 1, 2)
+            tuner = MicrotonalMIDI(output, mode)
+            tuner.load_scale(scale)
+
+            def play_degrees(t=tuner, p=port, c=count, n=len(scale)):
+                p.messages.clear()
+                for i in range(c):
+                    t.note_on(i % n)
+                    t.note_off(i % n)
+
+            cases.append(Case(f"midi_{mode}/{count}", 'midi', 'notes', count, play_degrees))
+    return cases
+
+
+def build_cases(quick: bool = False) -> List[Case]:
+    if quick:
+        return (wave_cases((44100,), (0.5,)) + play_scale_cases((5, 500), (44100,), (0.05,))
+                + scale_cases((5, 500)) + midi_cases((50,)))
+    return wave_cases() + play_scale_cases() + scale_cases() + midi_cases()
+
+
+def _time_batch(run: Callable[[], object], calls: int) -> float:
+    """Seconds taken by `calls` back-to-back runs, without garbage collection pauses."""
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def measure(case: Case) -> Result:
+    case.run()  # warm up caches and lazy imports
+    gc.collect()
+    # Grow the batch until one timing is long enough to trust (a single call for slow cases)
+    calls = 1
+    elapsed = _time_batch(case.run, calls)
+    while elapsed < MIN_BATCH_TIME:
+        calls *= 2
+        elapsed = _time_batch(case.run, calls)
+    repeats, total, best = 1, elapsed, elapsed / calls
+    # Best of the batches, however many it takes to fill MIN_CASE_TIME
+    while total < MIN_CASE_TIME or repeats < MIN_REPEATS:
+        elapsed = _time_batch(case.run, calls)
+        best = min(best, elapsed / calls)
+        total += elapsed
+        repeats += 1
+
+    # Memory is measured on a separate run: tracemalloc slows allocation down
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    result = case.run()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return Result(case.name, case.group, case.unit, case.work, best, case.work / best, peak - base, blocks)
+
+
+def measure_imports(checks=IMPORT_CHECKS) -> bool:
+    """
+    Time start-up paths in fresh interpreters and report the heavy modules they load.
+
+    Returns:
+        True if no check loaded a module it must not load
+    """
+    scripts = Path(__file__).parent
+    report = ("import json, sys, time; _start = time.perf_counter()\n{code}\n"
+              "print(json.dumps([time.perf_counter() - _start, "
+              "sorted(name for name in {watched} if name in sys.modules)]))")
+    ok = True
+    print(f"{'start-up path':<24} {'time (ms)':>10}  loaded")
+    for label, code, forbidden in checks:
+        script = f"import sys; sys.path[:0] = [{str(scripts)!r}, {str(scripts.parent)!r}]\n" + report.format(
+            code=code, watched=WATCHED_MODULES)
+        completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=scripts)
+        if completed.returncode:
+            print(f"{label:<24} {'failed':>10}  {completed.stderr.strip().splitlines()[-1]}")
+            ok = False
+            continue
+        seconds, loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+        unwanted = [name for name in loaded if name in forbidden]
+        flag = f"  UNWANTED: {', '.join(unwanted)}" if unwanted else ''
+        print(f"{label:<24} {seconds * 1000:>10.1f}  {', '.join(loaded) or '-'}{flag}")
+        ok = ok and not unwanted
+    return ok
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, float]]:
+    """Throughput per case name, or None if there is no readable baseline."""
+    try:
+        with open(path) as file:
+            return {entry['name']: entry['throughput'] for entry in json.load(file)['results']}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_results(results: List[Result], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': [asdict(result) for result in results],
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=1)
+
+
+def compare(results: List[Result], baseline: Dict[str, float], threshold: float):
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous:
+            result.baseline = previous
+            result.ratio = result.throughput / previous
+            result.regressed = result.ratio < 1.0 - threshold
+
+
+def format_rate(value: float) -> str:
+    for factor, suffix in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if value >= factor:
+            return f"{value / factor:.2f}{suffix}"
+    return f"{value:.1f}"
+
+
+def print_report(results: List[Result]):
+    print(f"{'case':<48} {'time (ms)':>10} {'throughput':>16} {'peak MB':>8} {'blocks':>7} {'vs base':>8}")
+    for result in results:
+        ratio = f"{result.ratio:.2f}x" if result.ratio is not None else '-'
+        flag = '  REGRESSION' if result.regressed else ''
+        print(f"{result.name:<48} {result.seconds * 1000:>10.3f} "
+              f"{format_rate(result.throughput) + ' ' + result.unit + '/s':>16} "
+              f"{result.peak_bytes / 1e6:>8.2f} {result.allocations:>7} {ratio:>8}{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark synthesis, scale generation and MIDI output "
+                                                 "(headless: no audio or MIDI device is used)")
+    parser.add_argument('--quick', action='store_true', help="Run a small subset of the cases")
+    parser.add_argument('--filter', default='', help="Only run cases whose name contains this text")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help="Baseline JSON to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail when throughput drops by more than this fraction of the baseline")
+    parser.add_argument('--output', type=Path, help="Also write the results to this JSON file")
+    parser.add_argument('--imports', action='store_true',
+                        help="Only time start-up paths and check they do not load Qt, matplotlib or sounddevice")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        return 0 if measure_imports() else 1
+
+    cases = [case for case in build_cases(args.quick) if args.filter in case.name]
+    results = []
+    for case in cases:
+        results.append(measure(case))
+    baseline = load_baseline(args.baseline)
+    compare(results, baseline or {}, args.threshold)
+    # Machine noise comes in bursts: only a slowdown that persists is reported
+    for _ in range(REGRESSION_RETRIES):
+        retry = [index for index, result in enumerate(results) if result.regressed]
+        for index in retry:
+            again = measure(cases[index])
+            if again.seconds < results[index].seconds:
+                results[index] = again
+        compare([results[index] for index in retry], baseline or {}, args.threshold)
+    print_report(results)
+
+    if args.output:
+        save_results(results, args.output)
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    # Without a baseline nothing was compared, so a pass would mean nothing
+    if baseline is None:
+        print(f"\nERROR: no baseline at {args.baseline}; nothing was compared. "
+              f"Record one on this machine with --save-baseline.", file=sys.stderr)
+        return 2
+    missing = [result.name for result in results if result.ratio is None]
+    if missing:
+        print(f"\nWARNING: {len(missing)} case(s) not in the baseline, not compared: {', '.join(missing)}",
+              file=sys.stderr)
+    regressions = [result for result in results if result.regressed]
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
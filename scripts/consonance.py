@@ -0,0 +1,299 @@
+import functools
+import math
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# Largest numerator/denominator of the just ratios intervals are compared with
+DEFAULT_LIMIT = 16
+# Harmonic partials of the complex tone assumed by the roughness model, and their decay
+DEFAULT_PARTIALS = 6
+PARTIAL_DECAY = 0.88
+
+# Sethares' fit of the Plomp-Levelt dissonance curve
+DSTAR = 0.24
+S1 = 0.0207
+S2 = 18.96
+B1 = 3.51
+B2 = 5.75
+
+# Partial pairs further apart than this (in units of the curve's scale s) are
+# treated as smooth in rank_scales: exp(-B1 x) has dropped below 1e-4 there
+ROUGHNESS_CUTOFF = math.log(1e4) / B1
+
+
+def _frozen(values: np.ndarray) -> np.ndarray:
+    values.setflags(write=False)
+    return values
+
+
+def interval_matrix(frequencies: np.ndarray) -> np.ndarray:
+    """Cents from every note (rows) to every other note (columns)."""
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    return 1200.0 * np.log2(frequencies[..., None, :] / frequencies[..., :, None])
+
+
+@functools.lru_cache(maxsize=16)
+def just_ratios(limit: int = DEFAULT_LIMIT) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduced ratios p/q from 1/1 to 2/1 with p and q at most limit, sorted by size.
+
+    Returns:
+        Read-only (numerators, denominators, cents)
+    """
+    q = np.arange(1, limit + 1)
+    p, q = np.meshgrid(q, q, indexing='ij')
+    keep = (p >= q) & (p <= 2 * q) & (np.gcd(p, q) == 1)
+    p, q = p[keep], q[keep]
+    cents = 1200.0 * np.log2(p / q)
+    order = np.argsort(cents)
+    return _frozen(p[order]), _frozen(q[order]), _frozen(cents[order])
+
+
+def nearest_just(cents: np.ndarray, limit: int = DEFAULT_LIMIT) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Closest just ratio to every interval of an array of any shape.
+
+    Intervals are compared by size (descending intervals as their ascending
+    counterpart) and octaves are carried over, so 1902 cents maps to 3/1.
+
+    Returns:
+        (numerators, denominators, deviation in cents of the interval from the ratio)
+    """
+    numerators, denominators, table = just_ratios(limit)
+    size = np.abs(np.asarray(cents, dtype=np.float64))
+    octaves = np.floor(size / 1200.0)
+    reduced = size - 1200.0 * octaves
+
+    upper = np.clip(np.searchsorted(table, reduced), 1, len(table) - 1)
+    lower = upper - 1
+    nearest = np.where(reduced - table[lower] <= table[upper] - reduced, lower, upper)
+    numerator = numerators[nearest] * np.exp2(octaves).astype(np.int64)
+    denominator = denominators[nearest]
+    # Keep the ratios reduced when an octave multiplies an even-denominator ratio
+    common = np.gcd(numerator, denominator)
+    return numerator // common, denominator // common, reduced - table[nearest]
+
+
+def harmonic_partials(frequencies: np.ndarray, num_partials: int = DEFAULT_PARTIALS,
+                      decay: float = PARTIAL_DECAY) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Partials of a harmonic complex tone on every note.
+
+    Returns:
+        (frequencies, amplitudes), each shaped frequencies.shape + (num_partials,)
+    """
+    harmonics = np.arange(1, num_partials + 1)
+    partials = np.asarray(frequencies, dtype=np.float64)[..., None] * harmonics
+    amplitudes = np.broadcast_to(decay ** (harmonics - 1), partials.shape)
+    return partials, amplitudes
+
+
+def sethares_dissonance(f1: np.ndarray, f2: np.ndarray, a1: np.ndarray, a2: np.ndarray) -> np.ndarray:
+    """Plomp-Levelt roughness of pairs of sine partials (Sethares' parametrization), broadcast."""
+    s = DSTAR / (S1 * np.minimum(f1, f2) + S2)
+    difference = np.abs(f2 - f1)
+    return np.minimum(a1, a2) * (np.exp(-B1 * s * difference) - np.exp(-B2 * s * difference))
+
+
+def roughness_matrix(frequencies: np.ndarray, num_partials: int = DEFAULT_PARTIALS,
+                     decay: float = PARTIAL_DECAY) -> np.ndarray:
+    """
+    Roughness of every pair of notes played together as harmonic complex tones.
+
+    All partial pairs are evaluated in one broadcast; the (notes, partials,
+    notes, partials) result is summed over the partial axes.
+    """
+    partials, amplitudes = harmonic_partials(frequencies, num_partials, decay)
+    d = sethares_dissonance(partials[:, :, None, None], partials[None, None, :, :],
+                            amplitudes[:, :, None, None], amplitudes[None, None, :, :])
+    matrix = d.sum(axis=(1, 3))
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
+
+
+def dissonance_curve(base_frequency: float, ratios: np.ndarray, num_partials: int = DEFAULT_PARTIALS,
+                     decay: float = PARTIAL_DECAY) -> np.ndarray:
+    """
+    Sethares dissonance curve: roughness of a tone against itself transposed by each ratio.
+
+    Args:
+        base_frequency: Frequency of the fixed tone
+        ratios: Array of transposition ratios (e.g. np.linspace(1, 2, 1000))
+
+    Returns:
+        Dissonance for each ratio (the fixed tone's own roughness is included)
+    """
+    partials, amplitudes = harmonic_partials(np.array([base_frequency]), num_partials, decay)
+    partials, amplitudes = partials[0], amplitudes[0]
+    moving = np.asarray(ratios, dtype=np.float64)[:, None] * partials
+    both = np.concatenate((np.broadcast_to(partials, moving.shape), moving), axis=1)
+    levels = np.concatenate((amplitudes, amplitudes))
+    d = sethares_dissonance(both[:, :, None], both[:, None, :], levels[:, None], levels[None, :])
+    return d.sum(axis=(1, 2)) / 2
+
+
+@dataclass(frozen=True)
+class ScaleAnalysis:
+    """
+    Pairwise interval metrics of a scale; all arrays are read-only.
+
+    Matrices are indexed [from note, to note].
+    """
+    frequencies: np.ndarray
+    cents: np.ndarray
+    just_numerators: np.ndarray
+    just_denominators: np.ndarray
+    just_deviation: np.ndarray
+    roughness: np.ndarray
+
+    @property
+    def total_roughness(self) -> float:
+        return float(np.triu(self.roughness, 1).sum())
+
+    @property
+    def mean_roughness(self) -> float:
+        """Average roughness per pair of notes (comparable across scale sizes)."""
+        n = len(self.frequencies)
+        return self.total_roughness / (n * (n - 1) / 2) if n > 1 else 0.0
+
+    @property
+    def mean_just_deviation(self) -> float:
+        """Average absolute distance in cents of every interval from its nearest just ratio."""
+        n = len(self.frequencies)
+        if n < 2:
+            return 0.0
+        return float(np.abs(self.just_deviation[np.triu_indices(n, 1)]).mean())
+
+    def steps_from_root(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(cents, numerators, denominators, deviation) of every note above the first."""
+        return self.cents[0], self.just_numerators[0], self.just_denominators[0], self.just_deviation[0]
+
+
+@functools.lru_cache(maxsize=256)
+def _analyze(frequencies: bytes, limit: int, num_partials: int, decay: float) -> ScaleAnalysis:
+    frequencies = np.frombuffer(frequencies, dtype=np.float64)
+    cents = interval_matrix(frequencies)
+    numerators, denominators, deviation = nearest_just(cents, limit)
+    roughness = roughness_matrix(frequencies, num_partials, decay)
+    return ScaleAnalysis(frequencies, *(_frozen(values) for values in
+                                        (cents, numerators, denominators, deviation, roughness)))
+
+
+def analyze_scale(scale, limit: int = DEFAULT_LIMIT, num_partials: int = DEFAULT_PARTIALS,
+                  decay: float = PARTIAL_DECAY) -> ScaleAnalysis:
+    """Interval analysis of a Scale (or frequency array), computed once per distinct set of frequencies."""
+    frequencies = getattr(scale, 'frequencies', scale)
+    # The raw bytes of the frequency array make a cheap, exact cache key
+    key = np.ascontiguousarray(frequencies, dtype=np.float64).tobytes()
+    return _analyze(key, int(limit), int(num_partials), float(decay))
+
+
+def pad_scales(frequency_sets: Sequence[np.ndarray]) -> np.ndarray:
+    """Stack scales of different sizes into one (scales, max notes) array padded with NaN."""
+    width = max((len(frequencies) for frequencies in frequency_sets), default=0)
+    padded = np.full((len(frequency_sets), width), np.nan)
+    for row, frequencies in zip(padded, frequency_sets):
+        row[:len(frequencies)] = frequencies
+    return padded
+
+
+def batch_metrics(frequency_sets, limit: int = DEFAULT_LIMIT, num_partials: int = DEFAULT_PARTIALS,
+                  decay: float = PARTIAL_DECAY) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean pairwise roughness and mean just deviation of many scales at once.
+
+    Roughness ignores partial pairs beyond ROUGHNESS_CUTOFF, so it matches
+    ScaleAnalysis.mean_roughness to within about 1e-4 of a partial's level.
+
+    Args:
+        frequency_sets: Sequence of frequency arrays, or a (scales, notes)
+            array where missing notes are NaN
+
+    Returns:
+        (mean roughness, mean just deviation in cents), one value per scale
+    """
+    padded = frequency_sets if isinstance(frequency_sets, np.ndarray) else pad_scales(frequency_sets)
+    present = ~np.isnan(padded)
+    counts = present.sum(axis=1)
+    pairs = np.maximum(counts * (counts - 1) / 2, 1)
+    n = padded.shape[1]
+
+    # Just deviation over the upper triangle only; pairs with a missing note are NaN
+    _, _, table = just_ratios(limit)
+    logs = np.log2(padded)
+    first, second = np.triu_indices(n, 1)
+    reduced = np.fmod(1200.0 * np.abs(logs[:, second] - logs[:, first]), 1200.0)
+    upper = np.clip(np.searchsorted(table, reduced), 1, len(table) - 1)
+    deviation = np.minimum(reduced - table[upper - 1], table[upper] - reduced)
+    just = np.nansum(deviation, axis=1) / pairs
+
+    # Roughness: with every scale's partials sorted, the partners of a partial
+    # within the cutoff are its next few neighbours, so pairs are visited by
+    # increasing offset k until no pair at that offset is close anymore. Scales
+    # with no close pair left drop out of the loop.
+    partials, amplitudes = harmonic_partials(np.where(present, padded, 1.0), num_partials, decay)
+    amplitudes = np.where(present[:, :, None], amplitudes, 0.0).reshape(len(padded), -1)
+    partials = partials.reshape(len(padded), -1)
+    order = np.argsort(partials, axis=1)
+    f = np.take_along_axis(partials, order, axis=1).astype(np.float32)
+    a = np.take_along_axis(amplitudes, order, axis=1).astype(np.float32)
+    note = np.repeat(np.arange(n), num_partials)[order]
+    s = (DSTAR / (S1 * f + S2)).astype(np.float32)
+    rough = np.zeros(len(padded))
+    active = np.arange(len(padded))
+    for k in range(1, f.shape[1]):
+        x = (f[:, k:] - f[:, :-k]) * s[:, :-k]
+        level = np.minimum(a[:, k:], a[:, :-k])
+        near = (x < ROUGHNESS_CUTOFF) & (level > 0)
+        close = near.any(axis=1)
+        if not close.all():
+            active, f, a, s, note = active[close], f[close], a[close], s[close], note[close]
+            x, level, near = x[close], level[close], near[close]
+            if not len(active):
+                break
+        # Partials of the same note are not a pair of notes
+        near &= note[:, k:] != note[:, :-k]
+        d = np.exp(-B1 * x, where=near, out=np.zeros_like(x))
+        d -= np.exp(-B2 * x, where=near, out=np.zeros_like(x))
+        d *= level
+        rough[active] += d.sum(axis=1)
+    return rough / pairs, just
+
+
+def rank_scales(frequency_sets, roughness_weight: float = 1.0, just_weight: float = 1.0,
+                **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Order scales from most to least consonant.
+
+    Both metrics are normalized to [0, 1] across the batch and combined with
+    the given weights; lower is more consonant.
+
+    Returns:
+        (indices of the scales, best first, score of every scale)
+    """
+    roughness, just = batch_metrics(frequency_sets, **kwargs)
+
+    def normalized(values):
+        span = np.ptp(values)
+        return (values - values.min()) / span if span > 0 else np.zeros_like(values)
+
+    score = roughness_weight * normalized(roughness) + just_weight * normalized(just)
+    return np.argsort(score, kind='stable'), score
+
+
+if __name__ == "__main__":
+    import time
+    import polytonic
+
+    # Rank density variants of a three-octave range above 110 Hz
+    variants = [(float(low), float(high)) for low in np.arange(3, 13, 0.25) for high in np.arange(5, 36, 0.25)]
+    start = time.perf_counter()
+    sets = [110.0 * np.exp2(polytonic.density_cents(v, 3.0, include_top=True) / 1200) for v in variants]
+    order, score = rank_scales(sets)
+    elapsed = time.perf_counter() - start
+    print(f"ranked {len(variants)} scales (up to {max(map(len, sets))} notes) in {elapsed:.2f} s")
+    for i in order[:5]:
+        low, high = variants[i]
+        print(f"  density {low:g} -> {high:g} notes/octave: score {score[i]:.3f}")
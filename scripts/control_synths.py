@@ -1,13 +1,408 @@
-# python scripts/generate_gammes.py
+# python scripts/control_synths.py [--patch "Filter Sweep" --scale 12-TET [--midi] [--output sweep.wav]]
 
-import yaml
+import argparse
+import functools
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from midi_output import MIDIOutput, cached_message
+from polyphony import OnePoleLowpass
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'synths.yaml'
+
+# Automation curves are sampled this many times per second when the patches are loaded
+CONTROL_RATE = 200.0
+# At most this many MIDI messages per second and lane (a filter sweep needs far fewer than CONTROL_RATE)
+MAX_MESSAGE_RATE = 50.0
+
+CURVES = ('linear', 'smooth', 'step')
+LFO_SHAPES = ('sine', 'triangle', 'square', 'saw')
+AUDIO_PARAMETERS = ('gain', 'cutoff')
+# Normalized cutoff 0..1 maps exponentially onto this range in Hz
+CUTOFF_RANGE = (20.0, 20000.0)
+
+# Controller numbers of the NRPN protocol
+NRPN_MSB, NRPN_LSB, DATA_ENTRY_MSB, DATA_ENTRY_LSB = 99, 98, 6, 38
+
+
+@dataclass(frozen=True)
+class Parameter:
+    """A synth parameter: its MIDI address (CC or NRPN), audio target and default value (0..1)."""
+    name: str
+    cc: Optional[int] = None
+    nrpn: Optional[int] = None
+    audio: Optional[str] = None
+    default: float = 0.5
+
+    @property
+    def resolution(self) -> int:
+        """Largest MIDI value: 7-bit for control changes, 14-bit for NRPN."""
+        return 16383 if self.nrpn is not None else 127
+
+    @property
+    def is_midi(self) -> bool:
+        return self.cc is not None or self.nrpn is not None
+
+
+@dataclass
+class Lane:
+    """
+    Automation of one parameter, pre-sampled when the patch is loaded.
+
+    values holds the normalized curve at the patch's control rate (read at
+    block rate by the audio path). times and data are the MIDI events left
+    once the curve is quantized to the parameter's resolution, decimated to
+    MAX_MESSAGE_RATE and stripped of repeated values.
+    """
+    parameter: Parameter
+    values: np.ndarray
+    times: np.ndarray
+    data: np.ndarray
+
+
+def sample_points(points, curve: str, length: float, control_rate: float = CONTROL_RATE) -> np.ndarray:
+    """Sample breakpoints [(seconds, value), ...] joined by a curve over length seconds."""
+    points = np.array(sorted(points), dtype=np.float64).reshape(-1, 2)
+    times = np.arange(int(round(length * control_rate)) + 1) / control_rate
+    point_times, point_values = points[:, 0], points[:, 1]
+    index = np.searchsorted(point_times, times, side='right') - 1
+    if curve == 'step' or len(points) == 1:
+        return point_values[np.maximum(index, 0)].astype(np.float32)
+    index = np.clip(index, 0, len(points) - 2)
+    span = point_times[index + 1] - point_times[index]
+    fraction = np.clip(np.divide(times - point_times[index], span, out=np.ones_like(times), where=span > 0), 0, 1)
+    if curve == 'smooth':
+        fraction = 0.5 - 0.5 * np.cos(np.pi * fraction)
+    start = point_values[index]
+    return (start + (point_values[index + 1] - start) * fraction).astype(np.float32)
+
+
+def sample_lfo(shape: str, rate: float, center: float, depth: float, length: float, phase: float = 0.0,
+               control_rate: float = CONTROL_RATE) -> np.ndarray:
+    """Sample a low-frequency oscillator around center over length seconds."""
+    cycles = np.arange(int(round(length * control_rate)) + 1) * (rate / control_rate) + phase
+    if shape == 'sine':
+        wave = np.sin(2 * np.pi * cycles)
+    elif shape == 'triangle':
+        wave = 2 * np.abs(2 * ((cycles - 0.25) % 1.0) - 1) - 1
+    elif shape == 'square':
+        wave = np.where(cycles % 1.0 < 0.5, 1.0, -1.0)
+    else:
+        wave = 2 * (cycles % 1.0) - 1
+    return np.clip(center + depth * wave, 0.0, 1.0).astype(np.float32)
+
+
+def midi_events(values: np.ndarray, resolution: int, control_rate: float = CONTROL_RATE,
+                max_message_rate: float = MAX_MESSAGE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a sampled curve to the MIDI events worth sending.
+
+    The curve is quantized, then only the first sample of every
+    1/max_message_rate slot is kept (plus the last one, so a ramp always
+    lands on its final value), then repeats of the previous value are dropped.
+
+    Returns:
+        (event times in seconds, quantized values)
+    """
+    quantized = np.round(np.asarray(values, dtype=np.float64) * resolution).astype(np.int32)
+    times = np.arange(len(quantized)) / control_rate
+    slots = np.floor(times * max_message_rate + 1e-9).astype(np.int64)
+    keep = np.ones(len(quantized), dtype=bool)
+    keep[1:] = slots[1:] != slots[:-1]
+    keep[-1] = True
+    times, quantized = times[keep], quantized[keep]
+    changed = np.ones(len(quantized), dtype=bool)
+    changed[1:] = quantized[1:] != quantized[:-1]
+    return times[changed], quantized[changed]
+
+
+def parameter_messages(parameter: Parameter, value: int, channel: int, selected: Optional[int] = None,
+                       msb: Optional[int] = None) -> list:
+    """
+    Prebuilt messages setting a parameter to a quantized value.
+
+    An NRPN is selected (CC 99/98) only when it differs from `selected`, the
+    NRPN the channel currently points at. Data entry follows as CC 6/38, and
+    the MSB is skipped when it equals `msb`, the one last sent for that NRPN.
+    """
+    value = int(value)
+    if parameter.nrpn is None:
+        return [cached_message('control_change', channel, control=parameter.cc, value=value)]
+    messages = []
+    if parameter.nrpn != selected:
+        messages.append(cached_message('control_change', channel, control=NRPN_MSB, value=parameter.nrpn >> 7))
+        messages.append(cached_message('control_change', channel, control=NRPN_LSB, value=parameter.nrpn & 0x7F))
+        msb = None
+    if value >> 7 != msb:
+        messages.append(cached_message('control_change', channel, control=DATA_ENTRY_MSB, value=value >> 7))
+    messages.append(cached_message('control_change', channel, control=DATA_ENTRY_LSB, value=value & 0x7F))
+    return messages
+
+
+@dataclass
+class Patch:
+    """A synth definition of synths.yaml with its automation lanes, sampled over length seconds."""
+    name: str
+    channel: int
+    parameters: Dict[str, Parameter]
+    lanes: List[Lane]
+    length: float
+    loop: bool = False
+    control_rate: float = CONTROL_RATE
+
+    @functools.cached_property
+    def timeline(self) -> Tuple[np.ndarray, List[tuple]]:
+        """
+        Every MIDI message of the patch merged into batches, one per distinct time.
+
+        The first batch sets the parameters that have no automation to their
+        defaults. Built once; sending a batch is then a plain loop over
+        prebuilt messages.
+        """
+        automated = {lane.parameter.name for lane in self.lanes}
+        sources = [(parameter, np.zeros(1), np.array([round(parameter.default * parameter.resolution)]))
+                   for parameter in self.parameters.values() if parameter.is_midi and parameter.name not in automated]
+        sources += [(lane.parameter, lane.times, lane.data) for lane in self.lanes if lane.parameter.is_midi]
+        if not sources:
+            return np.zeros(0), []
+
+        times = np.concatenate([source[1] for source in sources])
+        data = np.concatenate([source[2] for source in sources])
+        owner = np.concatenate([np.full(len(source[1]), i) for i, source in enumerate(sources)])
+        order = np.lexsort((owner, times))
+        times, data, owner = times[order], data[order], owner[order]
+        starts = np.flatnonzero(np.r_[True, np.diff(times) > 0])
+
+        batches = []
+        selected = msb = None
+        for begin, end in zip(starts, np.r_[starts[1:], len(times)]):
+            batch = []
+            for source, value in zip(owner[begin:end].tolist(), data[begin:end].tolist()):
+                parameter = sources[source][0]
+                batch.extend(parameter_messages(parameter, value, self.channel, selected, msb))
+                if parameter.nrpn is not None:
+                    selected, msb = parameter.nrpn, value >> 7
+            batches.append(tuple(batch))
+        return times[starts], batches
+
+    def message_count(self) -> int:
+        return sum(len(batch) for batch in self.timeline[1])
+
+    def processor(self, sample_rate: int, blocksize: int = 1024) -> 'BlockProcessor':
+        return BlockProcessor(self, sample_rate, blocksize)
+
+
+class BlockProcessor:
+    """
+    Apply a patch's audio parameters to a stream of blocks.
+
+    Values are read from the pre-sampled lanes once per block: gain ramps
+    linearly from one block to the next (so steps do not click) and cutoff
+    drives a one-pole low-pass.
+    """
+
+    def __init__(self, patch: Patch, sample_rate: int, blocksize: int = 1024):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.loop = patch.loop
+        self._step = patch.control_rate / sample_rate
+        lanes = {lane.parameter.name: lane.values for lane in patch.lanes}
+        self._curves = {parameter.audio: lanes.get(parameter.name, np.array([parameter.default], dtype=np.float32))
+                        for parameter in patch.parameters.values() if parameter.audio}
+        self._filter = OnePoleLowpass(sample_rate) if 'cutoff' in self._curves else None
+        self._gain = None
+        self._ramp = np.arange(1, blocksize + 1, dtype=np.float64)
+        self._scratch = np.empty(blocksize, dtype=np.float64)
+
+    def value(self, name: str, frame: int) -> float:
+        """Normalized value of an audio parameter at a sample position."""
+        curve = self._curves[name]
+        index = int(frame * self._step)
+        return float(curve[index % len(curve) if self.loop else min(index, len(curve) - 1)])
+
+    def process(self, block: np.ndarray, frame: int) -> np.ndarray:
+        """Process a block (at most blocksize samples) starting at sample frame, in place."""
+        frames = len(block)
+        if not frames:
+            return block
+        if 'gain' in self._curves:
+            start = self.value('gain', frame) if self._gain is None else self._gain
+            end = self.value('gain', frame + frames)
+            if start == end:
+                block *= end
+            else:
+                gain = np.multiply(self._ramp[:frames], (end - start) / frames, out=self._scratch[:frames])
+                gain += start
+                block *= gain
+            self._gain = end
+        if self._filter is not None:
+            low, high = CUTOFF_RANGE
+            self._filter.process(block, low * (high / low) ** self.value('cutoff', frame))
+        return block
+
+    def process_buffer(self, buffer: np.ndarray) -> np.ndarray:
+        """Process a whole rendered buffer block by block, in place."""
+        for position in range(0, len(buffer), self.blocksize):
+            self.process(buffer[position:position + self.blocksize], position)
+        return buffer
+
+
+def schedule_automation(scheduler, midi_output: MIDIOutput, patch: Patch, start: float,
+                        until: Optional[float] = None) -> List[int]:
+    """
+    Queue the patch's MIDI batches on a MIDIScheduler.
+
+    Args:
+        start: Beat position of the automation's time zero
+        until: Seconds after which nothing is sent; looping patches repeat up to it
+
+    Returns:
+        Scheduler handles of the queued batches
+    """
+    times, batches = patch.timeline
+    beats_per_second = scheduler.bpm / 60.0
+    repeats = max(1, math.ceil(until / patch.length)) if patch.loop and until and patch.length > 0 else 1
+    handles = []
+    for repeat in range(repeats):
+        offset = repeat * patch.length
+        for time, batch in zip(times.tolist(), batches):
+            if until is not None and offset + time > until:
+                break
+            handles.append(scheduler.schedule(start + (offset + time) * beats_per_second,
+                                              midi_output.send_messages, batch))
+    return handles
+
+
+def _number(entry: dict, key: str, low: float, high: float, default=None, cast=float):
+    value = entry.get(key, default)
+    if value is None:
+        return None
+    value = cast(value)
+    if not low <= value <= high:
+        raise ValueError(f"{key} must be within {low}..{high}, got {value}")
+    return value
+
+
+def parse_parameter(name: str, entry: dict) -> Parameter:
+    parameter = Parameter(name, cc=_number(entry, 'cc', 0, 127, cast=int),
+                          nrpn=_number(entry, 'nrpn', 0, 16383, cast=int), audio=entry.get('audio'),
+                          default=_number(entry, 'default', 0.0, 1.0, 0.5))
+    if parameter.cc is not None and parameter.nrpn is not None:
+        raise ValueError(f"parameter {name} has both cc and nrpn")
+    if parameter.audio is not None and parameter.audio not in AUDIO_PARAMETERS:
+        raise ValueError(f"parameter {name}: unsupported audio target {parameter.audio}")
+    return parameter
+
+
+def parse_lane(entry: dict, length: float, parameters: Dict[str, Parameter], control_rate: float,
+               max_message_rate: float) -> Lane:
+    parameter = parameters.get(entry.get('parameter'))
+    if parameter is None:
+        raise ValueError(f"automation of unknown parameter {entry.get('parameter')}")
+    if 'lfo' in entry:
+        lfo = entry['lfo']
+        shape = lfo.get('shape', 'sine')
+        if shape not in LFO_SHAPES:
+            raise ValueError(f"unsupported LFO shape {shape}")
+        values = sample_lfo(shape, float(lfo.get('rate', 1.0)), float(lfo.get('center', parameter.default)),
+                            float(lfo.get('depth', 0.5)), length, float(lfo.get('phase', 0.0)), control_rate)
+    elif entry.get('points'):
+        curve = entry.get('curve', 'linear')
+        if curve not in CURVES:
+            raise ValueError(f"unsupported curve {curve}")
+        values = np.clip(sample_points(entry['points'], curve, length, control_rate), 0.0, 1.0)
+    else:
+        raise ValueError(f"automation of {parameter.name} needs points or an lfo")
+    times, data = midi_events(values, parameter.resolution, control_rate, max_message_rate)
+    return Lane(parameter, values, times, data)
+
+
+def lane_length(entry: dict) -> float:
+    if 'length' in entry:
+        return float(entry['length'])
+    return max((float(point[0]) for point in entry.get('points') or []), default=0.0)
+
+
+def parse_patch(entry: dict, control_rate: float = CONTROL_RATE, max_message_rate: float = MAX_MESSAGE_RATE) -> Patch:
+    name = entry.get('name', 'Unnamed')
+    try:
+        parameters = {key: parse_parameter(key, value or {}) for key, value in (entry.get('parameters') or {}).items()}
+        automation = entry.get('automation') or []
+        length = float(entry.get('length', max((lane_length(lane) for lane in automation), default=0.0)))
+        lanes = [parse_lane(lane, length, parameters, control_rate, max_message_rate) for lane in automation]
+        return Patch(name, _number(entry, 'channel', 0, 15, 0, int), parameters, lanes, length,
+                     bool(entry.get('loop', False)), control_rate)
+    except (TypeError, ValueError, KeyError, IndexError) as error:
+        raise ValueError(f"Invalid synth patch {name}: {error}") from None
+
+
+def load_patches(config_path=CONFIG_PATH, control_rate: float = CONTROL_RATE,
+                 max_message_rate: float = MAX_MESSAGE_RATE) -> Dict[str, Patch]:
+    """Load and pre-sample every patch of the YAML file, keyed by name."""
+    import yaml
 
-def generate_gammes(config_path):
     with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
-        gamme = config.get('gamme', [])
-        notes = [note['note'] for note in gamme]
-        print(f"Gamme: {', '.join(notes)}")
+        config = yaml.safe_load(file) or {}
+    patches = {}
+    for entry in config.get('synths') or []:
+        patch = parse_patch(entry, control_rate, max_message_rate)
+        patches[patch.name] = patch
+    return patches
+
+
+def print_patches(patches: Dict[str, Patch]):
+    for patch in patches.values():
+        print(f"{patch.name} (channel {patch.channel + 1}, {patch.length:g} s{', looped' if patch.loop else ''}): "
+              f"{patch.message_count()} MIDI messages")
+        for lane in patch.lanes:
+            parameter = lane.parameter
+            address = f"CC {parameter.cc}" if parameter.cc is not None else (
+                f"NRPN {parameter.nrpn}" if parameter.nrpn is not None else 'audio only')
+            print(f"  {parameter.name:<12} {address:<10} {len(lane.values):>6} samples -> {len(lane.times):>5} events"
+                  f"{f' (audio {parameter.audio})' if parameter.audio else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List synth patches, or play a scale with a patch's automation")
+    parser.add_argument('--config', default=str(CONFIG_PATH), help="Synth patch YAML file")
+    parser.add_argument('--patch', help="Patch to play (default: list the patches)")
+    parser.add_argument('--scale', default='12-TET', help="Example scale to play")
+    parser.add_argument('--note-duration', type=float, default=0.5)
+    parser.add_argument('--waveform', default='sawtooth', choices=['sine', 'sawtooth', 'square'])
+    parser.add_argument('--midi', action='store_true', help="Play through MIDI instead of audio")
+    parser.add_argument('--port', help="MIDI output port (default: the system default)")
+    parser.add_argument('--output', help="Write the audio to this WAV file instead of the audio device")
+    args = parser.parse_args(argv)
+
+    patches = load_patches(args.config)
+    if not args.patch:
+        if patches:
+            print_patches(patches)
+        else:
+            print(f"No synth patches defined in {args.config}")
+        return
+    if args.patch not in patches:
+        raise SystemExit(f"Unknown patch: {args.patch} (available: {', '.join(patches)})")
+    patch = patches[args.patch]
+
+    from microtonal import Synthesizer, create_example_scales
+    from streaming import SoundDeviceSink, WavFileSink
+
+    scale = create_example_scales()[args.scale]
+    synth = Synthesizer()
+    if args.midi:
+        synth.set_midi_port(args.port)
+        synth.play_scale(scale, args.note_duration, use_midi=True, patch=patch)
+        synth.midi_scheduler.wait_idle()
+        synth.close_midi()
+    else:
+        engine = synth.stream_scale(scale, args.note_duration, args.waveform, patch=patch)
+        (WavFileSink(args.output) if args.output else SoundDeviceSink()).play(engine)
+
 
 if __name__ == "__main__":
-    generate_gammes('../config/gammes.yaml')
\ No newline at end of file
+    main()
@@ -0,0 +1,166 @@
+# python scripts/export_scales.py --output exports --waveforms sine square --tempi 60 120 --midi
+
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Mapping, Tuple
+
+from microtonal import create_example_scales
+from render import NOTE_GAP, WAVEFORMS
+from streaming import SoundFileSink, StreamingEngine, WavFileSink
+
+TICKS_PER_BEAT = 480
+
+
+@dataclass
+class ExportJob:
+    """One scale rendered with one waveform at one tempo."""
+    name: str
+    frequencies: Tuple[float, ...]
+    midi_notes: Tuple[int, ...]
+    waveform: str
+    bpm: float
+    output_dir: str
+    audio_format: str = 'wav'
+    sample_rate: int = 44100
+    write_midi: bool = False
+
+    @property
+    def note_duration(self) -> float:
+        return 60.0 / self.bpm
+
+    @property
+    def stem(self) -> str:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', self.name).strip('_').lower()
+        return f"{slug}_{self.waveform}_{self.bpm:g}bpm"
+
+
+def build_jobs(scales, waveforms, tempi, output_dir, audio_format, sample_rate, write_midi) -> List[ExportJob]:
+    """Expand scales x waveforms x tempi into export jobs."""
+    jobs = []
+    for name, scale in scales.items():
+        frequencies = tuple(scale.frequencies.tolist())
+        midi_notes = tuple(scale.midi_notes.tolist())
+        for waveform in waveforms:
+            for bpm in tempi:
+                jobs.append(ExportJob(name, frequencies, midi_notes, waveform, bpm, output_dir,
+                                      audio_format, sample_rate, write_midi))
+    return jobs
+
+
+def write_midi_file(job: ExportJob, path: str):
+    """Write the scale as a Standard MIDI File, one beat per note."""
+    import mido
+
+    mid = mido.MidiFile(ticks_per_beat=TICKS_PER_BEAT)
+    track = mido.MidiTrack()
+    mid.tracks.append(track)
+    track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(job.bpm), time=0))
+    track.append(mido.MetaMessage('track_name', name=job.name, time=0))
+    gap_ticks = int(round(NOTE_GAP / job.note_duration * TICKS_PER_BEAT))
+    for i, note in enumerate(job.midi_notes):
+        note = min(max(note, 0), 127)
+        track.append(mido.Message('note_on', note=note, velocity=64, time=gap_ticks if i else 0))
+        track.append(mido.Message('note_off', note=note, velocity=64, time=TICKS_PER_BEAT))
+    mid.save(path)
+
+
+def run_job(job: ExportJob) -> Tuple[str, float, float]:
+    """
+    Render one job straight to disk, block by block.
+
+    Returns:
+        (audio path, seconds of audio written, wall-clock seconds spent)
+    """
+    start = time.perf_counter()
+    engine = StreamingEngine(job.sample_rate, job.waveform, blocksize=8192)
+    engine.enqueue((frequency, job.note_duration) for frequency in job.frequencies)
+
+    path = os.path.join(job.output_dir, f"{job.stem}.{job.audio_format}")
+    if job.audio_format == 'wav':
+        sink = WavFileSink(path)
+    else:
+        sink = SoundFileSink(path, format=job.audio_format.upper())
+    sink.play(engine)
+
+    if job.write_midi:
+        write_midi_file(job, os.path.join(job.output_dir, f"{job.stem}.mid"))
+    return path, sink.samples / job.sample_rate, time.perf_counter() - start
+
+
+def export(jobs: List[ExportJob], workers: int = None) -> List[Tuple[ExportJob, Exception]]:
+    """
+    Run the jobs across a process pool and report throughput.
+
+    Returns:
+        (job, exception) for every job that failed; the other jobs still complete
+    """
+    if not jobs:
+        print("Nothing to export.")
+        return []
+    os.makedirs(jobs[0].output_dir, exist_ok=True)
+    start = time.perf_counter()
+    audio_seconds = 0.0
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                path, seconds, elapsed = future.result()
+            except Exception as e:
+                # One bad job (unwritable path, missing codec...) must not abort the others
+                failures.append((futures[future], e))
+                continue
+            audio_seconds += seconds
+            print(f"{path}: {seconds:.1f} s of audio in {elapsed:.2f} s")
+    wall = time.perf_counter() - start
+    print(f"\nExported {len(jobs) - len(failures)} files, {audio_seconds:.1f} s of audio in {wall:.2f} s "
+          f"({audio_seconds / wall:.1f} s of audio per second)")
+    if failures:
+        print(f"{len(failures)} jobs failed:")
+        for job, error in failures:
+            print(f"  {job.stem}: {error}")
+    return failures
+
+
+def collect_scales(names: List[str], gammes_path: str) -> Mapping:
+    scales = create_example_scales()
+    if gammes_path:
+        from generate_gammes import load_gammes
+        scales.include(load_gammes(gammes_path))
+    if names:
+        missing = [name for name in names if name not in scales]
+        if missing:
+            raise SystemExit(f"Unknown scales: {', '.join(missing)}")
+        scales = {name: scales[name] for name in names}
+    return scales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render scales to audio and MIDI files in parallel.")
+    parser.add_argument('--scales', nargs='*', help="Scale names to export (default: all)")
+    parser.add_argument('--gammes', default=str(Path(__file__).parent.parent / 'config' / 'gammes.yaml'),
+                        help="YAML file with extra gammes ('' to skip)")
+    parser.add_argument('--waveforms', nargs='+', default=['sine'], choices=WAVEFORMS)
+    parser.add_argument('--tempi', nargs='+', type=float, default=[120.0], help="Tempi in BPM (one note per beat)")
+    parser.add_argument('--format', default='wav', choices=['wav', 'flac'], help="Audio file format")
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--midi', action='store_true', help="Also write a .mid file per job")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--output', default='exports', help="Output directory")
+    args = parser.parse_args(argv)
+
+    scales = collect_scales(args.scales, args.gammes)
+    jobs = build_jobs(scales, args.waveforms, args.tempi, args.output, args.format,
+                      args.sample_rate, args.midi)
+    if export(jobs, args.workers):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
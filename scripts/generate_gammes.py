@@ -1,18 +1,28 @@
-# https://nielscautaerts.xyz/why-are-there-twelve-different-musical-notes.html
+# python scripts/generate_gammes.py
 
-def generate_gamme():
-    octave = 4  # Choisissez l'octave souhaité
-    start_note = 440  # Fréquence de la première note (La4)
-    interval = 2 ** (1/53)  # Calcul de l'intervalle entre chaque note
+from pathlib import Path
+from typing import Dict
 
-    gamme = []
-    current_note = start_note
+from microtonal import Scale
+from scale_library import ScaleLibrary, note_names_to_frequencies
 
-    for _ in range(53):
-        gamme.append(current_note)
-        current_note *= interval
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'gammes.yaml'
 
-    return gamme
 
-gamme = generate_gamme()
-print(gamme)
\ No newline at end of file
+def note_name_to_frequency(name: str, a4: float = 440.0) -> float:
+    """Convert a note name such as 'F#1', 'Eb3' or 'E#6' to a 12-TET frequency."""
+    return float(note_names_to_frequencies([name], a4)[0])
+
+
+def load_gammes(config_path=CONFIG_PATH) -> Dict[str, Scale]:
+    """Load every gamme of the YAML file as a Scale, keyed by its name."""
+    return ScaleLibrary(config_path).scales()
+
+
+def generate_gammes(config_path=CONFIG_PATH):
+    for name, scale in load_gammes(config_path).items():
+        print(f"{name}: {', '.join(scale.names or [])}")
+
+
+if __name__ == "__main__":
+    generate_gammes()
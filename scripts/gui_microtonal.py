@@ -1,5 +1,7 @@
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Add project root to Python path
@@ -9,22 +11,25 @@ if project_root not in sys.path:
 
 # External dependencies
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 
 # Qt imports
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QComboBox, QPushButton, QLabel, QTextEdit, QCheckBox,
-                           QHBoxLayout, QDial, QSpacerItem, QSizePolicy)
+                           QHBoxLayout, QDial, QSpacerItem, QSizePolicy, QProgressBar)
 from PyQt5.QtCore import Qt, pyqtSignal, QPoint
-from PyQt5.QtGui import QPainter, QFont, QPen, QConicalGradient
+from PyQt5.QtGui import QColor, QPainter, QFont, QPen, QConicalGradient
 
 # Local imports
 from microtonal import Synthesizer, create_example_scales
-from play_microtonal import play_audio
 from midi_output import list_midi_output_ports
-from config.ui_config import COLORS, LABELS, FONTS, LAYOUT, SCALE_INFO, PLOT
+from midi_ports import get_port_manager
+from render_cache import RenderCache
+from gui_workers import AudioPlaybackJob, MIDIPlaybackJob, PlaybackController
+from scale_plot import ScalePlot
+from analysis_view import AnalysisPanel
+from consonance import analyze_scale
+import instrumentation
+from config.ui_config import COLORS, LABELS, FONTS, LAYOUT, SCALE_INFO
 
 class WaveformDial(QDial):
     waveformChanged = pyqtSignal(str)
@@ -47,18 +52,18 @@ class WaveformDial(QDial):
         painter.setRenderHint(QPainter.Antialiasing)
 
         center = self.rect().center()
-        radius = min(self.width(), self.height()) / 2 - 10
+        radius = min(self.width(), self.height()) // 2 - 10
 
         gradient = QConicalGradient(center, -90)
-        gradient.setColorAt(0.0, COLORS['dial_gradient']['start'])
-        gradient.setColorAt(0.5, COLORS['dial_gradient']['middle'])
-        gradient.setColorAt(1.0, COLORS['dial_gradient']['end'])
+        gradient.setColorAt(0.0, QColor(*COLORS['dial_gradient']['start']))
+        gradient.setColorAt(0.5, QColor(*COLORS['dial_gradient']['middle']))
+        gradient.setColorAt(1.0, QColor(*COLORS['dial_gradient']['end']))
 
         painter.setBrush(gradient)
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(center, radius, radius)
 
-        painter.setPen(QPen(COLORS['dial_indicator'], 3))
+        painter.setPen(QPen(QColor(*COLORS['dial_indicator']), 3))
         angle = (-self.value() * 120 + 90) % 360  # 120 degrees between positions
         indicator_x = center.x() + radius * LAYOUT['dial']['indicator_scale'] * np.cos(np.radians(angle))
         indicator_y = center.y() - radius * LAYOUT['dial']['indicator_scale'] * np.sin(np.radians(angle))
@@ -67,7 +72,7 @@ class WaveformDial(QDial):
         font = QFont()
         font.setPointSize(FONTS['dial_labels']['size'])
         painter.setFont(font)
-        painter.setPen(COLORS['text'])
+        painter.setPen(QColor(*COLORS['text']))
 
         # Position text labels
         for i, waveform in enumerate(self.waveforms):
@@ -93,7 +98,8 @@ class ScaleVisualizerWindow(QMainWindow):
         self.setGeometry(*LAYOUT['window']['geometry'])
 
         # Initialize synthesizer and scales
-        self.synth = Synthesizer()
+        self.synth = Synthesizer(render_cache=RenderCache())
+        instrumentation.register_source('render_cache', self.synth.render_cache.metrics)
         self.scales = create_example_scales()
         
         # Create main widget and layout
@@ -146,15 +152,47 @@ class ScaleVisualizerWindow(QMainWindow):
 
         layout.addLayout(controls_layout)
 
-        # Create matplotlib figure for visualization
-        self.figure = Figure(figsize=LAYOUT['plot']['figsize'])
-        self.canvas = FigureCanvas(self.figure)
-        layout.addWidget(self.canvas)
+        # Frequency plot; matplotlib loads in the background and the plot fills in when ready
+        self.plot = ScalePlot()
+        layout.addWidget(self.plot)
 
-        # Create play button
+        # Live oscilloscope and spectrum of the audio output
+        self.analysis_checkbox = QCheckBox(LABELS['controls']['analysis'])
+        self.analysis_checkbox.toggled.connect(self.toggle_analysis)
+        layout.addWidget(self.analysis_checkbox)
+        self.analysis_panel = AnalysisPanel(self.synth.sample_rate)
+        self.analysis_panel.setVisible(False)
+        layout.addWidget(self.analysis_panel)
+
+        # Create play/stop buttons and playback progress
+        transport_layout = QHBoxLayout()
         self.play_button = QPushButton(LABELS['controls']['play_scale'])
         self.play_button.clicked.connect(self.play_current_scale)
-        layout.addWidget(self.play_button)
+        transport_layout.addWidget(self.play_button)
+        self.stop_button = QPushButton(LABELS['controls']['stop'])
+        self.stop_button.setEnabled(False)
+        transport_layout.addWidget(self.stop_button)
+        # Profiles the GUI thread and records metrics from every thread until unchecked
+        self.profile_button = QPushButton(LABELS['controls']['profile'])
+        self.profile_button.setCheckable(True)
+        self.profile_button.toggled.connect(self.toggle_profile)
+        transport_layout.addWidget(self.profile_button)
+        self.profile_capture = None
+        layout.addLayout(transport_layout)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        # Rendering and playback run on a worker thread so the window stays responsive
+        self.playback = PlaybackController(self)
+        self.playback.started.connect(self.on_playback_started)
+        self.playback.progress.connect(self.on_playback_progress)
+        self.playback.finished.connect(self.on_playback_stopped)
+        self.playback.cancelled.connect(self.on_playback_stopped)
+        self.playback.failed.connect(self.on_playback_failed)
+        self.stop_button.clicked.connect(self.playback.stop)
 
         # Create info display
         self.info_display = QTextEdit()
@@ -164,28 +202,22 @@ class ScaleVisualizerWindow(QMainWindow):
 
         # Initialize display with first scale
         self.update_scale_display(self.scale_selector.currentText())
+        # Build the other scales and their analyses off the GUI thread, so switching only redraws
+        threading.Thread(target=self._prewarm_scales, name='ScalePrewarm', daemon=True).start()
+
+    def _prewarm_scales(self):
+        for name in list(self.scales):
+            try:
+                analyze_scale(self.scales[name])
+            except Exception:
+                # A broken definition is reported when it is selected
+                continue
 
     def update_scale_display(self, scale_name):
-        # Clear the figure
-        self.figure.clear()
-        
-        # Get current scale
+        # Update the bars of the existing plot in place
         scale = self.scales[scale_name]
-        
-        # Create frequency plot
-        ax = self.figure.add_subplot(111)
-        frequencies = [note.frequency for note in scale.notes]
-        x = range(len(frequencies))
-        ax.bar(x, frequencies, alpha=PLOT['bar_alpha'])
-        
-        # Customize plot
-        ax.set_title(f"{scale_name} Scale Frequencies")
-        ax.set_xlabel(PLOT['labels']['x'])
-        ax.set_ylabel(PLOT['labels']['y'])
-        ax.grid(True, alpha=PLOT['grid_alpha'])
-        
-        # Update canvas
-        self.canvas.draw()
+        self.plot.show_scale(scale_name, scale.frequencies)
+        self.analysis_panel.set_expected_frequencies(scale.frequencies)
         
         # Update info display
         self.update_info_display(scale_name)
@@ -197,11 +229,16 @@ class ScaleVisualizerWindow(QMainWindow):
         if scale_name in SCALE_INFO:
             info_text += SCALE_INFO[scale_name]['description']
         
-        # Add frequency information
-        info_text += "\n\nFrequencies:\n"
+        # Add frequency information, with each note's interval from the first and its nearest just ratio
         scale = self.scales[scale_name]
-        for i, note in enumerate(scale.notes):
-            info_text += f"Note {i+1}: {note.frequency:.2f} Hz\n"
+        analysis = analyze_scale(scale)
+        info_text += (f"\n\nRoughness per pair: {analysis.mean_roughness:.3f}   "
+                      f"Mean deviation from just ratios: {analysis.mean_just_deviation:.1f} cents")
+        info_text += "\n\nFrequencies:\n"
+        cents, numerators, denominators, deviation = analysis.steps_from_root()
+        info_text += "".join(f"Note {i+1}: {frequency:.2f} Hz  {cents[i]:7.1f} cents  "
+                             f"~{numerators[i]}/{denominators[i]} ({deviation[i]:+.1f})\n"
+                             for i, frequency in enumerate(scale.frequencies))
         
         self.info_display.setText(info_text)
 
@@ -214,16 +251,57 @@ class ScaleVisualizerWindow(QMainWindow):
         scale_name = self.scale_selector.currentText()
         scale = self.scales[scale_name]
         
+        # A new play request preempts whatever is still playing
         if self.use_midi_checkbox.isChecked():
-            # Close any existing MIDI connection
-            self.synth.close_midi()
-            # Play using MIDI output
-            waveform = self.synth.play_scale(scale, use_midi=True)
+            # Reuse the selected port (kept open by the port manager between plays)
+            job = MIDIPlaybackJob(scale, self.midi_port_selector.currentText(),
+                                  midi_tuning=self.synth.midi_tuning)
         else:
-            # Play using audio output
             waveform_type = self.waveform_selector.waveforms[self.waveform_selector.value()]
-            waveform = self.synth.play_scale(scale, waveform=waveform_type)
-            play_audio(waveform)
+            tap = self.analysis_panel.ring.write if self.analysis_checkbox.isChecked() else None
+            job = AudioPlaybackJob(self.synth, scale, waveform_type, tap=tap)
+        self.playback.play(job)
+
+    def toggle_analysis(self, enabled):
+        self.analysis_panel.setVisible(enabled)
+        if enabled:
+            self.analysis_panel.start()
+        else:
+            self.analysis_panel.stop()
+
+    def toggle_profile(self, enabled):
+        if enabled:
+            prefix = Path(project_root) / 'profiles' / time.strftime('gui-%Y%m%d-%H%M%S')
+            self.profile_capture = instrumentation.ProfileCapture(prefix)
+            self.profile_capture.start()
+            self.statusBar().showMessage("Capturing profile...")
+        elif self.profile_capture is not None:
+            self.profile_capture.stop()
+            self.statusBar().showMessage(f"Profile written to {self.profile_capture.prefix}.prof/.txt", 10000)
+            self.profile_capture = None
+
+    def on_playback_started(self):
+        self.stop_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+
+    def on_playback_progress(self, fraction):
+        self.progress_bar.setValue(int(fraction * self.progress_bar.maximum()))
+
+    def on_playback_stopped(self):
+        self.stop_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+
+    def on_playback_failed(self, message):
+        self.on_playback_stopped()
+        self.statusBar().showMessage(f"Playback failed: {message}", 5000)
+
+    def closeEvent(self, event):
+        self.playback.shutdown()
+        if self.profile_capture is not None:
+            self.profile_button.setChecked(False)
+        self.analysis_panel.stop()
+        get_port_manager().close_all()
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
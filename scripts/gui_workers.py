@@ -0,0 +1,243 @@
+import threading
+import traceback
+from itertools import count
+from typing import Callable, Optional
+
+import numpy as np
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import instrumentation
+from microtonal import Scale, Synthesizer
+
+# How often a running job reports progress and checks for cancellation (seconds)
+POLL_INTERVAL = 1 / 30
+
+
+class JobSignals(QObject):
+    """
+    Signals of a background job, all carrying the job id.
+
+    The object lives on the GUI thread, so emitting from the worker delivers
+    the signal to GUI slots through Qt's queued connections.
+    """
+    started = pyqtSignal(int)
+    progress = pyqtSignal(int, float)
+    finished = pyqtSignal(int)
+    cancelled = pyqtSignal(int)
+    failed = pyqtSignal(int, str)
+
+
+class Job(QRunnable):
+    """
+    Unit of work for a QThreadPool that can be cancelled from the GUI thread.
+
+    Subclasses implement work() and check self.cancelled (a threading.Event)
+    regularly; run() turns the outcome into started/finished/cancelled/failed.
+    """
+    _ids = count(1)
+
+    def __init__(self):
+        super().__init__()
+        # The pool must not delete the runnable: the controller keeps a reference
+        self.setAutoDelete(False)
+        self.job_id = next(self._ids)
+        self.signals = JobSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        if self.cancelled.is_set():
+            self.signals.cancelled.emit(self.job_id)
+            return
+        self.signals.started.emit(self.job_id)
+        try:
+            self.work()
+        except Exception as error:
+            traceback.print_exc()
+            self.signals.failed.emit(self.job_id, str(error))
+            return
+        if self.cancelled.is_set():
+            self.signals.cancelled.emit(self.job_id)
+        else:
+            self.signals.finished.emit(self.job_id)
+
+    def work(self):
+        raise NotImplementedError
+
+
+def play_buffer(waveform: np.ndarray, sample_rate: int, cancelled: threading.Event,
+                progress: Optional[Callable[[float], None]] = None, blocksize: int = 1024,
+                tap: Optional[Callable[[np.ndarray], None]] = None):
+    """
+    Play a rendered buffer on the default audio device until it ends or cancelled is set.
+
+    Unlike sd.play/sd.wait the stream is fed from a callback, so the caller
+    wakes up every POLL_INTERVAL to report progress and can stop mid-buffer.
+    tap, if given, receives every block sent to the device (from the audio
+    thread, so it must be quick, e.g. RingBuffer.write).
+    """
+    import sounddevice as sd
+
+    total = len(waveform)
+    position = 0
+    done = threading.Event()
+
+    def callback(outdata, frames, time_info, status):
+        nonlocal position
+        if status.output_underflow:
+            instrumentation.count('audio.underflows')
+        with instrumentation.timer('audio.callback'):
+            chunk = waveform[position:position + frames]
+            outdata[:len(chunk), 0] = chunk
+            outdata[len(chunk):, 0] = 0
+            if tap is not None:
+                tap(outdata[:, 0])
+        position += len(chunk)
+        if len(chunk) < frames or cancelled.is_set():
+            raise sd.CallbackStop()
+
+    stream = sd.OutputStream(samplerate=sample_rate, blocksize=blocksize, channels=1, dtype='float32',
+                             callback=callback, finished_callback=done.set)
+    with stream:
+        while not done.wait(POLL_INTERVAL):
+            if cancelled.is_set():
+                stream.abort()
+                break
+            if progress is not None:
+                progress(position / total if total else 1.0)
+
+
+class AudioPlaybackJob(Job):
+    """Render a scale (through the synthesizer's render cache) and play it."""
+
+    def __init__(self, synth: Synthesizer, scale: Scale, waveform: str = 'sine', note_duration: float = 0.5,
+                 tap: Optional[Callable[[np.ndarray], None]] = None):
+        super().__init__()
+        self.synth = synth
+        self.scale = scale
+        self.waveform = waveform
+        self.note_duration = note_duration
+        self.tap = tap
+
+    def work(self):
+        samples = self.synth.play_scale(self.scale, self.note_duration, self.waveform, dtype=np.float32)
+        if self.cancelled.is_set():
+            return
+        play_buffer(samples, self.synth.sample_rate, self.cancelled,
+                    lambda fraction: self.signals.progress.emit(self.job_id, fraction), tap=self.tap)
+
+
+class MIDIPlaybackJob(Job):
+    """
+    Open the MIDI port, queue the scale on the scheduler and follow it until done.
+
+    The job plays through a Synthesizer of its own (with its own scheduler
+    thread), so nothing on the worker thread touches the GUI's synthesizer;
+    ports are shared through the MIDIPortManager and stay open afterwards.
+    """
+
+    def __init__(self, scale: Scale, port_name: Optional[str] = None, note_duration: float = 0.5,
+                 midi_tuning: str = 'mpe'):
+        super().__init__()
+        self.scale = scale
+        self.port_name = port_name
+        self.note_duration = note_duration
+        self.midi_tuning = midi_tuning
+
+    def work(self):
+        synth = Synthesizer(midi_tuning=self.midi_tuning)
+        try:
+            synth.set_midi_port(self.port_name)
+            if self.cancelled.is_set():
+                return
+            synth.play_scale(self.scale, self.note_duration, use_midi=True)
+            scheduler = synth.midi_scheduler
+            total = scheduler.pending
+            while not scheduler.wait_idle(POLL_INTERVAL):
+                if self.cancelled.is_set():
+                    return
+                self.signals.progress.emit(self.job_id, 1.0 - scheduler.pending / total if total else 1.0)
+        finally:
+            # Releases sounding notes and stops the scheduler thread
+            synth.close_midi()
+
+
+class PlaybackController(QObject):
+    """
+    Run playback jobs on a single-thread QThreadPool, one at a time.
+
+    Starting a job cancels the current one first; because the pool has one
+    thread the new job only begins once the old one has released the audio
+    device. Signals are re-emitted for the current job only, so progress from
+    a preempted job never reaches the GUI.
+    """
+    started = pyqtSignal()
+    progress = pyqtSignal(float)
+    finished = pyqtSignal()
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.current: Optional[Job] = None
+        # Jobs queued or running, kept alive until they report back
+        self._jobs = {}
+
+    def play(self, job: Job):
+        self.stop()
+        self.current = job
+        self._jobs[job.job_id] = job
+        job.signals.started.connect(self._on_started)
+        job.signals.progress.connect(self._on_progress)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.cancelled.connect(self._on_cancelled)
+        job.signals.failed.connect(self._on_failed)
+        self.pool.start(job)
+
+    def stop(self):
+        if self.current is not None:
+            self.current.cancel()
+
+    def is_busy(self) -> bool:
+        return self.current is not None
+
+    def shutdown(self, timeout_ms: int = 2000):
+        """Cancel everything and wait for the worker thread (call from closeEvent)."""
+        for job in self._jobs.values():
+            job.cancel()
+        self.pool.clear()
+        self.pool.waitForDone(timeout_ms)
+
+    def _is_current(self, job_id: int) -> bool:
+        return self.current is not None and self.current.job_id == job_id
+
+    def _release(self, job_id: int) -> bool:
+        self._jobs.pop(job_id, None)
+        if not self._is_current(job_id):
+            return False
+        self.current = None
+        return True
+
+    def _on_started(self, job_id: int):
+        if self._is_current(job_id):
+            self.started.emit()
+
+    def _on_progress(self, job_id: int, fraction: float):
+        if self._is_current(job_id):
+            self.progress.emit(fraction)
+
+    def _on_finished(self, job_id: int):
+        if self._release(job_id):
+            self.finished.emit()
+
+    def _on_cancelled(self, job_id: int):
+        if self._release(job_id):
+            self.cancelled.emit()
+
+    def _on_failed(self, job_id: int, message: str):
+        if self._release(job_id):
+            self.failed.emit(message)
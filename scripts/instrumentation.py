@@ -0,0 +1,264 @@
+import bisect
+import cProfile
+import functools
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Upper edges of the duration histogram buckets in seconds: 1 us to ~10 s, four per decade
+BUCKET_EDGES = tuple(10 ** (exponent / 4) * 1e-6 for exponent in range(29))
+
+_enabled = False
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    """Start recording timers, counters and histograms (off by default)."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+# POLYGAMME_METRICS=1 turns recording on from the start in any entry point
+if os.environ.get('POLYGAMME_METRICS'):
+    enable()
+
+
+class Histogram:
+    """Count, total, min, max and log-spaced buckets of observed values."""
+
+    def __init__(self, edges=BUCKET_EDGES):
+        self.edges = edges
+        self.buckets = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.buckets[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: upper edge of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for i, count in enumerate(self.buckets):
+            running += count
+            if running >= target:
+                return min(self.edges[i] if i < len(self.edges) else self.max, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+_counters: Dict[str, int] = {}
+_histograms: Dict[str, Histogram] = {}
+# Callables polled when a report is made (cache statistics and the like), so
+# components that already keep their own counters cost nothing extra
+_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def count(name: str, amount: int = 1):
+    """Add to a counter (no-op while disabled)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, value: float):
+    """Record a value (seconds for timers) in a histogram (no-op while disabled)."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(value)
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """Context manager timing its block into the histogram `name`; a shared no-op while disabled."""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name: str):
+    """Decorator timing every call of a function; costs one flag check while disabled."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def register_source(name: str, source: Callable[[], dict]):
+    """Include source() in every report under `name`."""
+    _sources[name] = source
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot() -> dict:
+    """Current counters, histograms and polled sources as plain data."""
+    with _lock:
+        data = {
+            'counters': dict(_counters),
+            'timers': {name: histogram.to_dict() for name, histogram in _histograms.items()},
+        }
+    sources = {}
+    for name, source in list(_sources.items()):
+        try:
+            sources[name] = source()
+        except Exception as error:
+            sources[name] = {'error': str(error)}
+    data['sources'] = sources
+    return data
+
+
+def report_json(indent: Optional[int] = 1) -> str:
+    return json.dumps(snapshot(), indent=indent, default=str)
+
+
+def report_text() -> str:
+    data = snapshot()
+    lines = []
+    if data['timers']:
+        lines.append(f"{'timer':<28} {'count':>8} {'total ms':>10} {'mean us':>9} {'p50 us':>8} "
+                     f"{'p99 us':>8} {'max us':>9}")
+        for name, stats in sorted(data['timers'].items()):
+            lines.append(f"{name:<28} {stats['count']:>8} {stats['total'] * 1e3:>10.2f} {stats['mean'] * 1e6:>9.1f} "
+                         f"{stats['p50'] * 1e6:>8.1f} {stats['p99'] * 1e6:>8.1f} {stats['max'] * 1e6:>9.1f}")
+    if data['counters']:
+        lines.append('')
+        lines.extend(f"{name:<28} {value:>8}" for name, value in sorted(data['counters'].items()))
+    for name, values in sorted(data['sources'].items()):
+        lines.append('')
+        lines.append(f"{name}: " + ', '.join(f"{key}={value}" for key, value in values.items()))
+    return '\n'.join(lines) if lines else "No metrics recorded (instrumentation disabled?)"
+
+
+class ProfileCapture:
+    """
+    cProfile and tracemalloc capture that can be started and stopped at will.
+
+    cProfile only sees the thread that called start(); tracemalloc covers
+    every thread. stop() writes <prefix>.prof (open with pstats or snakeviz),
+    <prefix>.txt (top functions, top allocation sites and the metrics report)
+    and returns the text.
+    """
+
+    def __init__(self, prefix, top: int = 25):
+        self.prefix = Path(prefix)
+        self.top = top
+        self.profiler = cProfile.Profile()
+        self._was_enabled = False
+        self.running = False
+
+    def start(self):
+        self._was_enabled = _enabled
+        enable()
+        tracemalloc.start()
+        self.profiler.enable()
+        self.running = True
+
+    def stop(self) -> str:
+        self.profiler.disable()
+        snapshot_memory = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if not self._was_enabled:
+            disable()
+        self.running = False
+
+        self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(f"{self.prefix}.prof")
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(self.top)
+        lines = [stream.getvalue(), f"Peak traced memory: {peak / 1e6:.1f} MB", "Top allocation sites:"]
+        lines.extend(str(stat) for stat in snapshot_memory.statistics('lineno')[:self.top])
+        lines.extend(['', report_text()])
+        text = '\n'.join(lines)
+        with open(f"{self.prefix}.txt", 'w') as file:
+            file.write(text)
+        return text
+
+
+@contextmanager
+def profile_capture(prefix, top: int = 25):
+    """Capture a cProfile/tracemalloc profile of the block (see ProfileCapture)."""
+    capture = ProfileCapture(prefix, top)
+    capture.start()
+    try:
+        yield capture
+    finally:
+        capture.stop()
@@ -1,8 +1,20 @@
+import functools
 import math
+import threading
 import numpy as np
 from dataclasses import dataclass
-from typing import List, Optional
-from midi_output import MIDIOutput
+from collections.abc import Mapping, MutableMapping, Sequence
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from render import NOTE_GAP, ScaleRenderer
+from render_cache import RenderCache, render_key
+from streaming import StreamingEngine
+from polyphony import Envelope, NoteEvent, PolyphonicRenderer
+from wavetable import WavetableOscillator
+import polytonic
+import instrumentation
+
+if TYPE_CHECKING:
+    from control_synths import Patch
 
 @dataclass
 class Note:
@@ -10,58 +22,107 @@ class Note:
     midi_note: int
     name: Optional[str] = None
 
+class NoteView(Sequence):
+    """
+    Read-only list of Note objects over a Scale's arrays.
+
+    Notes are created on access, so scales with thousands of pitches never
+    hold one Python object per note unless a caller iterates them.
+    """
+
+    def __init__(self, scale: 'Scale'):
+        self._scale = scale
+
+    def __len__(self):
+        return len(self._scale.frequencies)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        scale = self._scale
+        name = scale.names[index] if scale.names is not None else None
+        return Note(frequency=float(scale.frequencies[index]), midi_note=int(scale.midi_notes[index]), name=name)
+
 class Scale:
+    """
+    A tuning stored as contiguous arrays, one entry per note.
+
+    Attributes:
+        frequencies: Frequency of every note in Hz (float64)
+        cents: Distance of every note from base_frequency in cents
+        midi_notes: Nearest 12-TET MIDI key of every note
+        bends: Offset of every note from its MIDI key in cents (-50..50)
+        names: Optional note names (e.g. 'F#1'), or None
+    """
+
     def __init__(self, base_frequency: float = 440.0, base_midi_note: int = 69):
         self.base_frequency = base_frequency
         self.base_midi_note = base_midi_note
-        self.notes: List[Note] = []
+        self.frequencies = np.zeros(0)
+        self.cents = np.zeros(0)
+        self.midi_notes = np.zeros(0, dtype=np.int64)
+        self.bends = np.zeros(0)
+        self.names: Optional[List[str]] = None
 
     def frequency_to_midi_note(self, frequency: float) -> int:
         return round(12 * math.log2(frequency / self.base_frequency) + self.base_midi_note)
 
+    def set_frequencies(self, frequencies, names: Optional[List[str]] = None):
+        """Replace the notes of the scale; every derived array is computed in one pass."""
+        self.frequencies = np.ascontiguousarray(frequencies, dtype=np.float64)
+        self.cents = 1200 * np.log2(self.frequencies / self.base_frequency)
+        semitones = self.cents / 100 + self.base_midi_note
+        self.midi_notes = np.round(semitones).astype(np.int64)
+        self.bends = (semitones - self.midi_notes) * 100
+        self.names = list(names) if names is not None else None
+        return self
+
+    def set_ratios(self, ratios, names: Optional[List[str]] = None):
+        """Replace the notes of the scale with ratios relative to base_frequency."""
+        return self.set_frequencies(self.base_frequency * np.asarray(ratios, dtype=np.float64), names)
+
+    @property
+    def notes(self) -> NoteView:
+        """Note objects for each entry (built lazily; kept for compatibility)."""
+        return NoteView(self)
+
+    @notes.setter
+    def notes(self, notes: List[Note]):
+        names = [note.name for note in notes]
+        self.set_frequencies([note.frequency for note in notes],
+                             names if any(name is not None for name in names) else None)
+
+    def __len__(self):
+        return len(self.frequencies)
+
     def generate_arabic_rast(self):
         """
         Generate an Arabic Rast scale.
         Intervals: 1/1, 9/8, 5/4, 4/3, 3/2, 5/3, 15/8, 2/1
         """
-        ratios = [1, 9/8, 5/4, 4/3, 3/2, 5/3, 15/8, 2]
-        self.notes = [Note(frequency=self.base_frequency * ratio, 
-                           midi_note=self.frequency_to_midi_note(self.base_frequency * ratio)) 
-                      for ratio in ratios]
-        return self
+        return self.set_ratios([1, 9/8, 5/4, 4/3, 3/2, 5/3, 15/8, 2])
 
     def generate_indian_shruti(self):
         """
         Generate a 22 Shruti scale used in Indian classical music.
         """
-        cents = [0, 90, 112, 182, 204, 294, 316, 386, 408, 498, 520,
-                 590, 612, 702, 792, 814, 884, 906, 996, 1018, 1088, 1110]
-        self.notes = [Note(frequency=self.base_frequency * (2 ** (cent / 1200)),
-                           midi_note=self.frequency_to_midi_note(self.base_frequency * (2 ** (cent / 1200))))
-                      for cent in cents]
-        return self
+        cents = np.array([0, 90, 112, 182, 204, 294, 316, 386, 408, 498, 520,
+                          590, 612, 702, 792, 814, 884, 906, 996, 1018, 1088, 1110])
+        return self.set_ratios(2 ** (cents / 1200))
 
     def generate_indonesian_slendro(self):
         """
         Generate an Indonesian Slendro scale (5-tone scale).
         Approximated intervals: 1/1, 9/8, 5/4, 11/8, 3/2, 2/1
         """
-        ratios = [1, 9/8, 5/4, 11/8, 3/2, 2]
-        self.notes = [Note(frequency=self.base_frequency * ratio,
-                           midi_note=self.frequency_to_midi_note(self.base_frequency * ratio))
-                      for ratio in ratios]
-        return self
+        return self.set_ratios([1, 9/8, 5/4, 11/8, 3/2, 2])
 
     def generate_indonesian_pelog(self):
         """
         Generate an Indonesian Pelog scale (7-tone scale).
         Approximated intervals: 1/1, 9/8, 5/4, 4/3, 3/2, 13/8, 7/4, 2/1
         """
-        ratios = [1, 9/8, 5/4, 4/3, 3/2, 13/8, 7/4, 2]
-        self.notes = [Note(frequency=self.base_frequency * ratio,
-                           midi_note=self.frequency_to_midi_note(self.base_frequency * ratio))
-                      for ratio in ratios]
-        return self
+        return self.set_ratios([1, 9/8, 5/4, 4/3, 3/2, 13/8, 7/4, 2])
 
     def generate_equal_temperament(self, divisions_per_octave: int, num_octaves: int = 1):
         """
@@ -71,12 +132,8 @@ class Scale:
             divisions_per_octave: Number of equal divisions per octave
             num_octaves: Number of octaves to generate
         """
-        self.notes = []
-        for i in range(divisions_per_octave * num_octaves):
-            frequency = self.base_frequency * math.pow(2, i / divisions_per_octave)
-            midi_note = self.frequency_to_midi_note(frequency)
-            self.notes.append(Note(frequency=frequency, midi_note=midi_note))
-        return self
+        steps = np.arange(divisions_per_octave * num_octaves)
+        return self.set_ratios(np.exp2(steps / divisions_per_octave))
 
     def generate_harmonic_series(self, num_harmonics: int):
         """
@@ -85,12 +142,7 @@ class Scale:
         Args:
             num_harmonics: Number of harmonics to generate
         """
-        self.notes = []
-        for i in range(1, num_harmonics + 1):
-            frequency = self.base_frequency * i
-            midi_note = self.frequency_to_midi_note(frequency)
-            self.notes.append(Note(frequency=frequency, midi_note=midi_note))
-        return self
+        return self.set_ratios(np.arange(1, num_harmonics + 1))
 
     def generate_custom_ratios(self, ratios: List[float]):
         """
@@ -99,17 +151,66 @@ class Scale:
         Args:
             ratios: List of frequency ratios relative to the base frequency
         """
-        self.notes = []
-        for ratio in ratios:
-            frequency = self.base_frequency * ratio
-            midi_note = self.frequency_to_midi_note(frequency)
-            self.notes.append(Note(frequency=frequency, midi_note=midi_note))
-        return self
+        return self.set_ratios(ratios)
+
+    def set_cents(self, cents, names: Optional[List[str]] = None):
+        """Replace the notes of the scale with offsets in cents above base_frequency."""
+        return self.set_ratios(np.exp2(np.asarray(cents, dtype=np.float64) / 1200), names)
+
+    def generate_polytonic(self, divisions_per_octave: List[int], include_top: bool = False):
+        """
+        Generate a multi-octave scale where each octave has its own equal division.
+
+        Args:
+            divisions_per_octave: Number of steps in each successive octave,
+                e.g. [5, 7, 12, 24] for wide steps in the bass and narrow ones in the treble
+            include_top: Also add the octave closing the range
+        """
+        return self.set_cents(polytonic.divisions_cents(tuple(divisions_per_octave), include_top))
+
+    def generate_octave_patterns(self, patterns: List[List[float]], include_top: bool = False):
+        """
+        Generate a multi-octave scale where each octave has its own interval structure.
+
+        Args:
+            patterns: For every octave, the cents (0 to 1200) of its notes
+            include_top: Also add the octave closing the range
+        """
+        return self.set_cents(polytonic.patterns_cents(polytonic.as_tuple(patterns), include_top))
+
+    def generate_density(self, densities: List[float], num_octaves: float, include_top: bool = False):
+        """
+        Generate a scale whose spacing changes continuously across the range.
+
+        Args:
+            densities: Notes per octave at evenly spaced points from bottom to top
+                (e.g. [4, 24] goes from 4 notes per octave in the bass to 24 in the treble)
+            num_octaves: Width of the range in octaves
+            include_top: Also add a note at the top of the range
+        """
+        return self.set_cents(polytonic.density_cents(tuple(float(d) for d in densities),
+                                                      float(num_octaves), include_top))
 
 class Synthesizer:
-    def __init__(self, sample_rate: int = 44100):
+    def __init__(self, sample_rate: int = 44100, oscillator: str = 'direct', midi_tuning: str = 'mpe',
+                 render_cache: Optional[RenderCache] = None):
+        """
+        Args:
+            sample_rate: Output sample rate in Hz
+            oscillator: 'direct' to evaluate the waveform formulas, or 'wavetable'
+                to read cached band-limited tables (no aliasing on sawtooth/square)
+            midi_tuning: 'mpe' (pitch bend with channel rotation) or 'mts'
+                (MIDI Tuning Standard sysex) for microtonal MIDI output
+            render_cache: Optional RenderCache reused for identical notes and
+                scales; cached buffers are returned read-only
+        """
         self.sample_rate = sample_rate
+        self.oscillator = oscillator
+        self.midi_tuning = midi_tuning
+        self.render_cache = render_cache
         self.midi_output = None
+        self.midi_scheduler = None
+        self._midi_tuner = None
 
     def generate_sine_wave(self, frequency: float, duration: float) -> np.ndarray:
         """Generate a sine wave at the specified frequency."""
@@ -126,8 +227,21 @@ class Synthesizer:
         t = np.linspace(0, duration, int(self.sample_rate * duration), False)
         return np.sign(np.sin(2 * np.pi * frequency * t))
 
+    @instrumentation.timed('synth.generate_wave')
     def generate_wave(self, frequency: float, duration: float, waveform: str) -> np.ndarray:
         """Generate a wave of the specified type."""
+        if self.render_cache is not None:
+            key = render_key('wave', frequency, duration, waveform, self.sample_rate, oscillator=self.oscillator)
+            wave = self.render_cache.get(key)
+            if wave is None:
+                wave = self.render_cache.put(key, self._generate_wave(frequency, duration, waveform))
+            return wave
+        return self._generate_wave(frequency, duration, waveform)
+
+    def _generate_wave(self, frequency: float, duration: float, waveform: str) -> np.ndarray:
+        if self.oscillator == 'wavetable':
+            oscillator = WavetableOscillator(waveform, self.sample_rate)
+            return oscillator.render(frequency, int(self.sample_rate * duration))
         if waveform == 'sine':
             return self.generate_sine_wave(frequency, duration)
         elif waveform == 'sawtooth':
@@ -137,7 +251,8 @@ class Synthesizer:
         else:
             raise ValueError(f"Unsupported waveform type: {waveform}")
 
-    def play_scale(self, scale: Scale, note_duration: float = 0.5, waveform: str = 'sine', use_midi: bool = False) -> np.ndarray:
+    def play_scale(self, scale: Scale, note_duration: float = 0.5, waveform: str = 'sine', use_midi: bool = False,
+                   dtype=np.float64, patch: Optional['Patch'] = None) -> np.ndarray:
         """
         Generate audio for playing all notes in a scale.
         
@@ -145,73 +260,256 @@ class Synthesizer:
             scale: Scale object containing the notes to play
             note_duration: Duration of each note in seconds
             waveform: Type of waveform to generate ('sine', 'sawtooth', or 'square')
-            use_midi: If True, use MIDI output instead of generating waveform
+            use_midi: If True, use MIDI output instead of generating waveform. The
+                notes are queued on a background MIDIScheduler and this returns
+                immediately; a new call replaces whatever is still playing.
+            dtype: Sample type of the returned waveform (np.float64 or np.float32)
+            patch: Optional synth patch whose automation runs alongside the notes
+                (as CC/NRPN messages over MIDI, as gain and cutoff on audio)
         
         Returns:
             numpy array containing the complete waveform (if use_midi is False)
         """
         if use_midi:
+            # The MIDI stack (mido and the port backends) loads on first use only
+            from control_synths import schedule_automation
+            from midi_scheduler import DEFAULT_LEAD_TIME, MIDIScheduler
+            from midi_tuning import MTS_MAX_KEYS, MicrotonalMIDI
+
+            if self.midi_tuning == 'mts' and len(scale) > MTS_MAX_KEYS:
+                # Checked here: load_scale runs on the scheduler thread
+                raise ValueError(f"Scale has {len(scale)} degrees; MTS can retune at most {MTS_MAX_KEYS} keys")
             if self.midi_output is None:
-                self.midi_output = MIDIOutput()
-            
-            for note in scale.notes:
-                self.midi_output.send_note_on(note.midi_note)
-                self.midi_output.send_note_off(note.midi_note)
+                self.set_midi_port(None)
+            if self.midi_scheduler is None:
+                self.midi_scheduler = MIDIScheduler()
+                self.midi_scheduler.start()
+            self.stop_midi()
+
+            # Notes keep their exact pitch instead of rounding to 12-TET keys
+            tuner = MicrotonalMIDI(self.midi_output, self.midi_tuning)
+            self._midi_tuner = tuner
+            scheduler = self.midi_scheduler
+            scheduler.call_soon(tuner.load_scale, scale)
+            start = scheduler.now() + DEFAULT_LEAD_TIME * scheduler.bpm / 60.0
+            for degree in range(len(scale)):
+                onset = start + degree * (note_duration + NOTE_GAP)
+                scheduler.schedule(onset, tuner.note_on, degree)
+                scheduler.schedule(onset + note_duration, tuner.note_off, degree)
+            if patch is not None:
+                schedule_automation(scheduler, self.midi_output, patch, start,
+                                    until=len(scale) * (note_duration + NOTE_GAP))
             return None
         else:
-            waveform_data = np.array([])
-            for note in scale.notes:
-                note_wave = self.generate_wave(note.frequency, note_duration, waveform)
-                # Add a small silence between notes
-                silence = np.zeros(int(0.1 * self.sample_rate))
-                waveform_data = np.concatenate([waveform_data, note_wave, silence])
-            return waveform_data
+            # Every note is followed by a small silence; the renderer
+            # allocates the whole buffer once and fills it note by note
+            instrumentation.count('synth.notes_rendered', len(scale))
+            with instrumentation.timer('synth.render_scale'):
+                renderer = ScaleRenderer(self.sample_rate, dtype=dtype, oscillator=self.oscillator,
+                                         cache=self.render_cache)
+                if self.render_cache is None:
+                    waveform_data = renderer.render(scale.frequencies, note_duration, waveform)
+                else:
+                    key = render_key('scale', scale.frequencies, note_duration, waveform, self.sample_rate,
+                                     oscillator=self.oscillator, dtype=np.dtype(dtype).str, gap=NOTE_GAP)
+                    waveform_data = self.render_cache.get(key)
+                    if waveform_data is None:
+                        waveform_data = self.render_cache.put(key, renderer.render(scale.frequencies, note_duration,
+                                                                                   waveform))
+                    if patch is not None:
+                        # The cache holds the dry render; automation is applied to a copy
+                        waveform_data = waveform_data.copy()
+                if patch is not None:
+                    patch.processor(self.sample_rate).process_buffer(waveform_data)
+                return waveform_data
+
+    def stream_scale(self, scale: Scale, note_duration: float = 0.5, waveform: str = 'sine',
+                     blocksize: int = 1024, patch: Optional['Patch'] = None) -> StreamingEngine:
+        """
+        Create a streaming engine that plays the scale block by block.
+
+        Args:
+            scale: Scale object containing the notes to play
+            note_duration: Duration of each note in seconds
+            waveform: Type of waveform to generate ('sine', 'sawtooth', or 'square')
+            blocksize: Number of frames generated per block
+            patch: Optional synth patch whose gain and cutoff automation is applied per block
+
+        Returns:
+            StreamingEngine to hand to a sink (sounddevice, WAV file or null)
+        """
+        processor = patch.processor(self.sample_rate, blocksize) if patch is not None else None
+        engine = StreamingEngine(self.sample_rate, waveform, blocksize, oscillator=self.oscillator,
+                                 processor=processor)
+        engine.enqueue((frequency, note_duration) for frequency in scale.frequencies.tolist())
+        return engine
+
+    def render_sequence(self, scale: Scale, note_duration: float = 0.5, waveform: str = 'sine',
+                        workers: Optional[int] = None, dtype=np.float64) -> np.ndarray:
+        """
+        Render a long scale or note sequence on several cores.
+
+        The notes play one after another with phase-continuous voices, as in
+        stream_scale; the result is bit-identical to the serial render
+        whatever the number of workers.
+
+        Args:
+            scale: Scale object containing the notes to play
+            note_duration: Duration of each note in seconds
+            waveform: Type of waveform to generate ('sine', 'sawtooth', or 'square')
+            workers: Number of worker processes (defaults to the number of cores)
+            dtype: Sample type of the returned waveform
+
+        Returns:
+            numpy array containing the whole sequence
+        """
+        from parallel_render import ParallelRenderer
+
+        renderer = ParallelRenderer(self.sample_rate, waveform, oscillator=self.oscillator, workers=workers)
+        return renderer.render(((frequency, note_duration) for frequency in scale.frequencies.tolist()),
+                               dtype=dtype)
+
+    def render_events(self, events: List[NoteEvent], waveform: str = 'sine', envelope: Optional[Envelope] = None,
+                      headroom_db: float = 1.0, dtype=np.float64) -> np.ndarray:
+        """
+        Render overlapping note events (chords, clusters, arpeggios).
+
+        Args:
+            events: NoteEvent objects giving note, onset, duration and velocity
+            waveform: Type of waveform to generate ('sine', 'sawtooth', or 'square')
+            envelope: ADSR envelope applied to every voice (defaults to Envelope())
+            headroom_db: How far below full scale the limiter keeps the mix
+            dtype: Sample type of the returned waveform
+
+        Returns:
+            numpy array containing the mixed waveform
+        """
+        renderer = PolyphonicRenderer(self.sample_rate, waveform, envelope,
+                                      headroom_db=headroom_db, oscillator=self.oscillator)
+        return renderer.render(events, dtype=dtype)
+
+    def play_cluster(self, scale: Scale, duration: float = 2.0, waveform: str = 'sine',
+                     velocity: int = 64, envelope: Optional[Envelope] = None) -> np.ndarray:
+        """
+        Generate audio for all notes of a scale sounding together.
+
+        Args:
+            scale: Scale object containing the notes to play
+            duration: Duration of the cluster in seconds
+            waveform: Type of waveform to generate ('sine', 'sawtooth', or 'square')
+            velocity: MIDI-style velocity (0-127) of every note
+
+        Returns:
+            numpy array containing the complete waveform
+        """
+        events = [NoteEvent(frequency, 0.0, duration, velocity) for frequency in scale.frequencies.tolist()]
+        return self.render_events(events, waveform, envelope)
+
+    def set_midi_port(self, port_name: Optional[str] = None):
+        """
+        Send MIDI to the named port (None for the default port).
+
+        Ports are opened through the shared MIDIPortManager, so switching back
+        to a port used before does not reopen it.
+        """
+        from midi_ports import get_port_manager
+
+        output = get_port_manager().output(port_name)
+        if self.midi_output is not None and output.port is not None and self.midi_output.port is output.port:
+            return
+        self.stop_midi()
+        self.midi_output = output
+
+    def stop_midi(self):
+        """Cancel queued MIDI notes and release any that are sounding."""
+        if self.midi_scheduler is not None:
+            self.midi_scheduler.cancel_all()
+            if self._midi_tuner is not None:
+                self.midi_scheduler.call_soon(self._midi_tuner.all_notes_off)
 
     def close_midi(self):
+        if self.midi_scheduler is not None:
+            self.stop_midi()
+            self.midi_scheduler.wait_idle(1.0)
+            self.midi_scheduler.stop()
+            self.midi_scheduler = None
         if self.midi_output:
             self.midi_output.close_port()
             self.midi_output = None
 
-def create_example_scales():
-    """Create some example scales to demonstrate different tuning systems."""
+class ScaleRegistry(MutableMapping):
+    """
+    Scales by name, each built by its factory on first access.
+
+    Listing or counting the names builds nothing, so a caller that only plays
+    one scale (or only lists them) pays for that one. Assigning a Scale
+    registers it as already built. A scale is built once even when several
+    threads ask for it at the same time (e.g. a background pre-warm pass).
+    """
+
+    def __init__(self, factories: Optional[Dict[str, Callable[[], 'Scale']]] = None):
+        self._factories: Dict[str, Callable[[], Scale]] = dict(factories or {})
+        self._scales: Dict[str, Scale] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], 'Scale']):
+        self._factories[name] = factory
+        self._scales.pop(name, None)
+
+    def include(self, scales: Mapping):
+        """Register every name of another mapping, fetched from it on first access."""
+        for name in scales:
+            self.register(name, functools.partial(scales.__getitem__, name))
+
+    def is_built(self, name: str) -> bool:
+        return name in self._scales
+
+    def __getitem__(self, name: str) -> Scale:
+        scale = self._scales.get(name)
+        if scale is None:
+            with self._lock:
+                scale = self._scales.get(name)
+                if scale is None:
+                    scale = self._scales[name] = self._factories[name]()
+        return scale
+
+    def __setitem__(self, name: str, scale: Scale):
+        self._factories[name] = lambda: scale
+        self._scales[name] = scale
+
+    def __delitem__(self, name: str):
+        del self._factories[name]
+        self._scales.pop(name, None)
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self):
+        return len(self._factories)
+
+
+# Example scales demonstrating different tuning systems
+EXAMPLE_SCALES = {
     # Standard 12-tone equal temperament
-    twelve_tet = Scale().generate_equal_temperament(12)
-    
+    "12-TET": lambda: Scale().generate_equal_temperament(12),
     # Quarter-tone scale (24 divisions per octave)
-    quarter_tone = Scale().generate_equal_temperament(24)
-    
+    "Quarter-tone": lambda: Scale().generate_equal_temperament(24),
     # Third-tone scale (36 divisions per octave)
-    third_tone = Scale().generate_equal_temperament(36)
-    
+    "Third-tone": lambda: Scale().generate_equal_temperament(36),
     # First 16 harmonics of the harmonic series
-    harmonic = Scale().generate_harmonic_series(16)
-    
+    "Harmonic": lambda: Scale().generate_harmonic_series(16),
     # Custom ratio scale (example: 1:1, 5:4, 4:3, 3:2, 5:3, 2:1)
-    just_intonation = Scale().generate_custom_ratios([1.0, 1.25, 1.333, 1.5, 1.667, 2.0])
-    
-    # Arabic Rast scale
-    arabic_rast = Scale().generate_arabic_rast()
-    
-    # Indian Shruti scale
-    indian_shruti = Scale().generate_indian_shruti()
-    
-    # Indonesian Slendro scale
-    indonesian_slendro = Scale().generate_indonesian_slendro()
-    
-    # Indonesian Pelog scale
-    indonesian_pelog = Scale().generate_indonesian_pelog()
-    
-    return {
-        "12-TET": twelve_tet,
-        "Quarter-tone": quarter_tone,
-        "Third-tone": third_tone,
-        "Harmonic": harmonic,
-        "Just Intonation": just_intonation,
-        "Arabic Rast": arabic_rast,
-        "Indian Shruti": indian_shruti,
-        "Indonesian Slendro": indonesian_slendro,
-        "Indonesian Pelog": indonesian_pelog
-    }
+    "Just Intonation": lambda: Scale().generate_custom_ratios([1.0, 1.25, 1.333, 1.5, 1.667, 2.0]),
+    "Arabic Rast": lambda: Scale().generate_arabic_rast(),
+    "Indian Shruti": lambda: Scale().generate_indian_shruti(),
+    "Indonesian Slendro": lambda: Scale().generate_indonesian_slendro(),
+    "Indonesian Pelog": lambda: Scale().generate_indonesian_pelog(),
+}
+
+
+def create_example_scales() -> ScaleRegistry:
+    """Registry of the example scales; each is generated the first time it is looked up."""
+    return ScaleRegistry(EXAMPLE_SCALES)
 
 if __name__ == "__main__":
     # Example usage
@@ -225,5 +523,5 @@ if __name__ == "__main__":
     # The waveform can be played using sounddevice or saved to a WAV file
     # For now, we'll just print the frequencies to verify
     print("Quarter-tone scale frequencies:")
-    for note in quarter_tone_scale.notes:
-        print(f"{note.frequency:.2f} Hz")
+    for frequency in quarter_tone_scale.frequencies:
+        print(f"{frequency:.2f} Hz")
@@ -1,10 +1,51 @@
-import mido
+import functools
 import time
+from contextlib import contextmanager
+
+import mido
+
+import instrumentation
+from midi_scheduler import DEFAULT_LEAD_TIME, MIDIScheduler
+
+
+@functools.lru_cache(maxsize=8192)
+def cached_message(msg_type, channel=0, **values):
+    """
+    Shared, prebuilt mido.Message for a (type, channel, values) combination.
+
+    Building a Message validates every field, which dominates the cost of a
+    send; notes and bends repeat constantly so they are built once and reused.
+    The returned messages must not be modified.
+    """
+    instrumentation.count('midi.messages_built')
+    return mido.Message(msg_type, channel=channel, **values)
+
+
+instrumentation.register_source('midi.message_cache', lambda: cached_message.cache_info()._asdict())
+
+class MemoryOutputPort(mido.ports.BaseOutput):
+    """In-memory MIDI output port that records every message sent (for tests and dry runs)."""
+
+    def _open(self, **kwargs):
+        self.messages = []
+
+    def _send(self, msg):
+        self.messages.append(msg)
+
 
 class MIDIOutput:
-    def __init__(self, port_name=None):
+    def __init__(self, port_name=None, port=None, auto_open=True):
         self.port = None
-        self.open_port(port_name)
+        # Ports handed in (shared by MIDIPortManager, virtual ports...) are not closed by close_port
+        self.owns_port = port is None
+        self._batch = None
+        self._batch_depth = 0
+        self.stats = {'messages': 0, 'flushes': 0, 'send_time': 0.0}
+        if port is not None:
+            # Use an already opened port (e.g. MemoryOutputPort or a virtual port)
+            self.port = port
+        elif auto_open:
+            self.open_port(port_name)
 
     def open_port(self, port_name=None):
         if port_name:
@@ -23,34 +64,105 @@ class MIDIOutput:
 
     def close_port(self):
         if self.port:
-            self.port.close()
+            self.flush()
+            if self.owns_port:
+                self.port.close()
             self.port = None
 
+    def send(self, msg):
+        """Send a message now, or queue it if a batch is open."""
+        if not self.port:
+            return
+        if self._batch is not None:
+            self._batch.append(msg)
+            return
+        start = time.perf_counter()
+        self.port.send(msg)
+        elapsed = time.perf_counter() - start
+        self.stats['messages'] += 1
+        self.stats['send_time'] += elapsed
+        instrumentation.observe('midi.port_send', elapsed)
+
+    @contextmanager
+    def batch(self):
+        """Queue every message sent inside the block and flush them in one burst at the end."""
+        if self._batch is None:
+            self._batch = []
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self):
+        """Send every queued message back to back."""
+        pending, self._batch = self._batch, None
+        if not pending or not self.port:
+            return
+        send = self.port.send
+        start = time.perf_counter()
+        for msg in pending:
+            send(msg)
+        elapsed = time.perf_counter() - start
+        self.stats['messages'] += len(pending)
+        self.stats['flushes'] += 1
+        self.stats['send_time'] += elapsed
+        instrumentation.observe('midi.port_flush', elapsed)
+        instrumentation.count('midi.batched_messages', len(pending))
+
     def send_note_on(self, note, velocity=64, channel=0):
         if self.port:
-            msg = mido.Message('note_on', note=note, velocity=velocity, channel=channel)
-            self.port.send(msg)
+            self.send(cached_message('note_on', channel, note=note, velocity=velocity))
 
     def send_note_off(self, note, velocity=64, channel=0):
         if self.port:
-            msg = mido.Message('note_off', note=note, velocity=velocity, channel=channel)
-            self.port.send(msg)
+            self.send(cached_message('note_off', channel, note=note, velocity=velocity))
 
     def send_control_change(self, control, value, channel=0):
         if self.port:
-            msg = mido.Message('control_change', control=control, value=value, channel=channel)
-            self.port.send(msg)
+            self.send(cached_message('control_change', channel, control=control, value=value))
+
+    def send_pitch_bend(self, pitch, channel=0):
+        if self.port:
+            self.send(cached_message('pitchwheel', channel, pitch=pitch))
+
+    def send_messages(self, messages):
+        """Send prebuilt messages back to back in one batch."""
+        if self.port:
+            with self.batch():
+                for msg in messages:
+                    self.send(msg)
 
-    def play_scale(self, scale, duration=0.5):
+    def send_sysex(self, data):
+        if self.port:
+            self.send(mido.Message('sysex', data=data))
+
+    def play_scale(self, scale, duration=0.5, blocking=True):
+        """
+        Play a list of MIDI notes one after another on a scheduler thread.
+
+        Args:
+            scale: MIDI note numbers to play
+            duration: Duration of each note in seconds
+            blocking: If False, return immediately with the running MIDIScheduler
+        """
         if not self.port:
             print("MIDI output port is not open")
-            return
+            return None
 
-        for note in scale:
-            self.send_note_on(note)
-            time.sleep(duration)
-            self.send_note_off(note)
-            time.sleep(0.1)  # Short pause between notes
+        scheduler = MIDIScheduler()
+        scheduler.start()
+        start = scheduler.now() + DEFAULT_LEAD_TIME * scheduler.bpm / 60.0
+        for i, note in enumerate(scale):
+            onset = start + i * (duration + 0.1)  # Short pause between notes
+            scheduler.schedule(onset, self.send_note_on, note)
+            scheduler.schedule(onset + duration, self.send_note_off, note)
+        if blocking:
+            scheduler.wait_idle()
+            scheduler.stop()
+        return scheduler
 
 def list_midi_output_ports():
     return mido.get_output_names()
@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import mido
+
+import instrumentation
+from midi_output import MIDIOutput
+
+
+class MIDIPortManager:
+    """
+    Keep named MIDI output ports open and hand out MIDIOutput wrappers sharing them.
+
+    Opening a port can cost tens of milliseconds on some backends, so each
+    port is opened once and reused until close_all(). The wrappers do not own
+    the port: closing one leaves the port open for the next play.
+    """
+
+    def __init__(self, opener: Callable = mido.open_output):
+        self._opener = opener
+        self._ports: Dict[Optional[str], object] = {}
+        self._lock = threading.Lock()
+        self.stats = {'opens': 0, 'reuses': 0, 'open_failures': 0, 'open_time': 0.0}
+
+    def get_port(self, port_name: Optional[str] = None):
+        """Return the open port with this name (None for the default port), opening it if needed."""
+        with self._lock:
+            port = self._ports.get(port_name)
+            if port is not None and not port.closed:
+                self.stats['reuses'] += 1
+                return port
+            start = time.perf_counter()
+            try:
+                port = self._opener(port_name) if port_name else self._opener()
+            except IOError:
+                print(f"Could not open MIDI port: {port_name or 'default'}")
+                self.stats['open_failures'] += 1
+                return None
+            self.stats['opens'] += 1
+            self.stats['open_time'] += time.perf_counter() - start
+            self._ports[port_name] = port
+            return port
+
+    def output(self, port_name: Optional[str] = None) -> MIDIOutput:
+        """MIDIOutput bound to the shared port (its port is None if the port could not be opened)."""
+        port = self.get_port(port_name)
+        if port is None:
+            return MIDIOutput(auto_open=False)
+        return MIDIOutput(port=port)
+
+    def close(self, port_name: Optional[str] = None):
+        with self._lock:
+            port = self._ports.pop(port_name, None)
+        if port is not None:
+            port.close()
+
+    def close_all(self):
+        with self._lock:
+            ports, self._ports = list(self._ports.values()), {}
+        for port in ports:
+            port.close()
+
+    @property
+    def open_ports(self):
+        with self._lock:
+            return [name for name, port in self._ports.items() if not port.closed]
+
+    def report(self) -> str:
+        opens = self.stats['opens']
+        mean_open = self.stats['open_time'] / opens * 1000 if opens else 0.0
+        return (f"opens={opens} reuses={self.stats['reuses']} failures={self.stats['open_failures']} "
+                f"mean_open={mean_open:.2f} ms")
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def get_port_manager() -> MIDIPortManager:
+    """Process-wide MIDIPortManager."""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = MIDIPortManager()
+            instrumentation.register_source('midi.ports', lambda: dict(_default_manager.stats))
+        return _default_manager
@@ -0,0 +1,534 @@
+# python scripts/midi_retune.py song.mid other.mid --scale "Quarter-tone" --mapping degree --output retuned --audio wav
+
+import argparse
+import os
+import struct
+import sys
+import time
+import wave
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import instrumentation
+from midi_tuning import (DEFAULT_BEND_RANGE, KEY_MAPPINGS, MPE_MEMBER_CHANNELS, ChannelAllocator, KeyTable,
+                         bend_range_controls, get_key_table)
+from polyphony import Envelope, NoteEvent, PolyphonicRenderer
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+POLY_AFTERTOUCH = 0xA0
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+CHANNEL_PRESSURE = 0xD0
+PITCH_BEND = 0xE0
+
+# General MIDI percussion channel: unpitched, so left as is
+DRUM_CHANNEL = 9
+
+DEFAULT_TEMPO = 500000
+META_END_OF_TRACK = 0x2F
+META_SET_TEMPO = 0x51
+
+
+@dataclass
+class MidiEvents:
+    """
+    A Standard MIDI File as columns: one array entry per channel message.
+
+    Ticks are absolute and `order` is the position of the event in the file,
+    which keeps simultaneous events in their original order. Meta and sysex
+    events are few and kept as raw bytes in `meta`; end-of-track markers are
+    dropped on reading and written back by write_midi_file.
+    """
+    ticks_per_beat: int
+    tracks: int
+    track: np.ndarray
+    tick: np.ndarray
+    order: np.ndarray
+    status: np.ndarray
+    data1: np.ndarray
+    data2: np.ndarray
+    meta: List[Tuple[int, int, int, bytes]]
+
+    def __len__(self):
+        return len(self.status)
+
+    @property
+    def kind(self) -> np.ndarray:
+        return self.status & 0xF0
+
+    @property
+    def channel(self) -> np.ndarray:
+        return self.status & 0x0F
+
+    def tempo_map(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ticks where the tempo changes, seconds elapsed at each change and the tempo (us per beat) from there."""
+        changes = sorted((tick, order, int.from_bytes(raw[3:6], 'big')) for _, tick, order, raw in self.meta
+                         if raw[0] == 0xFF and raw[1] == META_SET_TEMPO and len(raw) >= 6)
+        ticks = np.array([0] + [tick for tick, _, _ in changes], dtype=np.int64)
+        tempi = np.array([DEFAULT_TEMPO] + [tempo for _, _, tempo in changes], dtype=np.float64)
+        seconds = np.concatenate([[0.0], np.cumsum(np.diff(ticks) * tempi[:-1])]) / (1e6 * self.ticks_per_beat)
+        return ticks, seconds, tempi
+
+    def seconds(self, ticks: np.ndarray) -> np.ndarray:
+        """Convert absolute ticks to seconds through the tempo map."""
+        changes, elapsed, tempi = self.tempo_map()
+        index = np.searchsorted(changes, ticks, side='right') - 1
+        return elapsed[index] + (ticks - changes[index]) * tempi[index] / (1e6 * self.ticks_per_beat)
+
+
+def _read_track(data: bytes, pos: int, end: int, track: int, columns: Tuple[list, ...], meta: list, order: int) -> int:
+    """
+    Decode one MTrk chunk into the column lists; returns the next order number.
+
+    Raises:
+        ValueError: if an event runs past the end of the chunk (truncated file)
+    """
+    try:
+        pos, order = _read_events(data, pos, end, track, columns, meta, order)
+    except IndexError:
+        pos = len(data) + 1
+    if pos > end:
+        raise ValueError(f"Invalid MIDI file: truncated track {track}")
+    return order
+
+
+def _read_events(data: bytes, pos: int, end: int, track: int, columns: Tuple[list, ...], meta: list,
+                 order: int) -> Tuple[int, int]:
+    tracks, ticks, orders, statuses, data1, data2 = columns
+    tick = 0
+    running = 0
+    while pos < end:
+        value = data[pos]
+        pos += 1
+        delta = value & 0x7F
+        while value & 0x80:
+            value = data[pos]
+            pos += 1
+            delta = (delta << 7) | (value & 0x7F)
+        tick += delta
+        status = data[pos]
+        if status & 0x80:
+            pos += 1
+        elif running:
+            status = running
+        else:
+            raise ValueError(f"Invalid MIDI file: data byte without status in track {track}")
+        if status < 0xF0:
+            running = status
+            tracks.append(track)
+            ticks.append(tick)
+            orders.append(order)
+            statuses.append(status)
+            data1.append(data[pos])
+            if status & 0xE0 == PROGRAM_CHANGE:
+                # Program change and channel pressure carry a single data byte
+                data2.append(0)
+                pos += 1
+            else:
+                data2.append(data[pos + 1])
+                pos += 2
+        elif status == 0xFF or status in (0xF0, 0xF7):
+            start = pos - 1
+            if status == 0xFF:
+                meta_type = data[pos]
+                pos += 1
+            else:
+                meta_type = None
+            length = 0
+            value = 0x80
+            while value & 0x80:
+                value = data[pos]
+                pos += 1
+                length = (length << 7) | (value & 0x7F)
+            pos += length
+            if meta_type != META_END_OF_TRACK:
+                meta.append((track, tick, order, data[start:pos]))
+        else:
+            raise ValueError(f"Invalid MIDI file: unexpected status byte {status:#x} in track {track}")
+        order += 1
+    return pos, order
+
+
+def read_midi_file(path) -> MidiEvents:
+    """
+    Load a Standard MIDI File (format 0 or 1) into columnar event arrays.
+
+    Raises:
+        ValueError: if the file is not a MIDI file, is truncated or uses SMPTE time division
+    """
+    data = Path(path).read_bytes()
+    if data[:4] != b'MThd' or len(data) < 14:
+        raise ValueError(f"Not a MIDI file: {path}")
+    header_length = int.from_bytes(data[4:8], 'big')
+    _, num_tracks, division = struct.unpack('>HHH', data[8:14])
+    if division & 0x8000:
+        raise ValueError(f"SMPTE time division is not supported: {path}")
+
+    columns = ([], [], [], [], [], [])
+    meta = []
+    order = 0
+    pos = 8 + header_length
+    track = 0
+    with instrumentation.timer('retune.read'):
+        while track < num_tracks and pos + 8 <= len(data):
+            chunk, length = data[pos:pos + 4], int.from_bytes(data[pos + 4:pos + 8], 'big')
+            pos += 8
+            if chunk == b'MTrk':
+                if pos + length > len(data):
+                    raise ValueError(f"Invalid MIDI file: truncated track {track}: {path}")
+                order = _read_track(data, pos, pos + length, track, columns, meta, order)
+                track += 1
+            pos += length
+
+    tracks, ticks, orders, statuses, data1, data2 = columns
+    return MidiEvents(division, track,
+                      np.array(tracks, dtype=np.int64), np.array(ticks, dtype=np.int64),
+                      np.array(orders, dtype=np.int64), np.array(statuses, dtype=np.uint8),
+                      np.array(data1, dtype=np.uint8), np.array(data2, dtype=np.uint8), meta)
+
+
+def _encode_track(ticks: np.ndarray, orders: np.ndarray, statuses: np.ndarray, data1: np.ndarray,
+                  data2: np.ndarray, meta: List[Tuple[int, int, bytes]]) -> bytes:
+    """Encode one track's events (channel messages as arrays, meta as raw bytes) into an MTrk chunk."""
+    meta_ticks = np.array([tick for tick, _, _ in meta], dtype=np.int64)
+    meta_orders = np.array([order for _, order, _ in meta], dtype=np.int64)
+    meta_sizes = np.array([len(raw) for _, _, raw in meta], dtype=np.int64)
+    sizes = np.where((statuses & 0xE0) == PROGRAM_CHANGE, 2, 3)
+
+    all_ticks = np.concatenate([ticks, meta_ticks])
+    all_sizes = np.concatenate([sizes, meta_sizes])
+    sequence = np.lexsort((np.concatenate([orders, meta_orders]), all_ticks))
+    all_ticks, all_sizes = all_ticks[sequence], all_sizes[sequence]
+    deltas = np.diff(all_ticks, prepend=0)
+
+    # Variable-length delta times: 7 bits per byte, most significant first
+    vlq = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    starts = np.cumsum(vlq + all_sizes) - (vlq + all_sizes)
+    out = np.zeros(int((vlq + all_sizes).sum()), dtype=np.uint8)
+    for byte in range(4):
+        present = vlq > byte
+        shift = 7 * (vlq[present] - 1 - byte)
+        more = np.where(byte < vlq[present] - 1, 0x80, 0)
+        out[starts[present] + byte] = ((deltas[present] >> shift) & 0x7F) | more
+
+    messages = starts + vlq
+    position = np.empty(len(sequence), dtype=np.int64)
+    position[sequence] = messages
+    channel_at = position[:len(ticks)]
+    out[channel_at] = statuses
+    out[channel_at + 1] = data1
+    wide = sizes == 3
+    out[channel_at[wide] + 2] = data2[wide]
+    for at, (_, _, raw) in zip(position[len(ticks):].tolist(), meta):
+        out[at:at + len(raw)] = np.frombuffer(raw, dtype=np.uint8)
+
+    body = out.tobytes() + bytes((0, 0xFF, META_END_OF_TRACK, 0))
+    return b'MTrk' + struct.pack('>I', len(body)) + body
+
+
+def write_midi_file(events: MidiEvents, path):
+    """Write columnar events back to a Standard MIDI File (format 0 for a single track, else 1)."""
+    meta_by_track = defaultdict(list)
+    for track, tick, order, raw in events.meta:
+        meta_by_track[track].append((tick, order, raw))
+    chunks = [struct.pack('>4sIHHH', b'MThd', 6, 0 if events.tracks == 1 else 1, events.tracks,
+                          events.ticks_per_beat)]
+    with instrumentation.timer('retune.write'):
+        order = np.argsort(events.track, kind='stable')
+        bounds = np.searchsorted(events.track[order], np.arange(events.tracks + 1))
+        for track in range(events.tracks):
+            rows = order[bounds[track]:bounds[track + 1]]
+            chunks.append(_encode_track(events.tick[rows], events.order[rows], events.status[rows],
+                                        events.data1[rows], events.data2[rows], meta_by_track[track]))
+    Path(path).write_bytes(b''.join(chunks))
+
+
+def pair_notes(events: MidiEvents, notes: np.ndarray) -> np.ndarray:
+    """
+    Match note ons with their note offs.
+
+    Args:
+        events: Columnar events
+        notes: Indices of the note on/off events to pair, in time order
+
+    Returns:
+        For every event, the index of the note off closing it (-1 if none)
+    """
+    closing = np.full(len(events), -1, dtype=np.int64)
+    kinds = events.kind[notes].tolist()
+    velocities = events.data2[notes].tolist()
+    sources = (events.track[notes] * 2048 + events.channel[notes].astype(np.int64) * 128
+               + events.data1[notes]).tolist()
+    sounding = defaultdict(deque)
+    for index, kind, velocity, source in zip(notes.tolist(), kinds, velocities, sources):
+        if kind == NOTE_ON and velocity:
+            sounding[source].append(index)
+        elif kind != POLY_AFTERTOUCH and sounding[source]:
+            # Overlapping repeats of a key close in the order they started
+            closing[sounding[source].popleft()] = index
+    return closing
+
+
+def time_order(events: MidiEvents, selection: np.ndarray) -> np.ndarray:
+    """Indices of the selected events sorted by time, simultaneous events in file order."""
+    indices = np.flatnonzero(selection)
+    return indices[np.lexsort((events.order[indices], events.tick[indices]))]
+
+
+def _allocate_channels(bends: List[int], ons: List[bool], offs: List[int], sources: List[int],
+                       keys: List[int], channels: Sequence[int]) -> Tuple[List[int], List[int], int]:
+    """
+    Give every retuned note a channel whose pitch bend it can own (see ChannelAllocator).
+
+    Returns:
+        Channel of every event, positions where a bend must be sent first, and
+        the number of conflicts (notes that had to retune a busy channel)
+    """
+    allocator = ChannelAllocator(channels)
+    assigned = [channels[0]] * len(bends)
+    retune_at = []
+    for position, (bend, on, off, source, key) in enumerate(zip(bends, ons, offs, sources, keys)):
+        if on:
+            channel, retune = allocator.note_on(source, key, bend)
+            if retune:
+                retune_at.append(position)
+        else:
+            playing = allocator.note_off(source) if off else allocator.current(source)
+            if playing is None:
+                continue
+            channel = playing[0]
+        assigned[position] = channel
+    return assigned, retune_at, allocator.conflicts
+
+
+def bend_range_messages(channel: int, bend_range: float) -> List[Tuple[int, int, int]]:
+    """Status and data bytes of the RPN 0 messages setting a channel's pitch bend range."""
+    return [(CONTROL_CHANGE | channel, control, value) for control, value in bend_range_controls(bend_range)]
+
+
+def retune_events(events: MidiEvents, table: KeyTable, channels: Sequence[int] = MPE_MEMBER_CHANNELS,
+                  manager_channel: int = 0, keep_drums: bool = True) -> Tuple[MidiEvents, Dict[str, int]]:
+    """
+    Retune 12-TET events onto a scale with per-note pitch bends.
+
+    The output follows the MPE lower zone layout MicrotonalMIDI plays: every
+    note moves to a member channel carrying its bend (notes with the same
+    bend share one), and channel-wide messages (controllers, programs, the
+    source's own pitch bends) go to the manager channel, which MPE synths
+    apply to all member channels. Keys and bends come from the table by plain
+    array indexing; only channel allocation walks the notes in time order.
+
+    Args:
+        events: Columnar events read from a 12-TET file
+        table: Key table of the target scale (get_key_table)
+        channels: Member channels notes are spread over
+        manager_channel: Channel receiving channel-wide messages
+        keep_drums: Leave the General MIDI drum channel untouched
+
+    Returns:
+        The retuned events and counts of notes, bends sent, channels used and conflicts
+    """
+    kinds = events.kind
+    source_channels = events.channel
+    drums = (source_channels == DRUM_CHANNEL) if keep_drums else np.zeros(len(events), dtype=bool)
+    if keep_drums and drums.any():
+        channels = [channel for channel in channels if channel != DRUM_CHANNEL]
+    keyed = np.isin(kinds, (NOTE_OFF, NOTE_ON, POLY_AFTERTOUCH)) & ~drums
+    notes = time_order(events, keyed)
+
+    table_keys, table_bends = table.arrays()
+    input_keys = events.data1[notes]
+    note_kinds = kinds[notes]
+    ons = (note_kinds == NOTE_ON) & (events.data2[notes] > 0)
+    offs = (note_kinds == NOTE_OFF) | ((note_kinds == NOTE_ON) & ~ons)
+    sources = events.track[notes] * 2048 + source_channels[notes].astype(np.int64) * 128 + input_keys
+    with instrumentation.timer('retune.allocate'):
+        assigned, retune_at, conflicts = _allocate_channels(
+            table_bends[input_keys].tolist(), ons.tolist(), offs.tolist(), sources.tolist(),
+            table_keys[input_keys].tolist(), list(channels))
+
+    status = events.status.copy()
+    data1 = events.data1.copy()
+    status[notes] = note_kinds | np.array(assigned, dtype=np.uint8)
+    data1[notes] = table_keys[input_keys]
+    wide = np.isin(kinds, (CONTROL_CHANGE, PROGRAM_CHANGE, CHANNEL_PRESSURE, PITCH_BEND)) & ~drums
+    status[wide] = kinds[wide] | manager_channel
+
+    # A bend goes out just before the note that needs it, at the same tick
+    retune_at = notes[np.array(retune_at, dtype=np.int64)]
+    bend_values = table_bends[events.data1[retune_at]] + 8192
+    bend_status = PITCH_BEND | (status[retune_at] & 0x0F)
+    used = sorted(set(assigned) if len(notes) else ())
+    setup = [message for channel in used for message in bend_range_messages(channel, table.bend_range)]
+    setup_columns = np.array(setup, dtype=np.int64).reshape(-1, 3)
+
+    retuned = MidiEvents(
+        events.ticks_per_beat, max(events.tracks, 1),
+        np.concatenate([np.zeros(len(setup), dtype=np.int64), events.track[retune_at], events.track]),
+        np.concatenate([np.zeros(len(setup), dtype=np.int64), events.tick[retune_at], events.tick]),
+        np.concatenate([np.arange(-len(setup), 0) * 2, events.order[retune_at] * 2, events.order * 2 + 1]),
+        np.concatenate([setup_columns[:, 0], bend_status, status]).astype(np.uint8),
+        np.concatenate([setup_columns[:, 1], bend_values & 0x7F, data1]).astype(np.uint8),
+        np.concatenate([setup_columns[:, 2], bend_values >> 7, events.data2]).astype(np.uint8),
+        [(track, tick, order * 2 + 1, raw) for track, tick, order, raw in events.meta])
+    stats = {'notes': int(ons.sum()), 'bends': len(retune_at), 'channels': len(used), 'conflicts': conflicts}
+    for name, value in stats.items():
+        instrumentation.count(f'retune.{name}', value)
+    return retuned, stats
+
+
+def render_events(events: MidiEvents, table: KeyTable, sample_rate: int = 44100, waveform: str = 'sine',
+                  envelope: Optional[Envelope] = None, keep_drums: bool = True) -> np.ndarray:
+    """
+    Render the notes of a 12-TET file at the retuned frequencies.
+
+    Notes still held at the end of the file stop at the last event.
+    """
+    kinds = events.kind
+    drums = (events.channel == DRUM_CHANNEL) if keep_drums else np.zeros(len(events), dtype=bool)
+    notes = time_order(events, np.isin(kinds, (NOTE_OFF, NOTE_ON)) & ~drums)
+    closing = pair_notes(events, notes)
+    ons = notes[(kinds[notes] == NOTE_ON) & (events.data2[notes] > 0)]
+    if len(ons) == 0:
+        return np.zeros(0)
+    last_tick = int(events.tick.max())
+    end_ticks = np.where(closing[ons] >= 0, events.tick[np.maximum(closing[ons], 0)], last_tick)
+    onsets = events.seconds(events.tick[ons])
+    durations = events.seconds(end_ticks) - onsets
+    frequencies = np.array(table.frequencies)[events.data1[ons]]
+    renderer = PolyphonicRenderer(sample_rate, waveform, envelope)
+    with instrumentation.timer('retune.render'):
+        return renderer.render([NoteEvent(frequency, onset, duration, velocity) for frequency, onset, duration, velocity
+                                in zip(frequencies.tolist(), onsets.tolist(), durations.tolist(),
+                                       events.data2[ons].tolist())])
+
+
+def write_audio(path: str, audio: np.ndarray, sample_rate: int):
+    """Write a mono render as 16-bit WAV, or through soundfile for any other extension (e.g. .flac)."""
+    audio = np.clip(audio, -1.0, 1.0)
+    if path.endswith('.wav'):
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes((audio * 32767).astype(np.int16).tobytes())
+    else:
+        import soundfile as sf
+
+        sf.write(path, audio, sample_rate, subtype='PCM_16')
+
+
+@dataclass
+class RetuneJob:
+    """One input file retuned to one scale."""
+    path: str
+    output_dir: str
+    table: KeyTable
+    write_midi: bool = True
+    audio_format: Optional[str] = None
+    sample_rate: int = 44100
+    waveform: str = 'sine'
+
+    @property
+    def stem(self) -> str:
+        return Path(self.path).stem
+
+
+def run_job(job: RetuneJob) -> Tuple[str, int, Dict[str, int], float]:
+    """
+    Retune one file and write the results next to each other in the output directory.
+
+    Returns:
+        (input path, number of events read, retuning counts, wall-clock seconds spent)
+    """
+    start = time.perf_counter()
+    events = read_midi_file(job.path)
+    stats = {}
+    if job.write_midi:
+        retuned, stats = retune_events(events, job.table)
+        write_midi_file(retuned, os.path.join(job.output_dir, f"{job.stem}.mid"))
+    if job.audio_format:
+        audio = render_events(events, job.table, job.sample_rate, job.waveform)
+        write_audio(os.path.join(job.output_dir, f"{job.stem}.{job.audio_format}"), audio, job.sample_rate)
+    return job.path, len(events), stats, time.perf_counter() - start
+
+
+def retune_files(jobs: List[RetuneJob], workers: int = None) -> List[Tuple[RetuneJob, Exception]]:
+    """
+    Run the jobs across a process pool and report throughput.
+
+    Returns:
+        (job, exception) for every job that failed; the other jobs still complete
+    """
+    if not jobs:
+        print("Nothing to retune.")
+        return []
+    os.makedirs(jobs[0].output_dir, exist_ok=True)
+    start = time.perf_counter()
+    total = 0
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                path, count, stats, elapsed = future.result()
+            except Exception as e:
+                # One unreadable file must not abort the others
+                failures.append((futures[future], e))
+                continue
+            total += count
+            conflicts = f", {stats['conflicts']} bend conflicts" if stats.get('conflicts') else ""
+            print(f"{path}: {count} events in {elapsed:.2f} s{conflicts}")
+    wall = time.perf_counter() - start
+    print(f"\nRetuned {len(jobs) - len(failures)} files, {total} events in {wall:.2f} s "
+          f"({total / wall:.0f} events per second)")
+    if failures:
+        print(f"{len(failures)} files failed:")
+        for job, error in failures:
+            print(f"  {job.path}: {error}")
+    return failures
+
+
+def main(argv=None):
+    from export_scales import collect_scales
+
+    parser = argparse.ArgumentParser(description="Retune 12-TET MIDI files onto a microtonal scale.")
+    parser.add_argument('files', nargs='+', help="MIDI files to retune")
+    parser.add_argument('--scale', required=True, help="Scale name (example scales or gammes)")
+    parser.add_argument('--gammes', default=str(project_root / 'config' / 'gammes.yaml'),
+                        help="YAML file with extra gammes ('' to skip)")
+    parser.add_argument('--mapping', default='nearest', choices=KEY_MAPPINGS,
+                        help="Nearest scale pitch, or one scale degree per key from --root")
+    parser.add_argument('--root', type=int, default=None, help="Key playing the first degree (default: the scale's)")
+    parser.add_argument('--bend-range', type=float, default=DEFAULT_BEND_RANGE,
+                        help="Pitch bend range of the receiving synth in semitones")
+    parser.add_argument('--audio', choices=['wav', 'flac'], help="Also render the retuned notes to audio")
+    parser.add_argument('--audio-only', action='store_true', help="Render audio without writing MIDI files")
+    parser.add_argument('--waveform', default='sine', help="Waveform of the audio render")
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--output', default='retuned', help="Output directory")
+    args = parser.parse_args(argv)
+
+    scale = collect_scales([args.scale], args.gammes)[args.scale]
+    try:
+        table = get_key_table(scale, args.mapping, args.root, args.bend_range)
+    except ValueError as e:
+        raise SystemExit(f"Error: {e}")
+    jobs = [RetuneJob(path, args.output, table, not args.audio_only, args.audio or ('wav' if args.audio_only else None),
+                      args.sample_rate, args.waveform) for path in args.files]
+    if retune_files(jobs, args.workers):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+import instrumentation
+
+# Below this many seconds before a deadline the thread stops waiting and spins
+DEFAULT_SPIN_THRESHOLD = 0.002
+
+# Seconds between queuing a sequence and its first note, so the first events are not late
+DEFAULT_LEAD_TIME = 0.01
+
+# Number of recent lateness samples kept for jitter statistics
+JITTER_HISTORY = 10000
+
+
+class MIDIScheduler:
+    """
+    Run timestamped MIDI actions on a dedicated thread.
+
+    Events are kept in a priority queue keyed on their time in beats. Every
+    deadline is computed from a fixed tempo anchor (never by chaining
+    sleeps), so timing does not drift over long sequences. The thread waits on
+    a condition until shortly before the next deadline, then spins on
+    perf_counter for sub-millisecond accuracy.
+    """
+
+    def __init__(self, bpm: float = 60.0, spin_threshold: float = DEFAULT_SPIN_THRESHOLD):
+        self.spin_threshold = spin_threshold
+        self._queue = []
+        self._cancelled = set()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._busy = False
+        self._lateness = deque(maxlen=JITTER_HISTORY)
+        # Tempo map anchor: beat self._anchor_beat happens at perf_counter() == self._anchor_time
+        self._bpm = bpm
+        self._anchor_time = time.perf_counter()
+        self._anchor_beat = 0.0
+
+    # Time base
+
+    @property
+    def bpm(self) -> float:
+        return self._bpm
+
+    def now(self) -> float:
+        """Current position in beats."""
+        with self._condition:
+            return self._beat_at(time.perf_counter())
+
+    def _beat_at(self, t: float) -> float:
+        return self._anchor_beat + (t - self._anchor_time) * self._bpm / 60.0
+
+    def _deadline(self, beat: float) -> float:
+        return self._anchor_time + (beat - self._anchor_beat) * 60.0 / self._bpm
+
+    def set_tempo(self, bpm: float):
+        """Change tempo from now on; events already queued keep their beat positions."""
+        with self._condition:
+            now = time.perf_counter()
+            self._anchor_beat = self._beat_at(now)
+            self._anchor_time = now
+            self._bpm = bpm
+            self._condition.notify()
+
+    # Scheduling
+
+    def schedule(self, beat: float, action: Callable, *args) -> int:
+        """
+        Queue action(*args) to run at an absolute beat position.
+
+        Returns:
+            Handle that can be passed to cancel()
+        """
+        handle = next(self._counter)
+        with self._condition:
+            heapq.heappush(self._queue, (beat, handle, action, args))
+            self._condition.notify()
+        return handle
+
+    def schedule_in(self, beats: float, action: Callable, *args) -> int:
+        """Queue action(*args) to run the given number of beats from now."""
+        with self._condition:
+            beat = self._beat_at(time.perf_counter()) + beats
+        return self.schedule(beat, action, *args)
+
+    def call_soon(self, action: Callable, *args) -> int:
+        """Run action(*args) on the scheduler thread as soon as possible."""
+        return self.schedule(float('-inf'), action, *args)
+
+    def cancel(self, handle: int):
+        with self._condition:
+            self._cancelled.add(handle)
+
+    def cancel_all(self):
+        """Drop every pending event."""
+        with self._condition:
+            self._queue.clear()
+            self._cancelled.clear()
+            self._condition.notify_all()
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until the queue is empty; returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    # Thread
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='MIDIScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread; pending events are discarded."""
+        with self._condition:
+            self._running = False
+            self._queue.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    if not self._queue:
+                        self._condition.notify_all()
+                        self._condition.wait()
+                        continue
+                    beat, handle, action, args = self._queue[0]
+                    if handle in self._cancelled:
+                        heapq.heappop(self._queue)
+                        self._cancelled.discard(handle)
+                        continue
+                    deadline = self._deadline(beat) if beat != float('-inf') else 0.0
+                    remaining = deadline - time.perf_counter()
+                    if remaining > self.spin_threshold:
+                        self._condition.wait(remaining - self.spin_threshold)
+                        continue
+                    heapq.heappop(self._queue)
+                    self._busy = True
+                    break
+                else:
+                    return
+
+            # Spin the last stretch outside the lock
+            while time.perf_counter() < deadline:
+                pass
+            try:
+                if deadline:
+                    lateness = time.perf_counter() - deadline
+                    with self._condition:
+                        self._lateness.append(lateness)
+                    instrumentation.observe('midi.scheduler_lateness', max(lateness, 0.0))
+                with instrumentation.timer('midi.scheduler_action'):
+                    action(*args)
+            except Exception:
+                # A failing action must not take the thread (and every later event) down with it
+                print(f"MIDI scheduler: {getattr(action, '__qualname__', action)} failed")
+                traceback.print_exc()
+                instrumentation.count('midi.scheduler_errors')
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    # Statistics
+
+    def jitter_stats(self) -> Dict[str, float]:
+        """Lateness of executed events in milliseconds (mean, p50, p99, max)."""
+        with self._condition:
+            samples = np.array(self._lateness) * 1000.0
+        if len(samples) == 0:
+            return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'count': len(samples),
+            'mean_ms': float(samples.mean()),
+            'p50_ms': float(np.percentile(samples, 50)),
+            'p99_ms': float(np.percentile(samples, 99)),
+            'max_ms': float(samples.max()),
+        }
+
+    def reset_stats(self):
+        with self._condition:
+            self._lateness.clear()
@@ -0,0 +1,260 @@
+# python scripts/midi_thru.py --input "Keyboard" --output "Synth" --scale "Arabic Rast" --mapping degree --root 60
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import mido
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import instrumentation
+from midi_output import MIDIOutput, cached_message
+from midi_tuning import (DEFAULT_BEND_RANGE, KEY_MAPPINGS, MPE_MEMBER_CHANNELS, ChannelAllocator,
+                         bend_range_controls, get_key_table)
+
+# Handling times kept for the percentiles (the most recent ones)
+HANDLE_TIME_WINDOW = 65536
+
+# Messages that apply to a whole channel go to the MPE manager channel
+CHANNEL_WIDE = ('control_change', 'program_change', 'aftertouch', 'pitchwheel')
+
+
+@dataclass(frozen=True)
+class ThruTable:
+    """
+    Everything the thru needs per scale, indexed by incoming key.
+
+    entries[key] is (output key, bend, home channel): the home channel is
+    the member channel that holds that bend while idle, and notes take it
+    first when they cannot share a sounding channel, so as long as the
+    scale has no more distinct bends than there are channels a note never
+    waits for a bend message.
+    """
+    name: str
+    entries: Tuple[Tuple[int, int, int], ...]
+    home_bends: Dict[int, int]
+
+
+def build_thru_table(scale, name: str = '', mapping: str = 'nearest', root: Optional[int] = None,
+                     bend_range: float = DEFAULT_BEND_RANGE,
+                     channels: Sequence[int] = MPE_MEMBER_CHANNELS) -> ThruTable:
+    """Precompute the 128-entry key -> (note, bend, channel) table of a scale."""
+    table = get_key_table(scale, mapping, root, bend_range)
+    # The bends used by most keys get a channel of their own
+    bends = [bend for bend, _ in Counter(table.bends).most_common(len(channels))]
+    home = dict(zip(bends, channels))
+    entries = tuple((key, bend, home.get(bend, channels[0])) for key, bend in zip(table.keys, table.bends))
+    return ThruTable(name, entries, {channel: bend for bend, channel in home.items()})
+
+
+class MIDIThru:
+    """
+    Retune a live MIDI stream onto a scale, message by message.
+
+    Each note on costs one table lookup plus channel allocation; the pitch
+    bend goes out only when the chosen channel is not already at it (idle
+    channels are bent to their home bends in advance). Note offs and
+    polyphonic aftertouch follow the channel and key the note started with,
+    so switching scales mid-phrase (set_table, atomic under the lock) never
+    leaves a note stuck. Channel-wide messages go to the manager channel
+    and system messages pass through unchanged.
+
+    handle() is the input callback; it records the time it takes, from
+    entry to the end of the send, for the report. The backend delivers no
+    arrival time, so the wait in the input queue is not included.
+    """
+
+    def __init__(self, midi_output: MIDIOutput, table: ThruTable, channels: Sequence[int] = MPE_MEMBER_CHANNELS,
+                 manager_channel: int = 0, bend_range: float = DEFAULT_BEND_RANGE):
+        self.midi_output = midi_output
+        self.channels = tuple(channels)
+        self.manager_channel = manager_channel
+        self.bend_range = bend_range
+        self.table = None
+        self.stats = {'messages': 0, 'notes': 0, 'bends': 0, 'switches': 0, 'dropped': 0}
+        self._allocator = ChannelAllocator(self.channels)
+        self._lock = threading.Lock()
+        self._handle_times = np.zeros(HANDLE_TIME_WINDOW, dtype=np.float64)
+        self._handle_count = 0
+        with self.midi_output.batch():
+            for channel in self.channels:
+                self._send_bend_range(channel)
+        self.set_table(table)
+
+    def _send_bend_range(self, channel: int):
+        for control, value in bend_range_controls(self.bend_range):
+            self.midi_output.send_control_change(control, value, channel)
+
+    def set_table(self, table: ThruTable):
+        """Switch to another scale; sounding notes keep their tuning until released."""
+        with self._lock, self.midi_output.batch():
+            previous, self.table = self.table, table
+            for channel in self._allocator.retune_idle(table.home_bends):
+                self.midi_output.send_pitch_bend(table.home_bends[channel], channel)
+                self.stats['bends'] += 1
+            if previous is not None:
+                self.stats['switches'] += 1
+
+    def handle(self, msg):
+        """Retune and forward one incoming message (mido input callback)."""
+        start = time.perf_counter()
+        output = self.midi_output
+        msg_type = msg.type
+        with self._lock:
+            if msg_type == 'note_on' and msg.velocity:
+                key, bend, home = self.table.entries[msg.note]
+                channel, retune = self._allocator.note_on((msg.channel, msg.note), key, bend, home)
+                if retune:
+                    # Bend and note on leave together so the note never starts untuned
+                    with output.batch():
+                        output.send(cached_message('pitchwheel', channel, pitch=bend))
+                        output.send(cached_message('note_on', channel, note=key, velocity=msg.velocity))
+                    self.stats['bends'] += 1
+                else:
+                    output.send(cached_message('note_on', channel, note=key, velocity=msg.velocity))
+                self.stats['notes'] += 1
+            elif msg_type == 'note_off' or msg_type == 'note_on':
+                playing = self._allocator.note_off((msg.channel, msg.note))
+                if playing is None:
+                    self.stats['dropped'] += 1
+                else:
+                    output.send(cached_message('note_off', playing[0], note=playing[1], velocity=msg.velocity))
+            elif msg_type == 'polytouch':
+                playing = self._allocator.current((msg.channel, msg.note))
+                if playing is None:
+                    self.stats['dropped'] += 1
+                else:
+                    output.send(msg.copy(channel=playing[0], note=playing[1]))
+            elif msg_type in CHANNEL_WIDE:
+                output.send(msg.copy(channel=self.manager_channel))
+            else:
+                output.send(msg)
+            self.stats['messages'] += 1
+            elapsed = time.perf_counter() - start
+            self._handle_times[self._handle_count % HANDLE_TIME_WINDOW] = elapsed
+            self._handle_count += 1
+        instrumentation.observe('thru.handle_time', elapsed)
+
+    def all_notes_off(self):
+        """Release every sounding note."""
+        with self._lock, self.midi_output.batch():
+            for source, _, _ in self._allocator.sounding():
+                channel, key = self._allocator.note_off(source)
+                self.midi_output.send_note_off(key, 0, channel)
+
+    def handle_time_percentiles(self, percentiles=(50, 90, 99, 99.9)) -> Dict[str, float]:
+        """Time spent in handle() in milliseconds (percentiles over the last HANDLE_TIME_WINDOW messages)."""
+        with self._lock:
+            times = self._handle_times[:min(self._handle_count, HANDLE_TIME_WINDOW)].copy()
+        if not len(times):
+            return {}
+        values = np.percentile(times, percentiles) * 1000
+        report = {f'p{percentile:g}': float(value) for percentile, value in zip(percentiles, values)}
+        report['max'] = float(times.max() * 1000)
+        return report
+
+    def report(self) -> str:
+        times = ' '.join(f"{name}={value:.3f} ms" for name, value in self.handle_time_percentiles().items())
+        counts = ' '.join(f"{name}={value}" for name, value in self.stats.items())
+        report = f"{counts} conflicts={self._allocator.conflicts}"
+        return f"{report} handle {times}" if times else report
+
+
+def open_thru(table: ThruTable, input_name: Optional[str] = None, output_name: Optional[str] = None,
+              virtual: bool = False, **kwargs) -> Tuple[MIDIThru, object]:
+    """
+    Connect a MIDIThru between MIDI ports.
+
+    With virtual=True the input and output are created as virtual ports
+    under the given names (rtmidi backend), so other programs or tests can
+    connect to them.
+
+    Returns:
+        The running MIDIThru and its input port (close it to stop)
+    """
+    if virtual:
+        output = MIDIOutput(port=mido.open_output(output_name or 'polygamme thru out', virtual=True))
+        output.owns_port = True
+    else:
+        from midi_ports import get_port_manager
+
+        output = get_port_manager().output(output_name)
+        if output.port is None:
+            raise IOError(f"Could not open MIDI output port: {output_name or 'default'}")
+    thru = MIDIThru(output, table, **kwargs)
+    if virtual:
+        port = mido.open_input(input_name or 'polygamme thru in', virtual=True, callback=thru.handle)
+    elif input_name:
+        port = mido.open_input(input_name, callback=thru.handle)
+    else:
+        port = mido.open_input(callback=thru.handle)
+    return thru, port
+
+
+def main(argv=None):
+    from export_scales import collect_scales
+
+    parser = argparse.ArgumentParser(description="Play a 12-TET keyboard through a scale into a MIDI synth.")
+    parser.add_argument('--input', help="MIDI input port (default: the default input)")
+    parser.add_argument('--output', help="MIDI output port (default: the default output)")
+    parser.add_argument('--virtual', action='store_true', help="Create virtual input and output ports instead")
+    parser.add_argument('--scale', required=True, help="Scale name (example scales or gammes)")
+    parser.add_argument('--gammes', default=str(project_root / 'config' / 'gammes.yaml'),
+                        help="YAML file with extra gammes ('' to skip)")
+    parser.add_argument('--mapping', default='nearest', choices=KEY_MAPPINGS,
+                        help="Nearest scale pitch, or one scale degree per key from --root")
+    parser.add_argument('--root', type=int, default=None, help="Key playing the first degree (default: the scale's)")
+    parser.add_argument('--bend-range', type=float, default=DEFAULT_BEND_RANGE,
+                        help="Pitch bend range of the receiving synth in semitones")
+    parser.add_argument('--list-ports', action='store_true', help="List MIDI ports and exit")
+    args = parser.parse_args(argv)
+
+    if args.list_ports:
+        print("Inputs:\n  " + "\n  ".join(mido.get_input_names()))
+        print("Outputs:\n  " + "\n  ".join(mido.get_output_names()))
+        return
+
+    scales = collect_scales([], args.gammes)
+
+    def build(name: str) -> ThruTable:
+        return build_thru_table(scales[name], name, args.mapping, args.root, args.bend_range)
+
+    if args.scale not in scales:
+        raise SystemExit(f"Unknown scale: {args.scale}")
+    try:
+        thru, port = open_thru(build(args.scale), args.input, args.output, args.virtual,
+                               bend_range=args.bend_range)
+    except (IOError, ImportError, ValueError) as e:
+        # ImportError: the MIDI backend (rtmidi) or its system library is missing
+        raise SystemExit(f"Error: {e}")
+
+    print(f"Retuning to {args.scale}. Type a scale name to switch, an empty line to quit.")
+    try:
+        for line in sys.stdin:
+            name = line.strip()
+            if not name:
+                break
+            if name not in scales:
+                print(f"Unknown scale: {name}")
+                continue
+            thru.set_table(build(name))
+            print(f"Switched to {name}. {thru.report()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        port.close()
+        thru.all_notes_off()
+        print(thru.report())
+        thru.midi_output.close_port()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import functools
+import numpy as np
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from midi_output import MIDIOutput
+
+# Pitch bend range the receiving synth is set to, in semitones (MPE default is 48 on
+# member channels, but most non-MPE synths ship with +/-2)
+DEFAULT_BEND_RANGE = 2.0
+
+# MPE lower zone: channel 0 is the manager, 1..15 carry one note each
+MPE_MEMBER_CHANNELS = tuple(range(1, 16))
+
+# How incoming 12-TET keys are mapped onto a scale: to the nearest scale pitch, or
+# key by key onto consecutive scale degrees from a root key
+KEY_MAPPINGS = ('nearest', 'degree')
+
+# MIDI Tuning Standard constants
+MTS_DEVICE_ALL = 0x7F
+MTS_FRACTION_STEPS = 1 << 14
+# A tuning program retunes each of the 128 keys once, so it holds at most 128 degrees
+MTS_MAX_KEYS = 128
+
+
+@dataclass(frozen=True)
+class TuningTable:
+    """
+    Precomputed MIDI rendering of a scale.
+
+    For pitch bend output each degree maps to the nearest key plus a bend; for
+    MTS output each degree gets its own key, retuned to the exact frequency
+    (only the first MTS_MAX_KEYS degrees fit). Both are stored as plain
+    tuples so sending a note is a tuple lookup. clipped_bends and
+    clipped_mts count the degrees whose pitch lies outside what the bend
+    range or the MIDI key range can reach.
+    """
+    keys: Tuple[int, ...]
+    bends: Tuple[int, ...]
+    mts_keys: Tuple[int, ...]
+    mts_data: Tuple[Tuple[int, int, int], ...]
+    bend_range: float
+    clipped_bends: int = 0
+    clipped_mts: int = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def frequencies_to_midi(frequencies: np.ndarray, base_frequency: float = 440.0,
+                        base_midi_note: int = 69) -> np.ndarray:
+    """Fractional MIDI note numbers for an array of frequencies."""
+    return 12 * np.log2(np.asarray(frequencies, dtype=np.float64) / base_frequency) + base_midi_note
+
+
+@functools.lru_cache(maxsize=256)
+def _build_table(frequencies: bytes, base_frequency: float, base_midi_note: int,
+                 bend_range: float) -> TuningTable:
+    midi = frequencies_to_midi(np.frombuffer(frequencies, dtype=np.float64), base_frequency, base_midi_note)
+
+    keys = np.clip(np.round(midi), 0, 127).astype(np.int64)
+    exact_bends = np.round((midi - keys) / bend_range * 8192)
+    bends = np.clip(exact_bends, -8192, 8191).astype(np.int64)
+
+    # MTS: give every degree its own key, starting near the first note's pitch
+    count = min(len(midi), MTS_MAX_KEYS)
+    first_key = int(np.clip(np.round(midi[0]) if len(midi) else 0, 0, MTS_MAX_KEYS - count))
+    mts_keys = np.arange(first_key, first_key + count)
+    highest = 127 + (MTS_FRACTION_STEPS - 1) / MTS_FRACTION_STEPS
+    clipped = np.clip(midi[:count], 0, highest)
+    semitones = np.floor(clipped).astype(np.int64)
+    fractions = np.minimum(np.round((clipped - semitones) * MTS_FRACTION_STEPS),
+                           MTS_FRACTION_STEPS - 1).astype(np.int64)
+    mts_data = zip(semitones.tolist(), (fractions >> 7).tolist(), (fractions & 0x7F).tolist())
+
+    return TuningTable(tuple(keys.tolist()), tuple(bends.tolist()), tuple(mts_keys.tolist()),
+                       tuple(mts_data), bend_range,
+                       clipped_bends=int(np.count_nonzero(exact_bends != bends)),
+                       clipped_mts=int(np.count_nonzero((midi[:count] < 0) | (midi[:count] > highest))))
+
+
+def bend_range_controls(bend_range: float) -> List[Tuple[int, int]]:
+    """
+    (control, value) pairs setting a channel's pitch bend range with RPN 0.
+
+    The range is sent as semitones plus cents, and the RPN is deselected
+    afterwards so later data entry messages cannot change it by accident.
+    """
+    semitones = int(bend_range)
+    cents = int(round((bend_range - semitones) * 100))
+    return [(101, 0), (100, 0), (6, semitones), (38, cents), (101, 127), (100, 127)]
+
+
+def get_tuning_table(scale, bend_range: float = DEFAULT_BEND_RANGE) -> TuningTable:
+    """Tuning table for a scale, built once per distinct set of frequencies and cached."""
+    # The raw bytes of the frequency array make a cheap, exact cache key
+    frequencies = np.ascontiguousarray(scale.frequencies, dtype=np.float64).tobytes()
+    return _build_table(frequencies, float(scale.base_frequency), int(scale.base_midi_note), float(bend_range))
+
+
+@dataclass(frozen=True)
+class KeyTable:
+    """
+    Retuning of the 128 MIDI keys onto a scale.
+
+    Every incoming key maps to the output key plus pitch bend that sounds its
+    scale pitch, so retuning a note is a single lookup (index the tuples, or
+    the arrays from `arrays()` for whole event columns).
+    """
+    keys: Tuple[int, ...]
+    bends: Tuple[int, ...]
+    frequencies: Tuple[float, ...]
+    mapping: str
+    bend_range: float
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Output keys and bends as arrays indexed by input key."""
+        return np.array(self.keys, dtype=np.int64), np.array(self.bends, dtype=np.int64)
+
+
+def key_pitches(midi: np.ndarray, mapping: str, root: int) -> np.ndarray:
+    """
+    Fractional MIDI pitch each of the 128 keys is retuned to.
+
+    'nearest' repeats the scale's pitch classes in every octave and picks the
+    closest one with a binary search over the sorted candidates. 'degree'
+    plays consecutive degrees from the root key up and down, repeating the
+    scale by whole octaves (a final octave note is not doubled).
+    """
+    inputs = np.arange(128, dtype=np.float64)
+    if mapping == 'nearest':
+        classes = np.unique(np.mod(midi, 12))
+        candidates = (classes[None, :] + 12 * np.arange(-1, 12)[:, None]).ravel()
+        index = np.searchsorted(candidates, inputs)
+        lower = candidates[np.maximum(index - 1, 0)]
+        upper = candidates[np.minimum(index, len(candidates) - 1)]
+        return np.where(inputs - lower <= upper - inputs, lower, upper)
+    span = midi[-1] - midi[0]
+    if len(midi) > 1 and abs(span - 12) < 0.01:
+        midi, period = midi[:-1], 12
+    else:
+        period = 12 * (int(span // 12) + 1)
+    degrees = np.arange(128) - root
+    return midi[degrees % len(midi)] + period * (degrees // len(midi))
+
+
+@functools.lru_cache(maxsize=256)
+def _build_key_table(frequencies: bytes, base_frequency: float, base_midi_note: int, mapping: str,
+                     root: int, bend_range: float) -> KeyTable:
+    midi = frequencies_to_midi(np.frombuffer(frequencies, dtype=np.float64), base_frequency, base_midi_note)
+    pitches = key_pitches(midi, mapping, root)
+    keys = np.clip(np.round(pitches), 0, 127).astype(np.int64)
+    bends = np.clip(np.round((pitches - keys) / bend_range * 8192), -8192, 8191).astype(np.int64)
+    retuned = base_frequency * np.exp2((pitches - base_midi_note) / 12)
+    return KeyTable(tuple(keys.tolist()), tuple(bends.tolist()), tuple(retuned.tolist()), mapping, bend_range)
+
+
+def get_key_table(scale, mapping: str = 'nearest', root: Optional[int] = None,
+                  bend_range: float = DEFAULT_BEND_RANGE) -> KeyTable:
+    """
+    Key table retuning a 12-TET keyboard onto a scale, cached per distinct scale and settings.
+
+    Args:
+        scale: Scale to retune to
+        mapping: 'nearest' (nearest scale pitch) or 'degree' (one degree per key)
+        root: Key playing the first degree with mapping='degree' (default: scale.base_midi_note)
+        bend_range: Pitch bend range of the receiving synth in semitones
+    """
+    if mapping not in KEY_MAPPINGS:
+        raise ValueError(f"Unsupported key mapping: {mapping}")
+    if len(scale.frequencies) == 0:
+        raise ValueError("Cannot retune to an empty scale")
+    frequencies = np.ascontiguousarray(scale.frequencies, dtype=np.float64).tobytes()
+    root = int(scale.base_midi_note if root is None else root)
+    return _build_key_table(frequencies, float(scale.base_frequency), int(scale.base_midi_note), mapping,
+                            root, float(bend_range))
+
+
+class ChannelAllocator:
+    """
+    Spread notes over channels so that every channel carries a single pitch bend.
+
+    A note joins a channel already sounding its bend if that key is free
+    there; otherwise it takes an idle channel, preferring its home channel
+    (if the caller gives one and it is bent right), then any channel already
+    bent right and then the least recently released (so release tails ring on).
+    When every channel is busy with another bend, the channel with the
+    fewest notes is retuned anyway and the conflict is counted. Notes are
+    tracked by source (whatever identifies the incoming note) and close in
+    the order they started, on the channel and key they started with.
+    """
+
+    def __init__(self, channels: Sequence[int] = MPE_MEMBER_CHANNELS):
+        self.channels = tuple(channels)
+        # Bend each channel is set to (None until one is sent)
+        self.bends: Dict[int, Optional[int]] = dict.fromkeys(self.channels)
+        self.conflicts = 0
+        self._idle = OrderedDict((channel, None) for channel in self.channels)
+        self._counts = dict.fromkeys(self.channels, 0)
+        self._by_bend = defaultdict(set)
+        self._keys = defaultdict(int)
+        self._playing = defaultdict(deque)
+
+    def note_on(self, source: Hashable, key: int, bend: int, home: Optional[int] = None) -> Tuple[int, bool]:
+        """Channel for a new note, and whether its pitch bend must be sent first."""
+        channel = next((c for c in self._by_bend[bend] if (c, key) not in self._keys), None)
+        if channel is None and self._idle:
+            idle = self._idle
+            if home in idle and self.bends[home] == bend:
+                channel = home
+            else:
+                channel = next((c for c in idle if self.bends[c] == bend), next(iter(idle)))
+        if channel is None:
+            channel = min(self.channels, key=self._counts.__getitem__)
+            self.conflicts += 1
+        retune = self.bends[channel] != bend
+        if retune:
+            if self._counts[channel]:
+                self._by_bend[self.bends[channel]].discard(channel)
+            self.bends[channel] = bend
+        self._idle.pop(channel, None)
+        self._by_bend[bend].add(channel)
+        self._counts[channel] += 1
+        self._keys[channel, key] += 1
+        self._playing[source].append((channel, key))
+        return channel, retune
+
+    def note_off(self, source: Hashable) -> Optional[Tuple[int, int]]:
+        """Release the oldest sounding note of a source; returns its (channel, key), or None."""
+        playing = self._playing.get(source)
+        if not playing:
+            return None
+        channel, key = playing.popleft()
+        self._counts[channel] -= 1
+        self._keys[channel, key] -= 1
+        if not self._keys[channel, key]:
+            del self._keys[channel, key]
+        if not self._counts[channel]:
+            self._by_bend[self.bends[channel]].discard(channel)
+            self._idle[channel] = None
+        return channel, key
+
+    def current(self, source: Hashable) -> Optional[Tuple[int, int]]:
+        """(channel, key) of the oldest sounding note of a source, or None."""
+        playing = self._playing.get(source)
+        return playing[0] if playing else None
+
+    def retune_idle(self, bends: Dict[int, int]) -> List[int]:
+        """Set the bends of idle channels ahead of time; returns the channels that changed."""
+        changed = []
+        for channel, bend in bends.items():
+            if channel in self._idle and self.bends[channel] != bend:
+                self.bends[channel] = bend
+                changed.append(channel)
+        return changed
+
+    def sounding(self) -> List[Tuple[Hashable, int, int]]:
+        """(source, channel, key) of every sounding note."""
+        return [(source, channel, key) for source, notes in self._playing.items() for channel, key in notes]
+
+    @property
+    def active(self) -> int:
+        return len(self.channels) - len(self._idle)
+
+
+def mts_single_note_sysex(keys: Sequence[int], data: Sequence[Tuple[int, int, int]],
+                          program: int = 0, device: int = MTS_DEVICE_ALL) -> List[List[int]]:
+    """
+    Build MTS real-time single note tuning change messages (sysex data bytes).
+
+    At most 127 keys fit in one message, so larger tables are split.
+    """
+    messages = []
+    pairs = list(zip(keys, data))
+    for start in range(0, len(pairs), 127):
+        chunk = pairs[start:start + 127]
+        payload = [0x7F, device, 0x08, 0x02, program, len(chunk)]
+        for key, (semitone, msb, lsb) in chunk:
+            payload.extend((key, semitone, msb, lsb))
+        messages.append(payload)
+    return messages
+
+
+class MicrotonalMIDI:
+    """
+    Play scale degrees at their exact pitch through a MIDIOutput.
+
+    mode='mpe' sends a pitch bend before every note on and rotates notes over
+    the MPE member channels so simultaneous notes can bend independently.
+    mode='mts' retunes one key per degree with MIDI Tuning Standard sysex when
+    the scale is loaded, then plays plain note on/off on a single channel.
+    """
+
+    def __init__(self, midi_output: MIDIOutput, mode: str = 'mpe', bend_range: float = DEFAULT_BEND_RANGE,
+                 channels: Sequence[int] = MPE_MEMBER_CHANNELS, mts_channel: int = 0):
+        if mode not in ('mpe', 'mts'):
+            raise ValueError(f"Unsupported MIDI tuning mode: {mode}")
+        self.midi_output = midi_output
+        self.mode = mode
+        self.bend_range = bend_range
+        self.channels = tuple(channels)
+        self.mts_channel = mts_channel
+        self.table = None
+        self._next_channel = 0
+        # degree -> (key, channel) of the sounding note
+        self._sounding = {}
+
+    def load_scale(self, scale):
+        """
+        Select the scale to play.
+
+        In MPE mode this sets the pitch bend range of every member channel; in
+        MTS mode it sends the retuning sysex.
+
+        Raises:
+            ValueError: in MTS mode, if the scale has more degrees than keys
+        """
+        table = get_tuning_table(scale, self.bend_range)
+        if self.mode == 'mts':
+            if len(table.mts_keys) < len(table):
+                raise ValueError(f"Scale has {len(table)} degrees; MTS can retune at most {MTS_MAX_KEYS} keys "
+                                 f"(use mode='mpe')")
+            if table.clipped_mts:
+                print(f"Warning: {table.clipped_mts} degrees are outside the MIDI key range and will be clipped")
+        elif table.clipped_bends:
+            print(f"Warning: {table.clipped_bends} degrees are out of reach of a +/-{self.bend_range:g} semitone "
+                  f"bend and will be clipped")
+        self.table = table
+        with self.midi_output.batch():
+            if self.mode == 'mts':
+                for data in mts_single_note_sysex(table.mts_keys, table.mts_data):
+                    self.midi_output.send_sysex(data)
+            else:
+                for channel in self.channels:
+                    for control, value in bend_range_controls(self.bend_range):
+                        self.midi_output.send_control_change(control, value, channel)
+
+    def note_on(self, degree: int, velocity: int = 64):
+        table = self.table
+        if self.mode == 'mts':
+            key, channel = table.mts_keys[degree], self.mts_channel
+            self.midi_output.send_note_on(key, velocity, channel)
+        else:
+            key, channel = table.keys[degree], self.channels[self._next_channel]
+            self._next_channel = (self._next_channel + 1) % len(self.channels)
+            # Bend and note on leave together so the note never starts untuned
+            with self.midi_output.batch():
+                self.midi_output.send_pitch_bend(table.bends[degree], channel)
+                self.midi_output.send_note_on(key, velocity, channel)
+        self._sounding[degree] = (key, channel)
+
+    def note_off(self, degree: int, velocity: int = 64):
+        key, channel = self._sounding.pop(degree, (None, None))
+        if key is not None:
+            self.midi_output.send_note_off(key, velocity, channel)
+
+    def all_notes_off(self):
+        with self.midi_output.batch():
+            for degree in list(self._sounding):
+                self.note_off(degree)
@@ -0,0 +1,71 @@
+import numpy as np
+
+from render import WAVEFORMS, get_cycle_evaluator
+
+# Length of the fade applied at note boundaries (seconds)
+DEFAULT_FADE = 0.005
+
+# Sample rates the oscillator is used at; any positive rate works
+SAMPLE_RATES = (44100, 48000, 96000, 192000)
+
+
+def raised_cosine(length: int) -> np.ndarray:
+    """Fade-in curve rising from 0 towards 1 over length samples (reverse it to fade out)."""
+    return 0.5 - 0.5 * np.cos(np.pi * np.arange(length) / max(length, 1))
+
+
+def boundary_samples(seconds: float, sample_rate: int) -> int:
+    """
+    Sample index of a time on the output timeline.
+
+    Note boundaries are placed by rounding the running time, so note and gap
+    lengths never accumulate truncation error over a sequence.
+    """
+    return int(round(seconds * sample_rate))
+
+
+class PhaseOscillator:
+    """
+    Single oscillator that renders fixed-size chunks with a running phase.
+
+    The phase is kept in cycles and wrapped to [0, 1) after every chunk, so
+    precision does not degrade however long the note plays (a time array
+    multiplied by the frequency loses phase accuracy as t grows). Changing the
+    frequency keeps the phase, so the waveform stays continuous. All scratch
+    buffers are allocated once for the given blocksize.
+    """
+
+    def __init__(self, waveform: str = 'sine', sample_rate: int = 44100, blocksize: int = 1024,
+                 oscillator: str = 'direct', phase: float = 0.0):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unsupported waveform type: {waveform}")
+        if sample_rate <= 0:
+            raise ValueError(f"Invalid sample rate: {sample_rate}")
+        self.waveform = waveform
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.phase = phase % 1.0
+        self.frequency = 0.0
+        self._evaluate = get_cycle_evaluator(oscillator, sample_rate)
+        self._ramp = np.arange(blocksize, dtype=np.float64)
+        self._cycles = np.empty((1, blocksize), dtype=np.float64)
+        self._frequency = np.zeros(1, dtype=np.float64)
+
+    def set_frequency(self, frequency: float):
+        self.frequency = frequency
+        self._frequency[0] = frequency
+
+    def render(self, out: np.ndarray) -> np.ndarray:
+        """Write the next len(out) samples (at most blocksize) into out and advance the phase."""
+        frames = len(out)
+        increment = self.frequency / self.sample_rate
+        cycles = self._cycles[:, :frames]
+        np.multiply(self._ramp[:frames], increment, out=cycles[0])
+        cycles += self.phase
+        out[:] = self._evaluate(self._frequency, cycles, self.waveform)[0]
+        self.phase = (self.phase + increment * frames) % 1.0
+        return out
+
+    def skip(self, frames: int):
+        """Advance the phase as if frames samples had been rendered."""
+        self.phase = (self.phase + self.frequency / self.sample_rate * frames) % 1.0
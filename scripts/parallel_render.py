@@ -0,0 +1,146 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import instrumentation
+from oscillator import DEFAULT_FADE
+from render import NOTE_GAP, WAVEFORMS
+from streaming import StreamingEngine
+
+# Blocks rendered per call in the workers (segment boundaries fall on multiples of it)
+DEFAULT_BLOCKSIZE = 8192
+
+# Segments per worker, so a slow segment does not leave the other cores idle at the end
+SEGMENTS_PER_WORKER = 4
+
+
+def _render_segment(out: np.ndarray, config: dict, notes: List[Tuple[float, float]], state: dict, end: int):
+    """Render samples state['clock'] to end of the sequence into out (the whole output buffer)."""
+    engine = StreamingEngine(**config)
+    engine.restore_state(state)
+    engine.enqueue(notes)
+    engine.fill(out[state['clock']:end])
+
+
+def _render_shared_segment(name: str, total: int, dtype: str, config: dict,
+                           notes: List[Tuple[float, float]], state: dict, end: int) -> int:
+    """Worker entry point: render one segment straight into the shared output buffer."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray(total, dtype=dtype, buffer=shm.buf)
+        _render_segment(out, config, notes, state, end)
+        del out
+    finally:
+        shm.close()
+    return end - state['clock']
+
+
+class ParallelRenderer:
+    """
+    Render a long note sequence on several cores, bit-identical to a serial render.
+
+    The sequence is played by a StreamingEngine, whose phase-continuous voices
+    make each sample depend on everything before it. A cheap dry pass (the
+    engine's `advance`, which replays the exact phase arithmetic without
+    computing any samples) records the engine state at block boundaries; the
+    sequence is then cut at those boundaries into time-aligned segments, and
+    each worker process restores the state at its segment start and renders
+    the segment into one `multiprocessing.shared_memory` buffer. Segments are
+    disjoint and every worker runs the same blocks with the same arithmetic as
+    the serial engine, so the merged result matches it bit for bit whatever
+    the number of workers or the order they finish in.
+
+    The returned array is that shared buffer itself, not a copy: the segment
+    is unlinked as soon as the workers are done and unmapped once the array
+    and every view of it have been garbage collected.
+    """
+
+    def __init__(self, sample_rate: int = 44100, waveform: str = 'sine', blocksize: int = DEFAULT_BLOCKSIZE,
+                 gap: float = NOTE_GAP, oscillator: str = 'direct', fade: float = DEFAULT_FADE,
+                 workers: Optional[int] = None):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unsupported waveform type: {waveform}")
+        self.config = {'sample_rate': sample_rate, 'waveform': waveform, 'blocksize': blocksize,
+                       'gap': gap, 'oscillator': oscillator, 'fade': fade}
+        self.blocksize = blocksize
+        self.workers = workers or os.cpu_count() or 1
+
+    def plan(self, notes: List[Tuple[float, float]], segments: int) -> Tuple[int, List[dict], List[int]]:
+        """
+        Dry-run the sequence and cut it into segments.
+
+        Returns:
+            Total number of samples, the engine state at each segment start
+            and the end sample of each segment
+        """
+        engine = StreamingEngine(**self.config)
+        engine.enqueue(notes)
+        snapshots = [engine.save_state()]
+        total = 0
+        with instrumentation.timer('parallel.plan'):
+            while True:
+                frames = engine.advance(self.blocksize)
+                total += frames
+                if frames < self.blocksize:
+                    break
+                snapshots.append(engine.save_state())
+        # Every snapshot sits on a block boundary; pick the ones closest to equal shares
+        blocks = len(snapshots) - 1 if snapshots[-1]['clock'] == total else len(snapshots)
+        segments = max(1, min(segments, blocks))
+        indices = sorted({int(round(i * blocks / segments)) for i in range(segments)})
+        starts = [snapshots[i] for i in indices]
+        ends = [state['clock'] for state in starts[1:]] + [total]
+        return total, starts, ends
+
+    def render(self, notes: Iterable[Tuple[float, float]], dtype=np.float64) -> np.ndarray:
+        """
+        Render (frequency, duration) pairs to one waveform.
+
+        Args:
+            notes: (frequency, duration) pairs, played one after another
+            dtype: Sample type of the returned waveform
+
+        Returns:
+            numpy array equal to what StreamingEngine.fill produces for the same notes
+            (backed by the shared memory the workers wrote when they ran in parallel)
+        """
+        notes = [(float(frequency), float(duration)) for frequency, duration in notes]
+        dtype = np.dtype(dtype)
+        workers = self.workers
+        total, starts, ends = self.plan(notes, workers * SEGMENTS_PER_WORKER if workers > 1 else 1)
+        # A segment only admits the notes starting before its end, which the next start state has counted
+        counts = [state['admitted'] for state in starts[1:]] + [len(notes)]
+        jobs = [(notes[state['admitted']:count], state, end) for state, end, count in zip(starts, ends, counts)]
+
+        if workers == 1 or len(jobs) == 1 or total == 0:
+            out = np.zeros(total, dtype=dtype)
+            with instrumentation.timer('parallel.render'):
+                for segment_notes, state, end in jobs:
+                    _render_segment(out, self.config, segment_notes, state, end)
+            return out
+
+        shm = shared_memory.SharedMemory(create=True, size=total * dtype.itemsize)
+        try:
+            with instrumentation.timer('parallel.render'):
+                with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                    futures = [executor.submit(_render_shared_segment, shm.name, total, dtype.str, self.config,
+                                               segment_notes, state, end)
+                               for segment_notes, state, end in jobs]
+                    for future in futures:
+                        instrumentation.count('parallel.samples', future.result())
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        # Only the name goes away: the mapping stays valid until the array is collected
+        shm.unlink()
+        out = np.ndarray(total, dtype=dtype, buffer=shm.buf)
+        # Views keep out alive through their base, so the close never pulls memory from under one.
+        # Not at exit, where the array may still be referenced (the OS reclaims the mapping then).
+        weakref.finalize(out, shm.close).atexit = False
+        instrumentation.count('parallel.segments', len(jobs))
+        return out
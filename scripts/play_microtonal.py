@@ -1,36 +1,124 @@
+import argparse
+import os
 import sys
-import sounddevice as sd
 import numpy as np
-from microtonal import Synthesizer, create_example_scales
+from pathlib import Path
+import instrumentation
+from generate_gammes import CONFIG_PATH
+from microtonal import ScaleRegistry, Synthesizer, create_example_scales
+from render import WAVEFORMS
+from streaming import SoundDeviceSink, SoundFileSink, StreamingEngine, WavFileSink
+
+# sounddevice, Qt and the MIDI backends are imported only by the code paths that use
+# them, so listing scales or rendering to a file never loads an audio or GUI stack
 
 def play_audio(waveform: np.ndarray, sample_rate: int = 44100):
     """Play the generated waveform using sounddevice."""
+    import sounddevice as sd
+
     sd.play(waveform, sample_rate)
     sd.wait()
 
-def main():
-    synth = Synthesizer()
-    scales = create_example_scales()
+def stream_audio(engine: StreamingEngine):
+    """Play a streaming engine through a sounddevice output callback."""
+    SoundDeviceSink().play(engine)
 
-    print("Available scales:")
-    for i, scale_name in enumerate(scales.keys(), 1):
-        print(f"{i}. {scale_name}")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Play a microtonal scale")
+    parser.add_argument('scale', nargs='?',
+                        help="Name or number of the scale to play (default: choose interactively)")
+    parser.add_argument('--list', action='store_true', help="List the available scales and exit")
+    parser.add_argument('--waveform', default='sine', choices=WAVEFORMS)
+    parser.add_argument('--note-duration', type=float, default=0.5, help="Seconds per note")
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--output', type=Path, metavar='PATH',
+                        help="Write the audio to a .wav or .flac file instead of playing it")
+    parser.add_argument('--midi', action='store_true', help="Play through MIDI instead of audio")
+    parser.add_argument('--port', help="MIDI output port (default: the system default)")
+    parser.add_argument('--gammes', default=str(CONFIG_PATH), help="YAML file with extra gammes ('' to skip)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Record timers and counters of the synth, audio and MIDI paths and print them at exit")
+    parser.add_argument('--metrics-json', type=Path, metavar='PATH', help="Also write the metrics to a JSON file")
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help="Capture cProfile and tracemalloc data to PREFIX.prof and PREFIX.txt")
+    return parser.parse_args(argv)
 
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics or args.metrics_json:
+        instrumentation.enable()
+    capture = instrumentation.ProfileCapture(args.profile) if args.profile else None
+    if capture:
+        capture.start()
     try:
-        choice = int(input("Enter the number of the scale you want to play: "))
-        scale_name = list(scales.keys())[choice - 1]
-        selected_scale = scales[scale_name]
-    except (ValueError, IndexError):
-        print("Invalid choice. Please run the script again and enter a valid number.")
+        play_selected_scale(args)
+    finally:
+        if capture:
+            capture.stop()
+            print(f"\nProfile written to {args.profile}.prof and {args.profile}.txt")
+        if args.metrics:
+            print("\n" + instrumentation.report_text())
+        if args.metrics_json:
+            args.metrics_json.write_text(instrumentation.report_json())
+
+def load_scales(gammes_path: str = '') -> ScaleRegistry:
+    """Example scales plus the gammes of a YAML file, all built on first use."""
+    scales = create_example_scales()
+    if gammes_path and os.path.exists(gammes_path):
+        from scale_library import ScaleLibrary
+
+        scales.include(ScaleLibrary(gammes_path).scales())
+    return scales
+
+def find_scale(scales: ScaleRegistry, choice: str) -> str:
+    """Scale name for a name or a 1-based number from the list, or None."""
+    if choice in scales:
+        return choice
+    if choice.isdigit() and 1 <= int(choice) <= len(scales):
+        return list(scales)[int(choice) - 1]
+    return None
+
+def play_selected_scale(args=None):
+    if args is None:
+        args = parse_args([])
+    scales = load_scales(args.gammes)
+
+    if args.list or not args.scale:
+        print("Available scales:")
+        for i, scale_name in enumerate(scales, 1):
+            print(f"{i}. {scale_name}")
+        if args.list:
+            return
+
+    choice = args.scale or input("Enter the number of the scale you want to play: ")
+    scale_name = find_scale(scales, choice.strip())
+    if scale_name is None:
+        print(f"Invalid choice: {choice}. Run with --list to see the available scales.")
         sys.exit(1)
+    selected_scale = scales[scale_name]
+    synth = Synthesizer(args.sample_rate)
 
-    print(f"\nPlaying {scale_name} scale:")
-    waveform = synth.play_scale(selected_scale)
-    play_audio(waveform)
+    if args.midi:
+        print(f"\nPlaying {scale_name} scale over MIDI:")
+        synth.set_midi_port(args.port)
+        synth.play_scale(selected_scale, args.note_duration, use_midi=True)
+        synth.midi_scheduler.wait_idle()
+        synth.close_midi()
+    elif args.output:
+        engine = synth.stream_scale(selected_scale, args.note_duration, args.waveform)
+        if args.output.suffix.lower() == '.flac':
+            sink = SoundFileSink(str(args.output))
+        else:
+            sink = WavFileSink(str(args.output))
+        sink.play(engine)
+        print(f"\nWrote {scale_name} scale to {args.output} ({sink.samples / args.sample_rate:.1f} s)")
+    else:
+        print(f"\nPlaying {scale_name} scale:")
+        stream_audio(synth.stream_scale(selected_scale, args.note_duration, args.waveform))
 
     print("\nScale frequencies:")
-    for i, note in enumerate(selected_scale.notes):
-        print(f"Note {i+1}: {note.frequency:.2f} Hz")
+    for i, frequency in enumerate(selected_scale.frequencies):
+        print(f"Note {i+1}: {frequency:.2f} Hz")
 
     print("\nScale information:")
     if scale_name == "Arabic Rast":
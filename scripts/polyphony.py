@@ -0,0 +1,198 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Iterable, Union
+
+from render import WAVEFORMS, get_cycle_evaluator
+
+DEFAULT_BLOCKSIZE = 2048
+
+
+@dataclass
+class NoteEvent:
+    """A note in a polyphonic render: what, when, how long and how loud."""
+    note: Union[float, 'Note']
+    onset: float
+    duration: float
+    velocity: int = 64
+
+    @property
+    def frequency(self) -> float:
+        return getattr(self.note, 'frequency', self.note)
+
+
+@dataclass
+class Envelope:
+    """ADSR envelope; times in seconds, sustain as a level between 0 and 1."""
+    attack: float = 0.01
+    decay: float = 0.1
+    sustain: float = 0.8
+    release: float = 0.2
+
+
+class HeadroomLimiter:
+    """
+    Peak limiter keeping the mix under a ceiling.
+
+    Gain drops instantly to whatever a sample needs and recovers linearly at
+    `release` (gain units per second), so the output never exceeds the ceiling
+    and never pumps faster than the release rate.
+    """
+
+    def __init__(self, sample_rate: int = 44100, headroom_db: float = 1.0, release: float = 2.0):
+        self.ceiling = 10 ** (-headroom_db / 20)
+        self.step = release / sample_rate
+        self.gain = 1.0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Apply the limiter to a block in place and return it."""
+        if len(block) == 0:
+            return block
+        peaks = np.abs(block)
+        required = np.divide(self.ceiling, peaks, out=np.ones_like(peaks), where=peaks > self.ceiling)
+        # Unrolled gain[i] = min(required[i], gain[i - 1] + step) with ramp[i] = (i + 1) * step
+        ramp = np.arange(1, len(block) + 1) * self.step
+        gain = np.minimum.accumulate(np.minimum(required - ramp, self.gain)) + ramp
+        np.minimum(gain, 1.0, out=gain)
+        self.gain = float(gain[-1])
+        return np.multiply(block, gain, out=block)
+
+    def skip(self, frames: int):
+        """Let the gain recover over frames samples of silence."""
+        self.gain = min(1.0, self.gain + frames * self.step)
+
+
+class OnePoleLowpass:
+    """
+    One-pole low-pass filter whose cutoff can change from block to block.
+
+    The recursion y[n] = a * y[n - 1] + (1 - a) * x[n] is unrolled over
+    chunks of CHUNK samples: inside a chunk it is a small matrix product with
+    the decaying kernel, and only the state between chunks is carried in a
+    Python loop. The kernel is rebuilt only when the cutoff changes.
+    """
+    CHUNK = 32
+
+    def __init__(self, sample_rate: int = 44100):
+        self.sample_rate = sample_rate
+        self.state = 0.0
+        steps = np.arange(self.CHUNK)
+        self._lags = steps[:, None] - steps[None, :]
+        self._cutoff = None
+
+    def _set_cutoff(self, cutoff: float):
+        self._cutoff = cutoff
+        a = np.exp(-2 * np.pi * min(cutoff, 0.49 * self.sample_rate) / self.sample_rate)
+        # kernel[k, j]: weight of input k in output j of a chunk
+        self._kernel = np.where(self._lags >= 0, a ** np.maximum(self._lags, 0), 0.0).T * (1 - a)
+        self._decay = a ** np.arange(1, self.CHUNK + 1)
+
+    def process(self, block: np.ndarray, cutoff: float) -> np.ndarray:
+        """Filter a block in place at the given cutoff (Hz) and return it."""
+        if cutoff != self._cutoff:
+            self._set_cutoff(cutoff)
+        full = len(block) // self.CHUNK * self.CHUNK
+        state = self.state
+        if full:
+            chunks = block[:full].reshape(-1, self.CHUNK) @ self._kernel
+            for row in chunks:
+                row += self._decay * state
+                state = row[-1]
+            block[:full] = chunks.ravel()
+        rest = len(block) - full
+        if rest:
+            tail = block[full:] @ self._kernel[:rest, :rest] + self._decay[:rest] * state
+            block[full:] = tail
+            state = tail[-1]
+        self.state = float(state)
+        return block
+
+
+class PolyphonicRenderer:
+    """
+    Render overlapping note events by summing all active voices per block.
+
+    Events are sorted by onset once; each block only touches the voices that
+    sound in it (newly started ones are appended, finished ones compacted
+    away), and those voices are evaluated together as one (voices x samples)
+    matrix. The cost therefore follows the number of active voices rather than
+    the total number of events.
+    """
+
+    def __init__(self, sample_rate: int = 44100, waveform: str = 'sine', envelope: Envelope = None,
+                 blocksize: int = DEFAULT_BLOCKSIZE, headroom_db: float = 1.0, oscillator: str = 'direct'):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unsupported waveform type: {waveform}")
+        self.sample_rate = sample_rate
+        self.waveform = waveform
+        self.envelope = envelope or Envelope()
+        self.blocksize = blocksize
+        self.headroom_db = headroom_db
+        self._evaluate = get_cycle_evaluator(oscillator, sample_rate)
+
+    def _envelope(self, n: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """ADSR gain for local sample positions n (voices x samples) of notes lasting lengths samples."""
+        env = self.envelope
+        sr = self.sample_rate
+        attack = max(env.attack * sr, 1.0)
+        decay = max(env.decay * sr, 1.0)
+        release = max(env.release * sr, 1.0)
+        held = np.minimum(n, lengths)
+        # min(attack ramp, decay ramp) is the attack/decay/sustain curve
+        gain = np.minimum(np.clip(held / attack, 0.0, 1.0),
+                          1.0 - (1.0 - env.sustain) * np.clip((held - attack) / decay, 0.0, 1.0))
+        gain *= np.clip(1.0 - (n - held) / release, 0.0, 1.0)
+        gain[n < 0] = 0.0
+        return gain
+
+    def render(self, events: Iterable[NoteEvent], dtype=np.float64) -> np.ndarray:
+        """
+        Render a list of note events to a single waveform.
+
+        Args:
+            events: NoteEvent objects (notes may overlap freely)
+            dtype: Sample type of the returned waveform
+
+        Returns:
+            numpy array containing the mixed, limited waveform
+        """
+        events = list(events)
+        sr = self.sample_rate
+        release = int(self.envelope.release * sr)
+        if not events:
+            return np.zeros(0, dtype=dtype)
+
+        frequencies = np.array([event.frequency for event in events], dtype=np.float64)
+        starts = np.array([int(round(event.onset * sr)) for event in events], dtype=np.int64)
+        lengths = np.array([int(event.duration * sr) for event in events], dtype=np.int64)
+        amplitudes = np.array([event.velocity / 127 for event in events], dtype=np.float64)
+        order = np.argsort(starts, kind='stable')
+        frequencies, starts, lengths, amplitudes = (frequencies[order], starts[order],
+                                                    lengths[order], amplitudes[order])
+        ends = starts + lengths + release
+
+        total = int(ends.max())
+        out = np.zeros(total, dtype=dtype)
+        limiter = HeadroomLimiter(sr, self.headroom_db)
+        offsets = np.arange(self.blocksize, dtype=np.int64)
+        active = np.zeros(0, dtype=np.int64)
+        next_event = 0
+
+        for block_start in range(0, total, self.blocksize):
+            block_end = min(block_start + self.blocksize, total)
+            # Admit events starting in this block, drop voices that have finished
+            first_later = int(np.searchsorted(starts, block_end, side='left'))
+            if first_later > next_event:
+                active = np.concatenate([active, np.arange(next_event, first_later)])
+                next_event = first_later
+            active = active[ends[active] > block_start]
+            if len(active) == 0:
+                # Silent block: nothing to render, but the limiter keeps releasing
+                limiter.skip(block_end - block_start)
+                continue
+
+            n = (block_start - starts[active])[:, None] + offsets[None, :block_end - block_start]
+            cycles = n * (frequencies[active] / sr)[:, None]
+            voices = self._evaluate(frequencies[active], cycles, self.waveform)
+            voices *= self._envelope(n, lengths[active][:, None])
+            out[block_start:block_end] = limiter.process(amplitudes[active] @ voices)
+        return out
@@ -0,0 +1,121 @@
+import functools
+import numpy as np
+from typing import Sequence, Tuple
+
+# Number of distinct parameter sets kept per generator
+CACHE_SIZE = 4096
+
+
+def _frozen(values: np.ndarray) -> np.ndarray:
+    values.setflags(write=False)
+    return values
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def divisions_cents(divisions: Tuple[int, ...], include_top: bool = False) -> np.ndarray:
+    """
+    Cents of a range where octave k is split into divisions[k] equal steps.
+
+    Args:
+        divisions: Number of equal steps in each successive octave
+        include_top: Also return the octave closing the last division
+
+    Returns:
+        Read-only array of cents above the base frequency
+    """
+    counts = np.asarray(divisions, dtype=np.int64)
+    octave = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    step = np.arange(counts.sum()) - np.repeat(first, counts)
+    cents = 1200.0 * (octave + step / np.repeat(counts, counts))
+    if include_top:
+        cents = np.append(cents, 1200.0 * len(counts))
+    return _frozen(cents)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def patterns_cents(patterns: Tuple[Tuple[float, ...], ...], include_top: bool = False) -> np.ndarray:
+    """
+    Cents of a range where each octave has its own interval pattern.
+
+    Args:
+        patterns: For every octave, the cents (0 to 1200) of its notes relative to the octave start
+        include_top: Also return the octave closing the last pattern
+
+    Returns:
+        Read-only array of cents above the base frequency
+    """
+    lengths = np.array([len(pattern) for pattern in patterns], dtype=np.int64)
+    offsets = np.repeat(1200.0 * np.arange(len(patterns)), lengths)
+    cents = np.concatenate([np.asarray(pattern, dtype=np.float64) for pattern in patterns] or [np.zeros(0)])
+    cents = cents + offsets
+    if include_top:
+        cents = np.append(cents, 1200.0 * len(patterns))
+    return _frozen(cents)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def density_cents(densities: Tuple[float, ...], num_octaves: float, include_top: bool = False) -> np.ndarray:
+    """
+    Cents of a range whose note density varies continuously.
+
+    The density (notes per octave) is piecewise linear between the values of
+    `densities`, which are spread evenly from the bottom to the top of the
+    range. Notes are placed where the integrated density crosses each
+    integer, solved in closed form for every note at once.
+
+    Args:
+        densities: Notes per octave at evenly spaced points (at least two)
+        num_octaves: Width of the range in octaves
+        include_top: Also return a note at the very top of the range
+
+    Returns:
+        Read-only array of cents above the base frequency
+    """
+    if len(densities) < 2:
+        raise ValueError("At least two density points are needed")
+    density = np.asarray(densities, dtype=np.float64)
+    if np.any(density <= 0):
+        raise ValueError("Densities must be positive")
+    width = num_octaves / (len(density) - 1)
+
+    # Notes contributed by each segment (trapezoid area) and their running total
+    start, end = density[:-1], density[1:]
+    counts = (start + end) / 2 * width
+    cumulative = np.concatenate(([0.0], np.cumsum(counts)))
+
+    targets = np.arange(int(np.floor(cumulative[-1] + 1e-9)) + 1, dtype=np.float64)
+    segment = np.clip(np.searchsorted(cumulative, targets, side='right') - 1, 0, len(counts) - 1)
+    a = start[segment] * width
+    b = (end[segment] - start[segment]) * width
+    remainder = targets - cumulative[segment]
+    # Solve b/2 t^2 + a t = remainder for t in [0, 1] (stable form, also valid for b == 0)
+    t = 2 * remainder / (a + np.sqrt(np.maximum(a * a + 2 * b * remainder, 0.0)))
+    octaves = (segment + np.clip(t, 0.0, 1.0)) * width
+
+    if include_top and octaves[-1] < num_octaves - 1e-9:
+        octaves = np.append(octaves, num_octaves)
+    return _frozen(1200.0 * octaves)
+
+
+def clear_cache():
+    """Drop every memoized generator result."""
+    divisions_cents.cache_clear()
+    patterns_cents.cache_clear()
+    density_cents.cache_clear()
+
+
+def as_tuple(values: Sequence) -> tuple:
+    """Normalize list/array parameters into hashable cache keys."""
+    return tuple(tuple(value) if isinstance(value, (list, tuple, np.ndarray)) else value for value in values)
+
+
+if __name__ == "__main__":
+    import timeit
+
+    # Sweep of density variants: sparse bass, dense treble
+    variants = [(float(low), float(high)) for low in range(3, 13) for high in range(12, 72)]
+    first = timeit.timeit(lambda: [density_cents(v, 7.0) for v in variants], number=1)
+    cached = timeit.timeit(lambda: [density_cents(v, 7.0) for v in variants], number=10) / 10
+    print(f"{len(variants)} variants: {first / len(variants) * 1e6:.1f} us each cold, "
+          f"{cached / len(variants) * 1e6:.2f} us each cached")
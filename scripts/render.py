@@ -0,0 +1,199 @@
+import functools
+import numpy as np
+from typing import Callable, Sequence
+
+import instrumentation
+import wavetable
+from render_cache import render_key
+
+# Silence inserted after every note of a rendered scale (seconds)
+NOTE_GAP = 0.1
+
+# Upper bound on the (notes x samples) phase matrix evaluated in one go
+MAX_BLOCK_ELEMENTS = 1 << 21
+
+WAVEFORMS = ('sine', 'sawtooth', 'square')
+
+# 'direct' evaluates the waveform formulas, 'wavetable' reads band-limited tables
+OSCILLATORS = ('direct', 'wavetable')
+
+
+def note_samples(duration: float, sample_rate: int) -> int:
+    """Number of samples used for a note of the given duration."""
+    return int(sample_rate * duration)
+
+
+def evaluate_notes(frequencies: np.ndarray, t: np.ndarray, waveform: str, out: np.ndarray) -> np.ndarray:
+    """
+    Evaluate one waveform per frequency over a shared time base.
+
+    Args:
+        frequencies: Frequencies of the notes (one row each)
+        t: Time of every sample in the note, in seconds
+        waveform: Type of waveform ('sine', 'sawtooth', or 'square')
+        out: Scratch array of shape (len(frequencies), len(t)) to fill
+
+    Returns:
+        out, now holding the samples of every note
+    """
+    # Operation order matches Synthesizer.generate_*_wave so results are identical
+    if waveform == 'sine':
+        np.multiply.outer(2 * np.pi * frequencies, t, out=out)
+        return np.sin(out, out=out)
+    elif waveform == 'sawtooth':
+        np.multiply.outer(frequencies, t, out=out)
+        floor = np.floor(0.5 + out)
+        np.subtract(out, floor, out=out)
+        return np.multiply(out, 2, out=out)
+    elif waveform == 'square':
+        np.multiply.outer(2 * np.pi * frequencies, t, out=out)
+        np.sin(out, out=out)
+        return np.sign(out, out=out)
+    else:
+        raise ValueError(f"Unsupported waveform type: {waveform}")
+
+
+def evaluate_cycles(frequencies: np.ndarray, cycles: np.ndarray, waveform: str) -> np.ndarray:
+    """
+    Evaluate a waveform over per-voice phases, in place.
+
+    Args:
+        frequencies: Frequency of each row (unused here, kept for the wavetable signature)
+        cycles: Phase of every sample in cycles, one row per voice
+        waveform: Type of waveform ('sine', 'sawtooth', or 'square')
+
+    Returns:
+        cycles, now holding the waveform samples
+    """
+    if waveform == 'sine':
+        np.multiply(cycles, 2 * np.pi, out=cycles)
+        return np.sin(cycles, out=cycles)
+    elif waveform == 'sawtooth':
+        floor = np.floor(0.5 + cycles)
+        np.subtract(cycles, floor, out=cycles)
+        return np.multiply(cycles, 2, out=cycles)
+    elif waveform == 'square':
+        np.multiply(cycles, 2 * np.pi, out=cycles)
+        np.sin(cycles, out=cycles)
+        return np.sign(cycles, out=cycles)
+    else:
+        raise ValueError(f"Unsupported waveform type: {waveform}")
+
+
+def get_evaluator(oscillator: str, sample_rate: int) -> Callable:
+    """Return the evaluate_notes implementation for an oscillator type."""
+    if oscillator == 'direct':
+        return evaluate_notes
+    elif oscillator == 'wavetable':
+        return functools.partial(wavetable.evaluate_notes, sample_rate=sample_rate)
+    else:
+        raise ValueError(f"Unsupported oscillator type: {oscillator}")
+
+
+def get_cycle_evaluator(oscillator: str, sample_rate: int) -> Callable:
+    """Return the evaluate_cycles implementation for an oscillator type."""
+    if oscillator == 'direct':
+        return evaluate_cycles
+    elif oscillator == 'wavetable':
+        return functools.partial(wavetable.evaluate_cycles, sample_rate=sample_rate)
+    else:
+        raise ValueError(f"Unsupported oscillator type: {oscillator}")
+
+
+class ScaleRenderer:
+    """
+    Render a sequence of notes into a single preallocated buffer.
+
+    The total length is known up front (every note has the same duration and
+    is followed by the same gap), so the output is allocated once and each
+    group of notes is evaluated as one vectorized (notes x samples) phase
+    computation written straight into its slot.
+    """
+
+    def __init__(self, sample_rate: int = 44100, gap: float = NOTE_GAP, dtype=np.float64,
+                 oscillator: str = 'direct', cache=None):
+        """
+        Args:
+            sample_rate: Output sample rate in Hz
+            gap: Silence after every note in seconds
+            dtype: Sample type of the output buffer
+            oscillator: 'direct' or 'wavetable' (see get_evaluator)
+            cache: Optional RenderCache; notes found there are copied instead of
+                evaluated, and newly evaluated notes are added to it
+        """
+        self.sample_rate = sample_rate
+        self.gap = gap
+        self.dtype = np.dtype(dtype)
+        self.oscillator = oscillator
+        self.cache = cache
+        self._evaluate = get_evaluator(oscillator, sample_rate)
+
+    def note_key(self, frequency: float, note_duration: float, waveform: str) -> str:
+        """Render cache key of one note (without its gap)."""
+        return render_key('note', frequency, note_duration, waveform, self.sample_rate, oscillator=self.oscillator)
+
+    def total_samples(self, num_notes: int, note_duration: float) -> int:
+        """Length of the buffer needed for num_notes notes."""
+        stride = note_samples(note_duration, self.sample_rate) + note_samples(self.gap, self.sample_rate)
+        return num_notes * stride
+
+    def render(self, frequencies: Sequence[float], note_duration: float = 0.5,
+               waveform: str = 'sine', out: np.ndarray = None) -> np.ndarray:
+        """
+        Render every frequency as a note followed by a short silence.
+
+        Args:
+            frequencies: Frequencies of the notes to render, in order
+            note_duration: Duration of each note in seconds
+            waveform: Type of waveform ('sine', 'sawtooth', or 'square')
+            out: Optional buffer to render into (must be at least total_samples long)
+
+        Returns:
+            numpy array containing the complete waveform
+        """
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unsupported waveform type: {waveform}")
+
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        num_notes = len(frequencies)
+        length = note_samples(note_duration, self.sample_rate)
+        stride = length + note_samples(self.gap, self.sample_rate)
+        total = num_notes * stride
+
+        if out is None:
+            out = np.zeros(total, dtype=self.dtype)
+        else:
+            out = out[:total]
+            out.fill(0)
+        if total == 0 or length == 0:
+            return out
+
+        # Same time base as Synthesizer.generate_*_wave
+        t = np.linspace(0, note_duration, length, False)
+        slots = out.reshape(num_notes, stride)
+
+        todo = np.arange(num_notes)
+        if self.cache is not None:
+            keys = [self.note_key(frequency, note_duration, waveform) for frequency in frequencies.tolist()]
+            missing = []
+            for i, key in enumerate(keys):
+                tone = self.cache.get(key)
+                if tone is None:
+                    missing.append(i)
+                else:
+                    slots[i, :length] = tone
+            todo = np.array(missing, dtype=np.intp)
+
+        # Evaluate the notes in groups so the scratch matrix stays bounded
+        group = max(1, min(len(todo), MAX_BLOCK_ELEMENTS // length))
+        scratch = np.empty((group, length), dtype=np.float64)
+        for start in range(0, len(todo), group):
+            rows = todo[start:start + group]
+            with instrumentation.timer('render.evaluate'):
+                notes = self._evaluate(frequencies[rows], t, waveform, scratch[:len(rows)])
+            with instrumentation.timer('render.copy'):
+                slots[rows, :length] = notes
+            if self.cache is not None:
+                for i, tone in zip(rows.tolist(), notes):
+                    self.cache.put(keys[i], tone.copy())
+        return out
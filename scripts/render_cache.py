@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, is_dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def render_key(kind: str, frequencies, duration: float, waveform: str, sample_rate: int,
+               envelope=None, **extra) -> str:
+    """
+    Content address of a rendered buffer.
+
+    Args:
+        kind: What was rendered ('note', 'scale', ...)
+        frequencies: Frequency or array of frequencies rendered
+        duration: Duration of each note in seconds
+        waveform: Type of waveform
+        sample_rate: Output sample rate
+        envelope: Envelope applied (dataclass or None)
+        extra: Any other parameter that changes the samples (oscillator, dtype...)
+    """
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(frequencies, dtype=np.float64).tobytes())
+    envelope = astuple(envelope) if is_dataclass(envelope) else envelope
+    params = (kind, float(duration), waveform, int(sample_rate), envelope, sorted(extra.items()))
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    LRU cache of rendered audio buffers with a memory budget and an optional disk tier.
+
+    Buffers are stored read-only and returned as is, so a hit costs a dict
+    lookup. When the memory budget is exceeded the least recently used
+    buffers are dropped. With disk_dir set, every buffer is also written there
+    as .npy, so evicted buffers (and those from earlier runs) are read back
+    instead of re-rendered.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            buffer = self._entries.get(key)
+            if buffer is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return buffer
+        buffer = self._read_disk(key)
+        with self._lock:
+            if buffer is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk_hits'] += 1
+            self._insert(key, buffer)
+        return buffer
+
+    def put(self, key: str, buffer: np.ndarray) -> np.ndarray:
+        """Store a buffer (it is made read-only) and return it."""
+        buffer.setflags(write=False)
+        with self._lock:
+            self._insert(key, buffer)
+        self._write_disk(key, buffer)
+        return buffer
+
+    def _insert(self, key: str, buffer: np.ndarray):
+        if buffer.nbytes > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous.nbytes
+        self._entries[key] = buffer
+        self.bytes += buffer.nbytes
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.stats['evictions'] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.npy"
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        if self.disk_dir is None:
+            return None
+        try:
+            buffer = np.load(self._disk_path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        buffer.setflags(write=False)
+        return buffer
+
+    def _write_disk(self, key: str, buffer: np.ndarray):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        if path.exists():
+            return
+        temporary = path.with_suffix('.tmp.npy')
+        try:
+            np.save(temporary, buffer, allow_pickle=False)
+            os.replace(temporary, path)
+        except OSError as error:
+            print(f"Could not write render cache entry {path}: {error}")
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+        if disk and self.disk_dir is not None:
+            for path in self.disk_dir.glob('*.npy'):
+                path.unlink()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['disk_hits'] + self.stats['misses']
+        return (self.stats['hits'] + self.stats['disk_hits']) / lookups if lookups else 0.0
+
+    def metrics(self) -> dict:
+        """Counters and memory use as plain data (an instrumentation source)."""
+        return dict(self.stats, bytes=self.bytes)
+
+    def report(self) -> str:
+        return (f"entries={len(self)} memory={self.bytes / 1e6:.1f}/{self.max_bytes / 1e6:.0f} MB "
+                f"hits={self.stats['hits']} disk_hits={self.stats['disk_hits']} misses={self.stats['misses']} "
+                f"evictions={self.stats['evictions']} hit_rate={self.hit_rate():.0%}")
@@ -0,0 +1,507 @@
+# python scripts/render_server.py --port 8765 [--unix /tmp/polygamme.sock] [--cache-dir .cache/renders]
+
+"""
+Long-lived render service: scale synthesis over a local TCP or Unix socket.
+
+Synthesizers, scales and render caches stay warm between requests, so other
+tools can ask for audio or MIDI without paying the NumPy import and the
+interactive prompt of play_microtonal.py on every call.
+
+Protocol (one connection may carry any number of requests, answered in order):
+
+    request   one JSON object on a line, e.g.
+              {"id": 1, "scale": "12-TET", "format": "s16", "waveform": "sine",
+               "note_duration": 0.5, "sample_rate": 48000}
+    header    one JSON line describing the body ({"id", "format", "sample_rate", "stream", ...})
+    body      chunks framed as a 4-byte big-endian length followed by the bytes,
+              ended by a zero-length chunk
+    trailer   one JSON line with the request latency ({"id", "first_byte_ms", "total_ms", "bytes"})
+
+"scale" is a name (the example scales and the gammes of config/gammes.yaml)
+or a definition: {"frequencies": [...]}, {"cents": [...]}, {"ratios": [...]}
+or {"equal_temperament": 19, "octaves": 1}, each with an optional "base" in Hz.
+Formats are "s16" and "f32" (little-endian mono PCM) and "midi" (a Standard
+MIDI File with pitch bends or MTS retuning). Audio renders through the
+shared render cache, or block by block from a StreamingEngine when "stream"
+is true. Without a "stream" field, renders longer than MAX_BUFFERED_SECONDS
+are streamed; "stream": false on such a request is an error. The header's
+"stream" field says which path served the request, and only buffered
+replies carry "frames". {"op": "list"} and {"op": "stats"} return a single
+JSON line.
+
+Request lines are limited to MAX_REQUEST_BYTES and scale definitions to
+MAX_NOTES notes. Errors are reported as {"id": ..., "error": "..."} in place
+of the header; a render that fails once its header is out closes the
+connection instead.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import struct
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import mido
+import numpy as np
+
+import instrumentation
+from export_scales import TICKS_PER_BEAT
+from generate_gammes import CONFIG_PATH
+from microtonal import Scale, Synthesizer, create_example_scales
+from midi_output import MemoryOutputPort, MIDIOutput
+from midi_tuning import MTS_MAX_KEYS, MicrotonalMIDI
+from render import NOTE_GAP, WAVEFORMS, ScaleRenderer
+from render_cache import RenderCache
+from scale_library import ScaleLibrary
+
+DEFAULT_PORT = 8765
+FORMATS = ('s16', 'f32', 'midi')
+# Frames per body chunk; the transport buffers at most a few chunks per client
+CHUNK_FRAMES = 8192
+WRITE_BUFFER_CHUNKS = 4
+# Longer renders are streamed instead of materialized in the render cache
+MAX_BUFFERED_SECONDS = 600.0
+MAX_NOTE_DURATION = 60.0
+MAX_NOTES = 100_000
+# Longest request line (an inline definition of MAX_NOTES frequencies fits)
+MAX_REQUEST_BYTES = 4 * 1024 * 1024
+SAMPLE_RATE_RANGE = (8000, 384000)
+# Scales built from inline definitions kept around for repeated requests
+DEFINITION_CACHE_SIZE = 256
+FRAME = struct.Struct('>I')
+
+
+class RequestError(Exception):
+    """A request that cannot be served; its message is sent back to the client."""
+
+
+class ReplyBroken(Exception):
+    """A failure after the header went out: the reply is cut short and the connection closed."""
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
+def scale_midi_file(scale: Scale, note_duration: float, mode: str = 'mpe') -> bytes:
+    """Standard MIDI File playing the scale at its exact pitch, at 60 BPM (one beat per second)."""
+    port = MemoryOutputPort()
+    tuner = MicrotonalMIDI(MIDIOutput(port=port), mode)
+    tuner.load_scale(scale)
+
+    mid = mido.MidiFile(ticks_per_beat=TICKS_PER_BEAT)
+    track = mido.MidiTrack()
+    mid.tracks.append(track)
+    # A fixed tempo (set_tempo cannot go below ~3.6 BPM) with note lengths in ticks
+    track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(60.0), time=0))
+    track.extend(port.messages)
+    note_ticks = max(1, int(round(note_duration * TICKS_PER_BEAT)))
+    gap_ticks = int(round(NOTE_GAP * TICKS_PER_BEAT))
+    for degree in range(len(scale)):
+        sent = len(port.messages)
+        tuner.note_on(degree)
+        on = port.messages[sent:]
+        on[0] = on[0].copy(time=gap_ticks if degree else 0)
+        track.extend(on)
+        sent = len(port.messages)
+        tuner.note_off(degree)
+        track.extend(message.copy(time=note_ticks) if i == 0 else message
+                     for i, message in enumerate(port.messages[sent:]))
+    buffer = io.BytesIO()
+    mid.save(file=buffer)
+    return buffer.getvalue()
+
+
+class RenderServer:
+    """
+    Serve renders to many clients from one process.
+
+    Renders run on the default thread pool (at most max_renders at once) so
+    the event loop keeps answering other clients; bytes are written chunk by
+    chunk and every chunk waits for the client to drain the transport buffer,
+    so a slow reader holds back only its own request.
+    """
+
+    def __init__(self, gammes_path=CONFIG_PATH, cache: Optional[RenderCache] = None,
+                 oscillator: str = 'direct', max_renders: Optional[int] = None, verbose: bool = True):
+        self.cache = cache if cache is not None else RenderCache()
+        self.oscillator = oscillator
+        self.verbose = verbose
+        self.scales = create_example_scales()
+        if gammes_path and os.path.exists(gammes_path):
+            self.scales.include(ScaleLibrary(gammes_path).scales())
+        self._synths: Dict[int, Synthesizer] = {}
+        self._definitions: OrderedDict = OrderedDict()
+        self._midi_files: OrderedDict = OrderedDict()
+        self._renders = asyncio.Semaphore(max_renders or os.cpu_count() or 1)
+        self._servers = []
+        self.clients = 0
+        instrumentation.register_source('server', lambda: {'clients': self.clients, 'scales': len(self.scales)})
+        instrumentation.register_source('render_cache', self.cache.metrics)
+
+    def synth(self, sample_rate: int) -> Synthesizer:
+        synth = self._synths.get(sample_rate)
+        if synth is None:
+            synth = self._synths[sample_rate] = Synthesizer(sample_rate, self.oscillator, render_cache=self.cache)
+        return synth
+
+    def resolve_scale(self, spec) -> Scale:
+        """Scale for a request: a known name or an inline definition."""
+        if isinstance(spec, str):
+            try:
+                return self.scales[spec]
+            except KeyError:
+                raise RequestError(f"Unknown scale: {spec}") from None
+        if not isinstance(spec, dict):
+            raise RequestError("scale must be a name or an object")
+        key = json.dumps(spec, sort_keys=True)
+        scale = self._definitions.get(key)
+        if scale is not None:
+            self._definitions.move_to_end(key)
+            return scale
+        scale = self._build_scale(spec)
+        self._definitions[key] = scale
+        if len(self._definitions) > DEFINITION_CACHE_SIZE:
+            self._definitions.popitem(last=False)
+        return scale
+
+    @staticmethod
+    def _build_scale(spec: dict) -> Scale:
+        try:
+            scale = Scale(float(spec.get('base', 440.0)))
+            for field in ('frequencies', 'cents', 'ratios'):
+                if field in spec and (not isinstance(spec[field], list) or len(spec[field]) > MAX_NOTES):
+                    raise RequestError(f"{field} must be a list of at most {MAX_NOTES} numbers")
+            if 'frequencies' in spec:
+                scale.set_frequencies(spec['frequencies'])
+            elif 'cents' in spec:
+                scale.set_cents(spec['cents'])
+            elif 'ratios' in spec:
+                scale.set_ratios(spec['ratios'])
+            elif 'equal_temperament' in spec:
+                divisions, octaves = int(spec['equal_temperament']), int(spec.get('octaves', 1))
+                if not 0 < divisions * octaves <= MAX_NOTES:
+                    raise RequestError(f"equal_temperament must give 1 to {MAX_NOTES} notes")
+                scale.generate_equal_temperament(divisions, octaves)
+            else:
+                raise RequestError("scale needs frequencies, cents, ratios or equal_temperament")
+        except (TypeError, ValueError) as error:
+            raise RequestError(f"Invalid scale definition: {error}") from None
+        if not len(scale) or not np.all(np.isfinite(scale.frequencies)) or np.any(scale.frequencies <= 0):
+            raise RequestError("Scale frequencies must be positive and finite")
+        return scale
+
+    async def midi_file(self, scale: Scale, note_duration: float, mode: str) -> bytes:
+        key = (scale.frequencies.tobytes(), scale.base_frequency, scale.base_midi_note, note_duration, mode)
+        data = self._midi_files.get(key)
+        if data is None:
+            data = self._midi_files[key] = await self.run_render(scale_midi_file, scale, note_duration, mode)
+            if len(self._midi_files) > DEFINITION_CACHE_SIZE:
+                self._midi_files.popitem(last=False)
+        else:
+            self._midi_files.move_to_end(key)
+        return data
+
+    async def run_render(self, function, *args):
+        """Run function(*args) on the default thread pool, at most max_renders at once."""
+        async with self._renders:
+            return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    @staticmethod
+    async def read_line(reader: asyncio.StreamReader) -> bytes:
+        """
+        Next request line (b'' at the end of the stream).
+
+        Raises:
+            RequestError: if the line is longer than the stream limit; the
+                whole line is skipped so the next request is read intact
+        """
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error:
+            return error.partial
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b'\n')
+                break
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+        raise RequestError(f"Request line longer than {MAX_REQUEST_BYTES} bytes")
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername') or 'unix'
+        writer.transport.set_write_buffer_limits(high=CHUNK_FRAMES * 4 * WRITE_BUFFER_CHUNKS)
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    line = await self.read_line(reader)
+                except RequestError as error:
+                    instrumentation.count('server.errors')
+                    await self.send_json(writer, {'id': None, 'error': str(error)})
+                    continue
+                if not line:
+                    break
+                if line.strip():
+                    await self.handle_request(line, writer, peer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            # The reply may be half sent, so the connection cannot be reused
+            traceback.print_exc()
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def handle_request(self, line: bytes, writer: asyncio.StreamWriter, peer):
+        start = time.perf_counter()
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                raise RequestError(f"Invalid JSON: {error}") from None
+            if not isinstance(request, dict):
+                raise RequestError("Request must be a JSON object")
+            request_id = request.get('id')
+            op = request.get('op', 'render')
+            if op == 'list':
+                await self.send_json(writer, {'id': request_id, 'scales': list(self.scales)})
+            elif op == 'stats':
+                await self.send_json(writer, {'id': request_id, **instrumentation.snapshot()})
+            elif op == 'render':
+                await self.render(request, writer, start, peer)
+            else:
+                raise RequestError(f"Unknown op: {op}")
+        except RequestError as error:
+            instrumentation.count('server.errors')
+            await self.send_json(writer, {'id': request_id, 'error': str(error)})
+        except (ConnectionError, ReplyBroken):
+            raise
+        except Exception as error:
+            # Nothing was sent yet, so the client gets an answer and the connection stays usable
+            traceback.print_exc()
+            instrumentation.count('server.errors')
+            await self.send_json(writer, {'id': request_id, 'error': f"Render failed: {error}"})
+
+    async def render(self, request: dict, writer: asyncio.StreamWriter, start: float, peer):
+        request_id = request.get('id')
+        scale = self.resolve_scale(request.get('scale'))
+        fmt = request.get('format', 's16')
+        waveform = request.get('waveform', 'sine')
+        try:
+            note_duration = float(request.get('note_duration', 0.5))
+            sample_rate = int(request.get('sample_rate', 44100))
+        except (TypeError, ValueError) as error:
+            raise RequestError(str(error)) from None
+        if fmt not in FORMATS:
+            raise RequestError(f"Unsupported format: {fmt} (expected one of {', '.join(FORMATS)})")
+        if waveform not in WAVEFORMS:
+            raise RequestError(f"Unsupported waveform type: {waveform}")
+        if not 0 < note_duration <= MAX_NOTE_DURATION:
+            raise RequestError(f"note_duration must be in (0, {MAX_NOTE_DURATION}] seconds")
+        if not SAMPLE_RATE_RANGE[0] <= sample_rate <= SAMPLE_RATE_RANGE[1]:
+            raise RequestError(f"sample_rate must be within {SAMPLE_RATE_RANGE[0]}..{SAMPLE_RATE_RANGE[1]} Hz")
+
+        header = {'id': request_id, 'format': fmt, 'notes': len(scale)}
+        if fmt == 'midi':
+            mode = request.get('midi_tuning', 'mpe')
+            if mode not in ('mpe', 'mts'):
+                raise RequestError(f"Unsupported MIDI tuning mode: {mode}")
+            if mode == 'mts' and len(scale) > MTS_MAX_KEYS:
+                raise RequestError(f"MTS can retune at most {MTS_MAX_KEYS} keys (scale has {len(scale)} notes)")
+            data = await self.midi_file(scale, note_duration, mode)
+            sent, first_byte = await self.send_body(writer, header, [data], start)
+        else:
+            synth = self.synth(sample_rate)
+            too_long = len(scale) * (note_duration + NOTE_GAP) > MAX_BUFFERED_SECONDS
+            stream = request.get('stream')
+            if stream is None:
+                stream = too_long
+            elif not stream and too_long:
+                raise RequestError(f"Render longer than {MAX_BUFFERED_SECONDS:g} s; request it with \"stream\": true")
+            header.update(sample_rate=sample_rate, channels=1, stream=bool(stream))
+            if stream:
+                chunks = self.stream_chunks(synth.stream_scale(scale, note_duration, waveform, CHUNK_FRAMES), fmt)
+            else:
+                header['frames'] = ScaleRenderer(sample_rate).total_samples(len(scale), note_duration)
+                samples = await self.run_render(
+                    lambda: synth.play_scale(scale, note_duration, waveform, dtype=np.float32))
+                chunks = self.buffer_chunks(samples, fmt)
+            sent, first_byte = await self.send_body(writer, header, chunks, start)
+
+        total = time.perf_counter() - start
+        instrumentation.count('server.requests')
+        instrumentation.count('server.bytes', sent)
+        instrumentation.observe('server.first_byte', first_byte)
+        instrumentation.observe('server.request', total)
+        await self.send_json(writer, {'id': request_id, 'bytes': sent, 'first_byte_ms': first_byte * 1e3,
+                                      'total_ms': total * 1e3})
+        if self.verbose:
+            print(f"{peer} id={request_id} {len(scale)} notes {fmt}: {sent} bytes, "
+                  f"first byte {first_byte * 1e3:.1f} ms, total {total * 1e3:.1f} ms")
+
+    @staticmethod
+    def buffer_chunks(samples: np.ndarray, fmt: str):
+        """Encode a rendered buffer chunk by chunk (one reusable int16 buffer for s16)."""
+        pcm = np.empty(CHUNK_FRAMES, dtype=np.int16)
+        for position in range(0, len(samples), CHUNK_FRAMES):
+            block = samples[position:position + CHUNK_FRAMES]
+            if fmt == 'f32':
+                yield block.astype('<f4', copy=False).tobytes()
+            else:
+                chunk = pcm[:len(block)]
+                np.multiply(np.clip(block, -1.0, 1.0), 32767, out=chunk, casting='unsafe')
+                yield chunk.tobytes()
+
+    async def stream_chunks(self, engine, fmt: str):
+        """Encode a streamed render block by block, each block rendered on the thread pool."""
+        pcm = np.empty(engine.blocksize, dtype=np.int16)
+        blocks = engine.blocks()
+
+        def next_chunk() -> Optional[bytes]:
+            block = next(blocks, None)
+            if block is None:
+                return None
+            if fmt == 'f32':
+                return block.astype('<f4').tobytes()
+            chunk = pcm[:len(block)]
+            np.multiply(np.clip(block, -1.0, 1.0), 32767, out=chunk, casting='unsafe')
+            return chunk.tobytes()
+
+        # The render slot is taken per block, so a slow reader does not hold one while it drains
+        while True:
+            chunk = await self.run_render(next_chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    @staticmethod
+    async def send_body(writer: asyncio.StreamWriter, header: dict, chunks, start: float) -> Tuple[int, float]:
+        """
+        Send the header and framed chunks (an iterable or async iterable of bytes).
+
+        Returns:
+            (body bytes, seconds to the first byte)
+        """
+        writer.write(json.dumps(header).encode() + b'\n')
+        first_byte = time.perf_counter() - start
+        sent = 0
+        if not hasattr(chunks, '__aiter__'):
+            chunks = _aiter(chunks)
+        try:
+            async for chunk in chunks:
+                writer.write(FRAME.pack(len(chunk)))
+                writer.write(chunk)
+                sent += len(chunk)
+                # Waits while the client lags behind; the explicit yield keeps
+                # streamed renders from starving other clients on a fast link
+                await writer.drain()
+                await asyncio.sleep(0)
+        except ConnectionError:
+            raise
+        except Exception as error:
+            raise ReplyBroken(f"Render failed after {sent} body bytes") from error
+        writer.write(FRAME.pack(0))
+        await writer.drain()
+        return sent, first_byte
+
+    @staticmethod
+    async def send_json(writer: asyncio.StreamWriter, document: dict):
+        writer.write(json.dumps(document, default=str).encode() + b'\n')
+        await writer.drain()
+
+    async def start(self, host: str = '127.0.0.1', port: Optional[int] = DEFAULT_PORT,
+                    unix_path: Optional[str] = None):
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self.handle_client, host, port,
+                                                            limit=MAX_REQUEST_BYTES))
+        if unix_path:
+            self._servers.append(await asyncio.start_unix_server(self.handle_client, unix_path,
+                                                                 limit=MAX_REQUEST_BYTES))
+        return [socket.getsockname() for server in self._servers for socket in server.sockets]
+
+    async def serve_forever(self):
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+
+
+async def request(document: dict, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                  unix_path: Optional[str] = None) -> Tuple[dict, bytes, Optional[dict]]:
+    """
+    Client side of the protocol: send one request and collect the reply.
+
+    Returns:
+        (header or error/list/stats document, body bytes, trailer or None)
+    """
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path, limit=MAX_REQUEST_BYTES)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_REQUEST_BYTES)
+    try:
+        writer.write(json.dumps(document).encode() + b'\n')
+        await writer.drain()
+        header = json.loads(await reader.readline())
+        if 'format' not in header:
+            return header, b'', None
+        body = bytearray()
+        while True:
+            length, = FRAME.unpack(await reader.readexactly(FRAME.size))
+            if not length:
+                break
+            body += await reader.readexactly(length)
+        trailer = json.loads(await reader.readline())
+        return header, bytes(body), trailer
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve scale renders (PCM or MIDI) over a local socket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port (0 to disable TCP)")
+    parser.add_argument('--unix', metavar='PATH', help="Also listen on this Unix socket")
+    parser.add_argument('--gammes', default=str(CONFIG_PATH), help="YAML file with extra gammes ('' to skip)")
+    parser.add_argument('--cache-dir', type=Path, help="Keep rendered scales on disk here as well")
+    parser.add_argument('--oscillator', default='direct', choices=['direct', 'wavetable'])
+    parser.add_argument('--max-renders', type=int, help="Renders running at once (default: CPU count)")
+    parser.add_argument('--quiet', action='store_true', help="Do not log every request")
+    args = parser.parse_args(argv)
+
+    # Latency histograms are part of what the service reports
+    instrumentation.enable()
+
+    async def serve():
+        server = RenderServer(args.gammes, RenderCache(disk_dir=args.cache_dir), args.oscillator,
+                              args.max_renders, verbose=not args.quiet)
+        addresses = await server.start(args.host, args.port or None, args.unix)
+        print(f"Serving {len(server.scales)} scales on {', '.join(map(str, addresses))}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import hashlib
+import os
+from pathlib import Path
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from microtonal import Scale
+
+# Bump when the layout of the compiled cache changes
+CACHE_VERSION = 1
+
+NOTE_OFFSETS = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+# Semitone offset of each letter, indexed by ord(letter) - ord('A')
+_LETTER_TABLE = np.full(7, -1, dtype=np.int64)
+for _letter, _offset in NOTE_OFFSETS.items():
+    _LETTER_TABLE[ord(_letter) - ord('A')] = _offset
+
+
+def note_names_to_midi(names: Sequence[str]) -> np.ndarray:
+    """
+    Convert note names such as 'F#1', 'Eb3' or 'E#6' to MIDI note numbers.
+
+    The whole list is resolved with NumPy string operations: letter lookup,
+    accidental counts and octave parsing each happen once for every name.
+    """
+    names = np.char.strip(np.asarray(names, dtype=np.str_)).ravel()
+    if names.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    width = max(names.dtype.itemsize // 4, 2)
+    names = names.astype(f'U{width}')
+
+    # Split every name into its first character and the rest via a character view
+    chars = names.view('U1').reshape(len(names), width)
+    letters = np.char.upper(chars[:, 0])
+    rest = np.ascontiguousarray(chars[:, 1:]).view(f'U{width - 1}').ravel()
+
+    codes = np.frombuffer(letters.tobytes(), dtype=np.uint32).astype(np.int64) - ord('A')
+    valid = (codes >= 0) & (codes < 7)
+    offsets = _LETTER_TABLE[np.where(valid, codes, 0)]
+    sharps = np.char.count(rest, '#')
+    flats = np.char.count(rest, 'b')
+    octaves = np.char.lstrip(rest, '#b')
+    digits = np.char.isdigit(np.char.lstrip(octaves, '-')) & (np.char.count(octaves, '-') <= 1)
+    valid &= digits & (np.char.str_len(octaves) > 0)
+    if not valid.all():
+        bad = names[~valid]
+        raise ValueError(f"Invalid note name: {bad[0]}")
+
+    return 12 * (octaves.astype(np.int64) + 1) + offsets + sharps - flats
+
+
+def note_names_to_frequencies(names: Sequence[str], a4: float = 440.0) -> np.ndarray:
+    """12-TET frequencies of a list of note names (see note_names_to_midi)."""
+    return a4 * np.exp2((note_names_to_midi(names) - 69) / 12)
+
+
+class CompiledScales(Mapping):
+    """
+    Read-only mapping of scale name to Scale over the compiled library arrays.
+
+    Scale objects are only created (and then kept) when a name is looked up,
+    so listing a large library costs nothing beyond loading the arrays.
+    """
+
+    def __init__(self, scale_names: List[str], offsets: np.ndarray, note_names: np.ndarray,
+                 frequencies: np.ndarray):
+        self._index = {name: i for i, name in enumerate(scale_names)}
+        self._offsets = offsets
+        self._note_names = note_names
+        self._frequencies = frequencies
+        self._scales: Dict[str, Scale] = {}
+
+    def __getitem__(self, name: str) -> Scale:
+        scale = self._scales.get(name)
+        if scale is None:
+            i = self._index[name]
+            start, stop = self._offsets[i], self._offsets[i + 1]
+            scale = Scale().set_frequencies(self._frequencies[start:stop], self._note_names[start:stop].tolist())
+            self._scales[name] = scale
+        return scale
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+class ScaleLibrary:
+    """
+    Scales defined by note names in a YAML file (the config/gammes.yaml schema).
+
+    Parsing YAML is by far the slowest part of loading, so the parsed library
+    is compiled into a .npz file in a .cache directory next to the source. It
+    is reused as long as the source's size and mtime match, or, if those
+    changed, its content hash.
+    """
+
+    def __init__(self, path, cache_path=None, a4: float = 440.0):
+        self.path = Path(path)
+        self.cache_path = Path(cache_path) if cache_path else self.path.parent / '.cache' / f"{self.path.name}.npz"
+        self.a4 = a4
+        self.loaded_from_cache = False
+        self._scales: Optional[CompiledScales] = None
+
+    def scales(self) -> CompiledScales:
+        """All scales of the library, keyed by name (loaded once per instance)."""
+        if self._scales is None:
+            self._scales = self._load()
+        return self._scales
+
+    def names(self) -> List[str]:
+        return list(self.scales())
+
+    def __getitem__(self, name: str) -> Scale:
+        return self.scales()[name]
+
+    def _load(self) -> CompiledScales:
+        stat = os.stat(self.path)
+        compiled = self._read_cache(stat)
+        self.loaded_from_cache = compiled is not None
+        if compiled is None:
+            compiled = self._compile(stat)
+        return CompiledScales(*compiled)
+
+    def _read_cache(self, stat):
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if int(data['version']) != CACHE_VERSION or float(data['a4']) != self.a4:
+                    return None
+                fresh = int(data['mtime_ns']) == stat.st_mtime_ns and int(data['size']) == stat.st_size
+                if not fresh and str(data['digest']) != self._digest():
+                    return None
+                compiled = (data['scale_names'].tolist(), data['offsets'],
+                            data['note_names'], data['frequencies'])
+        except (OSError, KeyError, ValueError):
+            return None
+        if not fresh:
+            # Touched but unchanged: refresh the stamp so the hash is skipped next time
+            self._write_cache(stat, *compiled)
+        return compiled
+
+    def _digest(self) -> str:
+        return hashlib.sha1(self.path.read_bytes()).hexdigest()
+
+    def _compile(self, stat):
+        import yaml
+
+        # The libyaml loader is an order of magnitude faster when available
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with open(self.path, 'r') as file:
+            config = yaml.load(file, Loader=loader) or {}
+        scale_names, note_names, counts = [], [], []
+        for gamme in config.get('gammes', []):
+            notes = [str(note) for note in gamme.get('notes', [])]
+            scale_names.append(str(gamme['nom']))
+            note_names.extend(notes)
+            counts.append(len(notes))
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        note_names = np.array(note_names, dtype=np.str_)
+        frequencies = note_names_to_frequencies(note_names, self.a4)
+        self._write_cache(stat, scale_names, offsets, note_names, frequencies)
+        return scale_names, offsets, note_names, frequencies
+
+    def _write_cache(self, stat, scale_names, offsets, note_names, frequencies):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.cache_path.with_suffix('.tmp.npz')
+            np.savez(temporary, version=CACHE_VERSION, a4=self.a4,
+                     mtime_ns=stat.st_mtime_ns, size=stat.st_size, digest=self._digest(),
+                     scale_names=np.array(scale_names, dtype=np.str_), offsets=offsets,
+                     note_names=note_names, frequencies=frequencies)
+            os.replace(temporary, self.cache_path)
+        except OSError as error:
+            print(f"Could not write scale cache {self.cache_path}: {error}")
@@ -0,0 +1,198 @@
+import math
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from config.ui_config import LAYOUT, PLOT
+
+
+def import_matplotlib():
+    """Import the matplotlib modules the plot needs (slow: about half a second cold)."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+    return Figure, FigureCanvasQTAgg
+
+
+# Axis limits are rounded up to these multiples of a power of ten, so scales of
+# similar size and range share limits and can be switched by blitting
+Y_STEPS = (1, 2, 5, 10)
+X_STEPS = (1, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10)
+
+
+def nice_limit(value: float, steps=Y_STEPS) -> float:
+    """Smallest step times a power of ten at or above value."""
+    if value <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in steps:
+        if step * magnitude >= value:
+            return step * magnitude
+    return 10 * magnitude
+
+
+class ScalePlot(QWidget):
+    """
+    Bar chart of a scale's frequencies that is updated in place.
+
+    matplotlib is imported on a background thread when the widget is created,
+    so the window can appear before it is loaded; the canvas is built once the
+    import is done and any scale shown in the meantime is drawn then.
+
+    The axes and the bars are created once. Switching scales only moves the
+    existing bar rectangles (adding more if the scale is longer than any seen
+    before, hiding the spare ones) and changes the title. Those artists are
+    animated and drawn by blitting over a cached background of the axes. One
+    background is kept per set of axes limits, and limits are rounded (see
+    X_STEPS, Y_STEPS) so similar scales share them: only the first scale shown
+    with new limits, or after a resize, needs a full draw.
+    """
+    ready = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self.figure = None
+        self.canvas = None
+        self._axes = None
+        self._title = None
+        self._bars: List = []
+        # Rendered background (axes, ticks, labels) for every set of limits seen at the current size
+        self._backgrounds = {}
+        self._limits: Optional[Tuple[float, float]] = None
+        self._pending = None
+        self.timings = {'import': None, 'first_draw': None, 'updates': []}
+        self.ready.connect(self._build)
+        threading.Thread(target=self._prewarm, name='ScalePlotImport', daemon=True).start()
+
+    def _prewarm(self):
+        start = time.perf_counter()
+        import_matplotlib()
+        self.timings['import'] = time.perf_counter() - start
+        self.ready.emit()
+
+    def is_ready(self) -> bool:
+        return self.canvas is not None
+
+    def _build(self):
+        Figure, FigureCanvas = import_matplotlib()
+        self.figure = Figure(figsize=LAYOUT['plot']['figsize'])
+        self.canvas = FigureCanvas(self.figure)
+        self._layout.addWidget(self.canvas)
+
+        self._axes = self.figure.add_subplot(111)
+        self._axes.set_xlabel(PLOT['labels']['x'])
+        self._axes.set_ylabel(PLOT['labels']['y'])
+        self._axes.grid(True, alpha=PLOT['grid_alpha'])
+        self._title = self._axes.set_title('', animated=True)
+        # Recapture the background after every full draw (resize, new limits)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+        if self._pending is not None:
+            start = time.perf_counter()
+            self.show_scale(*self._pending)
+            self.timings['first_draw'] = time.perf_counter() - start
+
+    def show_scale(self, title: str, frequencies: np.ndarray):
+        """Display a scale; before matplotlib is loaded this only remembers it."""
+        if self.canvas is None:
+            self._pending = (title, frequencies)
+            return
+        self._pending = None
+        start = time.perf_counter()
+        count = len(frequencies)
+        self._ensure_bars(count)
+        for i, bar in enumerate(self._bars):
+            if i < count:
+                bar.set_height(frequencies[i])
+                bar.set_visible(True)
+            else:
+                bar.set_visible(False)
+        self._title.set_text(f"{title} Scale Frequencies")
+
+        right = nice_limit(count, X_STEPS)
+        top = nice_limit(float(np.max(frequencies)) * 1.05) if count else 1.0
+        limits = (right, top)
+        if limits != self._limits:
+            self._limits = limits
+            self._axes.set_xlim(-0.5, right - 0.5)
+            self._axes.set_ylim(0, top)
+        background = self._backgrounds.get(self._background_key())
+        if background is None:
+            # The draw_event handler captures the new background and draws the bars
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(background)
+            self._draw_animated()
+            self.canvas.blit(self.figure.bbox)
+        self.timings['updates'].append(time.perf_counter() - start)
+
+    def _background_key(self):
+        return self._limits, tuple(self.figure.bbox.bounds)
+
+    def _ensure_bars(self, count: int):
+        from matplotlib.patches import Rectangle
+
+        # Same geometry as Axes.bar with its default width of 0.8
+        for i in range(len(self._bars), count):
+            bar = Rectangle((i - 0.4, 0), 0.8, 0, alpha=PLOT['bar_alpha'], animated=True)
+            self._axes.add_patch(bar)
+            self._bars.append(bar)
+
+    def _draw_animated(self):
+        for bar in self._bars:
+            if bar.get_visible():
+                self._axes.draw_artist(bar)
+        self.figure.draw_artist(self._title)
+
+    def _on_draw(self, event):
+        key = self._background_key()
+        if any(size != key[1] for _, size in self._backgrounds):
+            # Resized: every cached background is stale
+            self._backgrounds.clear()
+        self._backgrounds[key] = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+
+if __name__ == "__main__":
+    # Startup and scale switching timings: QT_QPA_PLATFORM=offscreen python scripts/scale_plot.py
+    from PyQt5.QtWidgets import QApplication
+    from microtonal import create_example_scales
+
+    app = QApplication(sys.argv)
+    start = time.perf_counter()
+    scales = create_example_scales()
+    plot = ScalePlot()
+    plot.resize(800, 400)
+    plot.show()
+    first = next(iter(scales))
+    plot.show_scale(first, scales[first].frequencies)
+    widget_time = time.perf_counter() - start
+
+    def measure():
+        ready_time = time.perf_counter() - start
+        plot.timings['updates'].clear()
+        for _ in range(5):
+            for name, scale in scales.items():
+                plot.show_scale(name, scale.frequencies)
+        updates = np.array(plot.timings['updates']) * 1000
+        print(f"widget shown after {widget_time * 1000:.1f} ms, matplotlib imported in "
+              f"{plot.timings['import'] * 1000:.0f} ms (background), first draw {plot.timings['first_draw'] * 1000:.1f} ms, "
+              f"ready after {ready_time * 1000:.0f} ms")
+        print(f"scale switch over {len(updates)} updates: median {np.median(updates):.2f} ms, "
+              f"max {updates.max():.2f} ms")
+        app.quit()
+
+    plot.ready.connect(measure)
+    app.exec_()
@@ -0,0 +1,381 @@
+import time
+import wave
+import threading
+import numpy as np
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import instrumentation
+from oscillator import DEFAULT_FADE, PhaseOscillator, boundary_samples, raised_cosine
+from render import NOTE_GAP, WAVEFORMS
+
+DEFAULT_BLOCKSIZE = 1024
+
+
+@dataclass
+class Voice:
+    """
+    A note on the output timeline.
+
+    It sounds from onset for num_samples plus the fade-out tail; position
+    counts the samples rendered so far and the oscillator carries the phase.
+    """
+    frequency: float
+    onset: int
+    num_samples: int
+    gap_samples: int = 0
+    position: int = 0
+    oscillator: Optional[PhaseOscillator] = None
+
+    def end(self, fade_samples: int) -> int:
+        return self.onset + self.num_samples + fade_samples
+
+
+class StreamingEngine:
+    """
+    Generate audio in fixed-size blocks on demand.
+
+    Notes are pulled lazily from a queue of (frequency, duration) iterables, so
+    only the voices currently sounding are ever materialized. Each voice runs
+    a PhaseOscillator whose phase continues from the previous note, and note
+    boundaries get raised-cosine fades of `fade` seconds: the fade-out tail
+    overlaps the gap (and the next note when the gap is shorter), so notes
+    crossfade instead of clicking. Boundaries are placed by rounding the
+    running time, so long sequences stay on the sample grid. Memory is fixed
+    by the blocksize however long the notes are. `fill` writes the next block
+    into a caller-provided buffer and `callback` adapts it to the sounddevice
+    output-callback signature.
+    """
+
+    def __init__(self, sample_rate: int = 44100, waveform: str = 'sine',
+                 blocksize: int = DEFAULT_BLOCKSIZE, gap: float = NOTE_GAP, oscillator: str = 'direct',
+                 fade: float = DEFAULT_FADE, processor=None):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unsupported waveform type: {waveform}")
+        self.sample_rate = sample_rate
+        self.waveform = waveform
+        self.blocksize = blocksize
+        self.gap = gap
+        self.oscillator = oscillator
+        # Block effect with process(block, frame), e.g. a synth patch's BlockProcessor
+        self.processor = processor
+        self.samples_written = 0
+        self._sources: deque = deque()
+        # Next queued note, taken from the sources but not admitted yet
+        self._lookahead: Optional[Tuple[float, float]] = None
+        self._voices: List[Voice] = []
+        self._last: Optional[Voice] = None
+        self._lock = threading.Lock()
+        # Output timeline: samples produced so far, running note time and where the next note starts
+        self._clock = 0
+        self._time = 0.0
+        self._next_onset = 0
+        self._admitted = 0
+        self._fade_samples = int(round(fade * sample_rate))
+        self._fade_in = raised_cosine(self._fade_samples)
+        self._fade_out = self._fade_in[::-1].copy()
+        # Oscillators and scratch buffer reused for every note and block
+        self._idle: List[PhaseOscillator] = []
+        self._scratch = np.empty(blocksize, dtype=np.float64)
+
+    def enqueue(self, notes: Iterable[Tuple[float, float]]):
+        """Queue an iterable of (frequency, duration) pairs; it is consumed lazily."""
+        with self._lock:
+            self._sources.append(iter(notes))
+
+    def stop(self):
+        """Drop everything still queued and fade out the voices that are sounding."""
+        with self._lock:
+            self._sources.clear()
+            self._lookahead = None
+            for voice in self._voices:
+                voice.num_samples = min(voice.num_samples, voice.position)
+                voice.gap_samples = 0
+            self._next_onset = self._clock
+
+    @property
+    def finished(self) -> bool:
+        with self._lock:
+            return not self._voices and self._peek() is None and self._clock >= self._next_onset
+
+    def _peek(self) -> Optional[Tuple[float, float]]:
+        """Next queued note without admitting it (None if the queue is empty)."""
+        while self._lookahead is None and self._sources:
+            try:
+                self._lookahead = next(self._sources[0])
+            except StopIteration:
+                self._sources.popleft()
+        return self._lookahead
+
+    def _admit(self) -> bool:
+        """Turn the next queued note into a voice starting at the next onset."""
+        note = self._peek()
+        if note is None:
+            return False
+        self._lookahead = None
+        frequency, duration = note
+        if self._next_onset < self._clock:
+            # The queue ran dry and output went on: start the note now
+            self._next_onset = self._clock
+            self._time = self._clock / self.sample_rate
+        onset = self._next_onset
+        note_end = boundary_samples(self._time + duration, self.sample_rate)
+        self._time += duration + self.gap
+        gap_end = max(note_end, boundary_samples(self._time, self.sample_rate))
+
+        oscillator = self._idle.pop() if self._idle else PhaseOscillator(
+            self.waveform, self.sample_rate, self.blocksize, self.oscillator)
+        oscillator.set_frequency(frequency)
+        previous = self._last
+        if previous is not None:
+            # Continue the previous note's phase as it stands at this onset
+            elapsed = onset - previous.onset
+            oscillator.phase = (previous.oscillator.phase + previous.frequency / self.sample_rate
+                                * (elapsed - previous.position)) % 1.0
+        voice = Voice(frequency, onset, note_end - onset, gap_end - note_end, oscillator=oscillator)
+        self._voices.append(voice)
+        self._last = voice
+        self._admitted += 1
+        self._next_onset = gap_end
+        return True
+
+    def _render_voice(self, voice: Voice, out: Optional[np.ndarray], start: int, length: int):
+        """Add the part of voice falling in the block starting at sample start (only advance it if out is None)."""
+        stop = start + length
+        first = max(start, voice.onset + voice.position)
+        last = min(stop, voice.end(self._fade_samples))
+        frames = last - first
+        if frames <= 0:
+            return
+        if out is None:
+            # skip() advances the phase with the same arithmetic as render()
+            voice.oscillator.skip(frames)
+            voice.position = last - voice.onset
+            return
+        samples = voice.oscillator.render(self._scratch[:frames])
+        position = first - voice.onset
+        fade = self._fade_samples
+        if position < fade:
+            count = min(frames, fade - position)
+            samples[:count] *= self._fade_in[position:position + count]
+        tail = voice.num_samples - position
+        if tail < frames:
+            offset = max(tail, 0)
+            begin = max(position - voice.num_samples, 0)
+            samples[offset:] *= self._fade_out[begin:begin + frames - offset]
+        out[first - start:last - start] += samples
+        voice.position = last - voice.onset
+
+    def _fill_block(self, out: Optional[np.ndarray], length: int) -> int:
+        start = self._clock
+        stop = start + length
+        if out is not None:
+            out[:] = 0
+        while self._next_onset < stop and self._admit():
+            pass
+        end = self._next_onset
+        for voice in self._voices:
+            self._render_voice(voice, out, start, length)
+            end = max(end, voice.end(self._fade_samples))
+        for voice in [voice for voice in self._voices if voice.end(self._fade_samples) <= stop]:
+            self._voices.remove(voice)
+            self._idle.append(voice.oscillator)
+            if voice is self._last and not self._sources and self._lookahead is None:
+                # Nothing left to continue from; a later note starts a fresh phase
+                self._last = None
+        frames = min(length, max(end - start, 0))
+        if self.processor is not None and out is not None and frames:
+            self.processor.process(out[:frames], start)
+        self._clock += frames
+        return frames
+
+    def fill(self, out: np.ndarray) -> int:
+        """
+        Write the next block of audio into out.
+
+        Args:
+            out: 1-D buffer to fill (any length; rendered blocksize frames at a time)
+
+        Returns:
+            Number of frames produced; the rest of out is zeroed
+        """
+        with instrumentation.timer('stream.fill'), self._lock:
+            written = self._run(len(out), out)
+        out[written:] = 0
+        self.samples_written += written
+        return written
+
+    def advance(self, frames: int) -> int:
+        """
+        Move the timeline forward exactly as fill would, without computing any samples.
+
+        Voices, fades and oscillator phases end up bit-for-bit where fill
+        would leave them, at a small fraction of the cost.
+
+        Returns:
+            Number of frames skipped (less than frames once the queue runs dry)
+        """
+        with self._lock:
+            return self._run(frames, None)
+
+    def _run(self, frames: int, out: Optional[np.ndarray]) -> int:
+        written = 0
+        while written < frames:
+            length = min(self.blocksize, frames - written)
+            produced = self._fill_block(out[written:written + length] if out is not None else None, length)
+            written += produced
+            if produced < length:
+                break
+        return written
+
+    def save_state(self) -> dict:
+        """
+        Everything needed to resume the timeline here: position, sounding voices and phases.
+
+        restore_state on a new engine with the same settings, fed the notes
+        after the first state['admitted'] ones, continues bit-identically.
+        """
+        with self._lock:
+            def voice_state(voice: Voice) -> tuple:
+                return (voice.frequency, voice.onset, voice.num_samples, voice.gap_samples, voice.position,
+                        voice.oscillator.phase)
+
+            return {
+                'clock': self._clock,
+                'time': self._time,
+                'next_onset': self._next_onset,
+                'admitted': self._admitted,
+                'voices': [voice_state(voice) for voice in self._voices],
+                'last': voice_state(self._last) if self._last is not None else None,
+            }
+
+    def restore_state(self, state: dict):
+        """Resume from a save_state snapshot (the queue must hold the notes not yet admitted)."""
+        def make_voice(values: tuple) -> Voice:
+            frequency, onset, num_samples, gap_samples, position, phase = values
+            oscillator = PhaseOscillator(self.waveform, self.sample_rate, self.blocksize, self.oscillator, phase)
+            oscillator.set_frequency(frequency)
+            return Voice(frequency, onset, num_samples, gap_samples, position, oscillator)
+
+        with self._lock:
+            self._clock = state['clock']
+            self._time = state['time']
+            self._next_onset = state['next_onset']
+            self._admitted = state['admitted']
+            self._voices = [make_voice(values) for values in state['voices']]
+            self._last = None
+            if state['last'] is not None:
+                # The last admitted voice may still sound, or only remain as the phase reference
+                last = tuple(state['last'])
+                self._last = next((voice for voice, values in zip(self._voices, state['voices'])
+                                   if tuple(values) == last), None) or make_voice(last)
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        """Yield successive blocks until the queue runs dry (the buffer is reused)."""
+        block = np.empty(self.blocksize, dtype=np.float64)
+        while True:
+            frames = self.fill(block)
+            if frames == 0:
+                return
+            yield block[:frames]
+
+    def callback(self, outdata, frames, time_info, status) -> bool:
+        """
+        sounddevice-style output callback.
+
+        Returns:
+            False once the queue is exhausted, so the caller can stop the stream
+        """
+        produced = self.fill(outdata[:, 0] if outdata.ndim == 2 else outdata)
+        if outdata.ndim == 2 and outdata.shape[1] > 1:
+            outdata[:, 1:] = outdata[:, :1]
+        return produced == frames
+
+
+class NullSink:
+    """Consume blocks without any output device, recording timing for tests and benchmarks."""
+
+    def __init__(self):
+        self.blocks = 0
+        self.samples = 0
+        self.time_to_first_block = None
+        self.peak = 0.0
+
+    def play(self, engine: StreamingEngine):
+        start = time.perf_counter()
+        for block in engine.blocks():
+            if self.time_to_first_block is None:
+                self.time_to_first_block = time.perf_counter() - start
+            self.blocks += 1
+            self.samples += len(block)
+            self.peak = max(self.peak, float(np.max(np.abs(block))))
+
+
+class WavFileSink:
+    """Stream blocks to a 16-bit mono WAV file as they are generated."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.samples = 0
+
+    def play(self, engine: StreamingEngine):
+        pcm = np.empty(engine.blocksize, dtype=np.int16)
+        with wave.open(self.path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(engine.sample_rate)
+            for block in engine.blocks():
+                chunk = pcm[:len(block)]
+                np.multiply(np.clip(block, -1.0, 1.0), 32767, out=chunk, casting='unsafe')
+                wav.writeframes(chunk.tobytes())
+                self.samples += len(block)
+
+
+class SoundFileSink:
+    """Stream blocks to any format libsndfile supports (e.g. FLAC) through the soundfile package."""
+
+    def __init__(self, path: str, format: str = 'FLAC', subtype: str = 'PCM_16'):
+        self.path = path
+        self.format = format
+        self.subtype = subtype
+        self.samples = 0
+
+    def play(self, engine: StreamingEngine):
+        import soundfile as sf
+
+        with sf.SoundFile(self.path, 'w', samplerate=engine.sample_rate, channels=1,
+                          format=self.format, subtype=self.subtype) as file:
+            for block in engine.blocks():
+                file.write(np.clip(block, -1.0, 1.0))
+                self.samples += len(block)
+
+
+class SoundDeviceSink:
+    """Play blocks on the default audio device through a sounddevice output callback."""
+
+    def __init__(self, device=None):
+        self.device = device
+        self._stream = None
+
+    def play(self, engine: StreamingEngine, blocking: bool = True):
+        import sounddevice as sd
+
+        done = threading.Event()
+
+        def callback(outdata, frames, time_info, status):
+            if not engine.callback(outdata, frames, time_info, status):
+                raise sd.CallbackStop()
+
+        self._stream = sd.OutputStream(samplerate=engine.sample_rate, blocksize=engine.blocksize,
+                                       channels=1, dtype='float32', device=self.device,
+                                       callback=callback, finished_callback=done.set)
+        self._stream.start()
+        if blocking:
+            done.wait()
+            self.close()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
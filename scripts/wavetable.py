@@ -0,0 +1,184 @@
+import threading
+import numpy as np
+from typing import Dict, Tuple
+
+# Samples per single-cycle table (a guard sample is appended for interpolation)
+TABLE_SIZE = 2048
+
+# Fundamental of the lowest mip level; each level above covers one more octave
+BASE_FREQUENCY = 20.0
+
+# Process-wide cache: (waveform, sample_rate, table_size) -> mipmapped tables
+_TABLE_CACHE: Dict[Tuple[str, int, int], np.ndarray] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _harmonic_amplitudes(waveform: str, num_harmonics: int) -> np.ndarray:
+    """Sine-series amplitudes of harmonics 1..num_harmonics for a waveform."""
+    k = np.arange(1, num_harmonics + 1, dtype=np.float64)
+    if waveform == 'sine':
+        amplitudes = np.zeros(num_harmonics)
+        amplitudes[:1] = 1.0
+    elif waveform == 'sawtooth':
+        # 2 * (x - floor(0.5 + x)) = (2/pi) * sum((-1)^(k+1) sin(2 pi k x) / k)
+        amplitudes = (2 / np.pi) * np.where(k % 2 == 1, 1.0, -1.0) / k
+    elif waveform == 'square':
+        # sign(sin(2 pi x)) = (4/pi) * sum over odd k of sin(2 pi k x) / k
+        amplitudes = np.where(k % 2 == 1, 4 / (np.pi * k), 0.0)
+    else:
+        raise ValueError(f"Unsupported waveform type: {waveform}")
+    # Lanczos sigma factors tame the Gibbs overshoot of the truncated series; the
+    # fundamental keeps its full amplitude so sparse (high) levels do not get quieter
+    sigma = np.sinc(k / (num_harmonics + 1))
+    sigma[0] = 1.0
+    return amplitudes * sigma
+
+
+def build_table(waveform: str, num_harmonics: int, table_size: int = TABLE_SIZE) -> np.ndarray:
+    """
+    Build one band-limited single-cycle table by additive synthesis.
+
+    Args:
+        waveform: Type of waveform ('sine', 'sawtooth', or 'square')
+        num_harmonics: Highest harmonic kept in the table
+        table_size: Number of samples in one cycle
+
+    Returns:
+        Array of table_size + 1 samples (the last one repeats the first)
+    """
+    num_harmonics = max(1, min(num_harmonics, table_size // 2 - 1))
+    spectrum = np.zeros(table_size // 2 + 1, dtype=np.complex128)
+    # irfft of -i * N/2 * a_k gives a_k * sin(2 pi k n / N)
+    spectrum[1:num_harmonics + 1] = -0.5j * table_size * _harmonic_amplitudes(waveform, num_harmonics)
+    table = np.fft.irfft(spectrum, table_size)
+    # Keep sparse (high-level) tables within [-1, 1] like the naive waveforms
+    table /= max(1.0, np.max(np.abs(table)))
+    return np.append(table, table[0])
+
+
+def num_levels(sample_rate: int) -> int:
+    """Number of octave mip levels needed to reach the Nyquist frequency."""
+    return max(1, int(np.ceil(np.log2((sample_rate / 2) / BASE_FREQUENCY))))
+
+
+def get_tables(waveform: str, sample_rate: int, table_size: int = TABLE_SIZE) -> np.ndarray:
+    """
+    Mipmapped tables for a waveform, built once per process and cached.
+
+    Level k is used for fundamentals below BASE_FREQUENCY * 2**(k + 1) and keeps
+    only the harmonics that stay under Nyquist for every such fundamental.
+
+    Returns:
+        Array of shape (levels, table_size + 1)
+    """
+    key = (waveform, sample_rate, table_size)
+    tables = _TABLE_CACHE.get(key)
+    if tables is None:
+        with _CACHE_LOCK:
+            tables = _TABLE_CACHE.get(key)
+            if tables is None:
+                nyquist = sample_rate / 2
+                levels = []
+                for level in range(num_levels(sample_rate)):
+                    top = BASE_FREQUENCY * 2 ** (level + 1)
+                    levels.append(build_table(waveform, int(nyquist // top), table_size))
+                tables = np.array(levels)
+                tables.setflags(write=False)
+                _TABLE_CACHE[key] = tables
+    return tables
+
+
+def clear_cache():
+    """Drop every cached table (they are rebuilt on next use)."""
+    with _CACHE_LOCK:
+        _TABLE_CACHE.clear()
+
+
+def mip_levels(frequencies: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Mip level to use for each fundamental frequency."""
+    frequencies = np.maximum(np.asarray(frequencies, dtype=np.float64), BASE_FREQUENCY)
+    levels = np.floor(np.log2(frequencies / BASE_FREQUENCY)).astype(np.intp)
+    return np.clip(levels, 0, num_levels(sample_rate) - 1)
+
+
+def _lookup(tables: np.ndarray, cycles: np.ndarray, rows: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Linear-interpolated lookup of phases (in cycles) into the given table rows."""
+    table_size = tables.shape[1] - 1
+    flat = tables.reshape(-1)
+    position = np.subtract(cycles, np.floor(cycles), out=out)
+    np.multiply(position, table_size, out=position)
+    index = position.astype(np.intp)
+    np.subtract(position, index, out=position)
+    index += rows
+    lower = flat[index]
+    np.multiply(position, flat[index + 1] - lower, out=out)
+    return np.add(out, lower, out=out)
+
+
+def evaluate_notes(frequencies: np.ndarray, t: np.ndarray, waveform: str, out: np.ndarray,
+                   sample_rate: int = 44100) -> np.ndarray:
+    """
+    Wavetable counterpart of render.evaluate_notes.
+
+    Args:
+        frequencies: Frequencies of the notes (one row each)
+        t: Time of every sample in the note, in seconds
+        waveform: Type of waveform ('sine', 'sawtooth', or 'square')
+        out: Scratch array of shape (len(frequencies), len(t)) to fill
+        sample_rate: Sample rate the output is meant for (selects the mip levels)
+
+    Returns:
+        out, now holding the samples of every note
+    """
+    tables = get_tables(waveform, sample_rate)
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    rows = (mip_levels(frequencies, sample_rate) * tables.shape[1])[:, None]
+    cycles = np.multiply.outer(frequencies, t)
+    return _lookup(tables, cycles, rows, out)
+
+
+def evaluate_cycles(frequencies: np.ndarray, cycles: np.ndarray, waveform: str,
+                    sample_rate: int = 44100) -> np.ndarray:
+    """
+    Wavetable counterpart of render.evaluate_cycles (per-voice phases, in place).
+
+    Args:
+        frequencies: Frequency of each row (selects the mip level)
+        cycles: Phase of every sample in cycles, one row per voice
+        waveform: Type of waveform ('sine', 'sawtooth', or 'square')
+        sample_rate: Sample rate the output is meant for
+
+    Returns:
+        cycles, now holding the waveform samples
+    """
+    tables = get_tables(waveform, sample_rate)
+    rows = (mip_levels(frequencies, sample_rate) * tables.shape[1])[:, None]
+    return _lookup(tables, cycles, rows, cycles)
+
+
+class WavetableOscillator:
+    """
+    Phase-accumulator oscillator reading from the cached tables.
+
+    The phase (in cycles, wrapped to [0, 1)) is kept between calls so
+    consecutive renders join without discontinuity.
+    """
+
+    def __init__(self, waveform: str = 'sine', sample_rate: int = 44100, phase: float = 0.0):
+        self.waveform = waveform
+        self.sample_rate = sample_rate
+        self.phase = phase
+        self._tables = get_tables(waveform, sample_rate)
+
+    def render(self, frequency: float, num_samples: int, out: np.ndarray = None) -> np.ndarray:
+        """Render num_samples of the given frequency, advancing the phase."""
+        if out is None:
+            out = np.empty(num_samples, dtype=np.float64)
+        increment = frequency / self.sample_rate
+        cycles = np.arange(num_samples, dtype=np.float64)
+        np.multiply(cycles, increment, out=cycles)
+        np.add(cycles, self.phase, out=cycles)
+        row = int(mip_levels(frequency, self.sample_rate)) * self._tables.shape[1]
+        _lookup(self._tables, cycles, row, out[:num_samples])
+        self.phase = (self.phase + num_samples * increment) % 1.0
+        return out[:num_samples]
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules live in scripts/ and import each other by bare name, as the entry scripts do
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
@@ -0,0 +1,116 @@
+import mido
+import numpy as np
+import pytest
+
+from microtonal import Scale
+from midi_retune import RetuneJob, read_midi_file, retune_events, retune_files, write_midi_file
+from midi_tuning import get_key_table
+
+
+def make_song(path):
+    """Two-track file with tempo changes, sysex, controllers and overlapping notes."""
+    mid = mido.MidiFile(type=1, ticks_per_beat=480)
+    conductor = mido.MidiTrack([
+        mido.MetaMessage('set_tempo', tempo=500000, time=0),
+        mido.MetaMessage('set_tempo', tempo=400000, time=960),
+    ])
+    melody = mido.MidiTrack([
+        mido.MetaMessage('track_name', name='melody', time=0),
+        mido.Message('program_change', channel=2, program=5, time=0),
+        mido.Message('sysex', data=[0x7E, 0x7F, 0x09, 0x01], time=0),
+        mido.Message('note_on', channel=2, note=60, velocity=90, time=0),
+        mido.Message('note_on', channel=2, note=64, velocity=80, time=0),
+        mido.Message('control_change', channel=2, control=64, value=127, time=120),
+        mido.Message('pitchwheel', channel=2, pitch=-300, time=20000),
+        mido.Message('note_off', channel=2, note=60, velocity=0, time=240),
+        mido.Message('note_on', channel=2, note=64, velocity=0, time=0),
+        mido.Message('aftertouch', channel=2, value=33, time=5),
+        mido.Message('note_on', channel=2, note=67, velocity=70, time=300),
+        mido.Message('polytouch', channel=2, note=67, value=12, time=10),
+        mido.Message('note_off', channel=2, note=67, velocity=0, time=470),
+    ])
+    mid.tracks.extend([conductor, melody])
+    mid.save(path)
+    return mid
+
+
+def absolute(track):
+    """(tick, bytes) of every event except end of track."""
+    tick = 0
+    events = []
+    for msg in track:
+        tick += msg.time
+        if not msg.is_meta or msg.type != 'end_of_track':
+            events.append((tick, bytes(msg.bin() if not msg.is_meta else msg.bytes())))
+    return events
+
+
+def test_round_trip_matches_mido(tmp_path):
+    original = make_song(tmp_path / 'song.mid')
+    events = read_midi_file(tmp_path / 'song.mid')
+    assert events.tracks == 2 and events.ticks_per_beat == 480
+    write_midi_file(events, tmp_path / 'copy.mid')
+    copy = mido.MidiFile(tmp_path / 'copy.mid')
+    assert copy.type == 1 and copy.ticks_per_beat == 480
+    assert [absolute(track) for track in copy.tracks] == [absolute(track) for track in original.tracks]
+    assert copy.length == pytest.approx(original.length)
+
+
+def test_running_status(tmp_path):
+    # note on 60, then note on 62 and note on 60 velocity 0 without repeating the status byte
+    body = bytes([0x00, 0x91, 60, 100, 0x60, 62, 100, 0x83, 0x60, 60, 0, 0x00, 0xFF, 0x2F, 0x00])
+    data = b'MThd' + bytes([0, 0, 0, 6, 0, 0, 0, 1, 0x01, 0xE0]) + b'MTrk' + len(body).to_bytes(4, 'big') + body
+    (tmp_path / 'running.mid').write_bytes(data)
+    events = read_midi_file(tmp_path / 'running.mid')
+    expected = absolute(mido.MidiFile(tmp_path / 'running.mid').tracks[0])
+    assert [(int(tick), bytes([status, d1, d2])) for tick, status, d1, d2
+            in zip(events.tick, events.status, events.data1, events.data2)] == expected
+    assert expected[1][0] == 96 and expected[2][0] == 96 + 480
+
+
+@pytest.mark.parametrize('cut', [1, 5, 7, 9])
+def test_truncated_file_raises_value_error(tmp_path, cut):
+    make_song(tmp_path / 'song.mid')
+    data = (tmp_path / 'song.mid').read_bytes()
+    (tmp_path / 'cut.mid').write_bytes(data[:-cut])
+    with pytest.raises(ValueError, match='truncated'):
+        read_midi_file(tmp_path / 'cut.mid')
+
+
+def quarter_tone_table():
+    scale = Scale(261.6255653005986, 60)
+    scale.set_ratios([2 ** (step / 24) for step in range(24)])
+    return get_key_table(scale, 'degree', 60)
+
+
+def test_retuned_notes_carry_their_bends(tmp_path):
+    make_song(tmp_path / 'song.mid')
+    table = quarter_tone_table()
+    retuned, stats = retune_events(read_midi_file(tmp_path / 'song.mid'), table)
+    write_midi_file(retuned, tmp_path / 'retuned.mid')
+    merged = mido.merge_tracks(mido.MidiFile(tmp_path / 'retuned.mid').tracks)
+    bends, ranges, ons = {}, {}, []
+    for msg in merged:
+        if msg.type == 'pitchwheel':
+            bends[msg.channel] = msg.pitch
+        elif msg.type == 'control_change' and msg.control == 6:
+            ranges[msg.channel] = msg.value
+        elif msg.type == 'note_on' and msg.velocity:
+            ons.append((msg.note, bends.get(msg.channel), ranges.get(msg.channel)))
+    # Input keys 60, 64 and 67 are degrees 0, 4 and 7 of the quarter-tone scale
+    assert ons == [(table.keys[key], table.bends[key], 2) for key in (60, 64, 67)]
+    assert [bend for _, bend, _ in ons] == [0, 0, -2048]
+    assert stats['notes'] == 3 and stats['conflicts'] == 0
+    # Channel-wide messages went to the manager channel; the source pitch bend is kept there
+    assert {msg.channel for msg in merged if msg.type in ('program_change', 'aftertouch')} == {0}
+
+
+def test_one_bad_file_does_not_abort_the_batch(tmp_path):
+    make_song(tmp_path / 'good.mid')
+    (tmp_path / 'bad.mid').write_bytes((tmp_path / 'good.mid').read_bytes()[:-7])
+    output = tmp_path / 'out'
+    jobs = [RetuneJob(str(tmp_path / name), str(output), quarter_tone_table()) for name in ('bad.mid', 'good.mid')]
+    failures = retune_files(jobs, workers=1)
+    assert [job.stem for job, _ in failures] == ['bad']
+    assert isinstance(failures[0][1], ValueError)
+    assert (output / 'good.mid').exists() and not (output / 'bad.mid').exists()
@@ -0,0 +1,31 @@
+from midi_scheduler import MIDIScheduler
+
+
+def test_failing_action_does_not_stop_the_thread(capsys):
+    scheduler = MIDIScheduler()
+    scheduler.start()
+    ran = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    try:
+        scheduler.call_soon(fail)
+        scheduler.call_soon(ran.append, 1)
+        scheduler.schedule_in(0.01, ran.append, 2)
+        assert scheduler.wait_idle(timeout=5.0)
+    finally:
+        scheduler.stop()
+    assert ran == [1, 2]
+    assert "boom" in capsys.readouterr().err
+
+
+def test_wait_idle_returns_after_a_failure():
+    scheduler = MIDIScheduler()
+    scheduler.start()
+    try:
+        scheduler.call_soon(lambda: 1 / 0)
+        assert scheduler.wait_idle(timeout=5.0)
+        assert scheduler.jitter_stats()['count'] == 0
+    finally:
+        scheduler.stop()
@@ -0,0 +1,128 @@
+from collections import Counter
+
+import mido
+
+from microtonal import Scale
+from midi_output import MemoryOutputPort, MIDIOutput
+from midi_thru import MIDIThru, build_thru_table
+
+QUARTER_TONES = [2 ** (step / 24) for step in range(24)]
+JUST = [1, 9 / 8, 5 / 4, 4 / 3, 3 / 2, 5 / 3, 15 / 8]
+
+
+def make_scale(ratios):
+    scale = Scale(261.6255653005986, 60)
+    scale.set_ratios(ratios)
+    return scale
+
+
+def make_thru(ratios=QUARTER_TONES, channels=range(1, 16)):
+    # One scale degree per key from middle C, so neighbouring keys get different bends
+    port = MemoryOutputPort()
+    table = build_thru_table(make_scale(ratios), 'test', 'degree', 60, channels=tuple(channels))
+    thru = MIDIThru(MIDIOutput(port=port), table, channels=channels)
+    return thru, table, port
+
+
+def note_on(note, velocity=100, channel=0):
+    return mido.Message('note_on', note=note, velocity=velocity, channel=channel)
+
+
+def note_off(note, channel=0):
+    return mido.Message('note_off', note=note, channel=channel)
+
+
+def replay(messages):
+    """Follow the output: (pitch of each note on, still sounding (channel, key) counts)."""
+    bends = {}
+    pitches = []
+    sounding = Counter()
+    for msg in messages:
+        if msg.type == 'pitchwheel':
+            bends[msg.channel] = msg.pitch
+        elif msg.type == 'note_on' and msg.velocity:
+            pitches.append((msg.note, bends.get(msg.channel)))
+            sounding[msg.channel, msg.note] += 1
+        elif msg.type in ('note_on', 'note_off'):
+            assert sounding[msg.channel, msg.note] > 0, f"note off without note on: {msg}"
+            sounding[msg.channel, msg.note] -= 1
+    return pitches, +sounding
+
+
+def test_notes_carry_the_table_bend():
+    thru, table, port = make_thru()
+    keys = [60, 61, 62, 63, 67, 59]
+    for key in keys:
+        thru.handle(note_on(key))
+    pitches, sounding = replay(port.messages)
+    assert pitches == [table.entries[key][:2] for key in keys]
+    assert {bend for _, bend in pitches} == {-2048, 0, 2048}
+    assert sum(sounding.values()) == len(keys)
+    assert thru.stats['notes'] == len(keys)
+
+
+def test_first_note_of_a_bend_takes_its_home_channel():
+    thru, table, port = make_thru()
+    start = len(port.messages)
+    thru.handle(note_on(61))
+    on = [msg for msg in port.messages[start:] if msg.type == 'note_on']
+    assert on[0].channel == table.entries[61][2]
+    # Idle home channels are bent ahead of time, so no bend goes out with the note
+    assert not any(msg.type == 'pitchwheel' for msg in port.messages[start:])
+
+
+def test_no_stuck_notes_across_set_table():
+    thru, _, port = make_thru()
+    held = [60, 61, 63]
+    for key in held:
+        thru.handle(note_on(key))
+    just = build_thru_table(make_scale(JUST), 'just', 'degree', 60)
+    thru.set_table(just)
+    for key in held:
+        thru.handle(note_off(key))
+    thru.handle(note_on(64))
+    thru.handle(note_on(64, velocity=0))
+    pitches, sounding = replay(port.messages)
+    assert not sounding
+    # Notes started after the switch use the new table
+    assert pitches[-1] == just.entries[64][:2]
+    assert thru.stats['switches'] == 1 and thru.stats['dropped'] == 0
+
+
+def test_notes_share_channels_by_bend_and_steal_when_full():
+    thru, table, port = make_thru(JUST, channels=(1, 2))
+    # The tonic and its octave share a bend (and a channel); the second degree needs the other channel
+    keys = [60, 67, 61]
+    for key in keys:
+        thru.handle(note_on(key))
+    assert thru._allocator.conflicts == 0
+    channels = [msg.channel for msg in port.messages if msg.type == 'note_on']
+    assert channels[0] == channels[1] != channels[2]
+    # A third bend on two busy channels: the emptier one is retuned anyway
+    thru.handle(note_on(62))
+    assert thru._allocator.conflicts == 1
+    pitches, _ = replay(port.messages)
+    assert pitches == [table.entries[key][:2] for key in keys + [62]]
+    for key in keys + [62]:
+        thru.handle(note_off(key))
+    _, sounding = replay(port.messages)
+    assert not sounding
+
+
+def test_channel_wide_messages_go_to_the_manager_channel():
+    thru, _, port = make_thru()
+    start = len(port.messages)
+    thru.handle(mido.Message('control_change', channel=5, control=64, value=127))
+    thru.handle(note_off(70))
+    assert [(msg.type, msg.channel) for msg in port.messages[start:]] == [('control_change', 0)]
+    assert thru.stats['dropped'] == 1
+
+
+def test_all_notes_off_releases_everything():
+    thru, _, port = make_thru()
+    for key in range(60, 72):
+        thru.handle(note_on(key))
+    thru.all_notes_off()
+    _, sounding = replay(port.messages)
+    assert not sounding
+    assert 'handle p50=' in thru.report()
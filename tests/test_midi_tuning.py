@@ -0,0 +1,87 @@
+import pytest
+
+from microtonal import Scale
+from midi_output import MemoryOutputPort, MIDIOutput
+from midi_tuning import MPE_MEMBER_CHANNELS, MTS_MAX_KEYS, MicrotonalMIDI, bend_range_controls
+
+
+def make_scale(cents):
+    scale = Scale()
+    scale.set_frequencies([440.0 * 2 ** (c / 1200) for c in cents])
+    return scale
+
+
+def make_tuner(mode, scale, **kwargs):
+    port = MemoryOutputPort()
+    tuner = MicrotonalMIDI(MIDIOutput(port=port), mode, **kwargs)
+    tuner.load_scale(scale)
+    return tuner, port
+
+
+QUARTER_TONES = make_scale([0, 50, 100, 150])
+
+
+def test_mpe_load_sets_bend_range_on_every_member_channel():
+    _, port = make_tuner('mpe', QUARTER_TONES, bend_range=2.5)
+    sent = [(msg.channel, msg.control, msg.value) for msg in port.messages]
+    expected = [(channel, control, value) for channel in MPE_MEMBER_CHANNELS
+                for control, value in bend_range_controls(2.5)]
+    assert sent == expected
+    # RPN 0 = 2 semitones 50 cents, then the null RPN
+    assert bend_range_controls(2.5) == [(101, 0), (100, 0), (6, 2), (38, 50), (101, 127), (100, 127)]
+
+
+def test_mpe_note_bends_before_note_on():
+    tuner, port = make_tuner('mpe', QUARTER_TONES)
+    del port.messages[:]
+    for degree in range(len(QUARTER_TONES)):
+        tuner.note_on(degree)
+        tuner.note_off(degree)
+    bends = [msg for msg in port.messages if msg.type == 'pitchwheel']
+    ons = [msg for msg in port.messages if msg.type == 'note_on']
+    assert [msg.pitch for msg in bends] == [0, -2048, 0, 2048]
+    assert [msg.note for msg in ons] == [69, 70, 70, 70]
+    # Each bend goes out right before its note, on the same channel
+    for bend, on in zip(bends, ons):
+        index = port.messages.index(on)
+        assert port.messages[index - 1] is bend and bend.channel == on.channel
+
+
+def test_mpe_warns_about_clipped_bends(capsys):
+    # Quarter tones sit 50 cents from the nearest key, out of reach of a quarter-semitone bend
+    make_tuner('mpe', QUARTER_TONES, bend_range=0.25)
+    assert "clipped" in capsys.readouterr().out
+    make_tuner('mpe', QUARTER_TONES)
+    assert capsys.readouterr().out == ''
+
+
+def test_mts_sysex_bytes():
+    _, port = make_tuner('mts', QUARTER_TONES)
+    assert len(port.messages) == 1
+    assert list(port.messages[0].data) == [0x7F, 0x7F, 0x08, 0x02, 0, 4,
+                                           69, 69, 0, 0,
+                                           70, 69, 64, 0,
+                                           71, 70, 0, 0,
+                                           72, 70, 64, 0]
+
+
+def test_mts_notes_use_the_retuned_keys():
+    tuner, port = make_tuner('mts', QUARTER_TONES)
+    del port.messages[:]
+    tuner.note_on(3)
+    assert [(msg.type, msg.note, msg.channel) for msg in port.messages] == [('note_on', 72, 0)]
+
+
+def test_mts_table_fits_the_key_range():
+    tuner, _ = make_tuner('mts', make_scale([c * 10.0 for c in range(MTS_MAX_KEYS)]))
+    keys = list(tuner.table.mts_keys)
+    assert keys == sorted(set(keys)) and keys[0] >= 0 and keys[-1] < MTS_MAX_KEYS
+
+
+def test_mts_rejects_more_degrees_than_keys():
+    scale = make_scale([c * 10.0 for c in range(MTS_MAX_KEYS + 1)])
+    port = MemoryOutputPort()
+    tuner = MicrotonalMIDI(MIDIOutput(port=port), 'mts')
+    with pytest.raises(ValueError):
+        tuner.load_scale(scale)
+    assert port.messages == []
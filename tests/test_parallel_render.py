@@ -0,0 +1,37 @@
+import gc
+
+import numpy as np
+
+from parallel_render import ParallelRenderer
+from streaming import StreamingEngine
+
+SAMPLE_RATE = 8000
+NOTES = [(220.0 + 15 * i, 0.05 + 0.01 * (i % 4)) for i in range(40)]
+
+
+def serial(notes, blocksize):
+    engine = StreamingEngine(SAMPLE_RATE, 'sawtooth', blocksize)
+    engine.enqueue(notes)
+    return np.concatenate([block.copy() for block in engine.blocks()])
+
+
+def test_parallel_render_is_bit_identical_to_serial():
+    renderer = ParallelRenderer(SAMPLE_RATE, 'sawtooth', blocksize=256, workers=2)
+    out = renderer.render(NOTES)
+    expected = serial(NOTES, 256)
+    assert out.shape == expected.shape
+    assert np.array_equal(out, expected)
+
+
+def test_shared_output_outlives_the_render():
+    renderer = ParallelRenderer(SAMPLE_RATE, 'sawtooth', blocksize=256, workers=2)
+    out = renderer.render(NOTES, dtype=np.float32)
+    assert out.dtype == np.float32
+    expected = out.copy()
+    tail = out[len(out) // 2:]
+    del out
+    gc.collect()
+    # The view still reads the shared buffer, and it stays writable
+    assert np.array_equal(tail, expected[len(expected) // 2:])
+    tail[:] = 0.0
+    assert not tail.any()
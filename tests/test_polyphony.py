@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from polyphony import HeadroomLimiter, NoteEvent, PolyphonicRenderer
+
+
+def test_limiter_skip_matches_processing_silence():
+    skipped, processed = HeadroomLimiter(8000), HeadroomLimiter(8000)
+    skipped.gain = processed.gain = 0.3
+    skipped.skip(1000)
+    processed.process(np.zeros(1000))
+    assert skipped.gain == pytest.approx(processed.gain)
+
+
+def test_level_after_a_pause_does_not_depend_on_what_came_before():
+    renderer = PolyphonicRenderer(8000)
+    loud = [NoteEvent(frequency, 0.0, 0.5, 127) for frequency in (220.0, 330.0, 440.0)]
+    later = NoteEvent(220.0, 3.0, 0.5, 100)
+    after_loud = renderer.render(loud + [later])
+    alone = renderer.render([later])
+    assert np.array_equal(after_loud[24000:], alone[24000:])
+
+
+def test_limiter_keeps_the_mix_under_the_ceiling():
+    renderer = PolyphonicRenderer(8000, headroom_db=1.0)
+    audio = renderer.render([NoteEvent(110.0 * k, 0.0, 1.0, 127) for k in range(1, 6)])
+    assert np.abs(audio).max() <= 10 ** (-1 / 20) + 1e-12
@@ -0,0 +1,91 @@
+import asyncio
+import io
+import json
+
+import mido
+import pytest
+
+import render_server
+from render import NOTE_GAP
+from render_server import MAX_NOTES, MAX_REQUEST_BYTES, RenderServer, request
+
+
+def serve(*documents):
+    """Start a server on a free port and send each document on its own connection."""
+    async def run():
+        server = RenderServer(gammes_path='', verbose=False)
+        (host, port), = [address[:2] for address in await server.start('127.0.0.1', 0)]
+        try:
+            return [await request(document, host, port) for document in documents]
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_buffered_and_streamed_renders():
+    scale = {'cents': [0, 100, 200]}
+    (buffered, data, trailer), (streamed, stream_data, _) = serve(
+        {'id': 1, 'scale': scale, 'note_duration': 0.05, 'sample_rate': 8000},
+        {'id': 2, 'scale': scale, 'note_duration': 0.05, 'sample_rate': 8000, 'stream': True})
+    assert buffered['stream'] is False and len(data) == 2 * buffered['frames']
+    assert trailer['bytes'] == len(data)
+    assert streamed['stream'] is True and 'frames' not in streamed and len(stream_data) > 0
+
+
+def test_midi_render():
+    (header, data, _), = serve({'id': 1, 'scale': '12-TET', 'format': 'midi'})
+    assert header['format'] == 'midi' and data.startswith(b'MThd')
+
+
+def test_midi_render_of_long_notes():
+    (header, data, _), = serve({'id': 1, 'scale': '12-TET', 'format': 'midi', 'note_duration': 30.0})
+    assert 'error' not in header
+    mid = mido.MidiFile(file=io.BytesIO(data))
+    notes = header['notes']
+    assert mid.length == pytest.approx(30.0 * notes + NOTE_GAP * (notes - 1), abs=0.01)
+
+
+def test_render_failure_is_answered(monkeypatch):
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(render_server, 'scale_midi_file', fail)
+    (header, _, _), = serve({'id': 7, 'scale': '12-TET', 'format': 'midi'})
+    assert header['id'] == 7 and 'boom' in header['error']
+
+
+def test_long_render_must_be_streamed(monkeypatch):
+    monkeypatch.setattr(render_server, 'MAX_BUFFERED_SECONDS', 0.1)
+    (header, _, _), = serve({'id': 1, 'scale': '12-TET', 'sample_rate': 8000, 'stream': False})
+    assert 'stream' in header['error']
+
+
+def test_definitions_are_limited_to_max_notes():
+    (header, _, _), = serve({'id': 1, 'scale': {'ratios': [1.0] * (MAX_NOTES + 1)}, 'format': 'midi'})
+    assert str(MAX_NOTES) in header['error']
+
+
+def test_oversized_request_line_is_answered_and_skipped():
+    async def run():
+        server = RenderServer(gammes_path='', verbose=False)
+        (host, port), = [address[:2] for address in await server.start('127.0.0.1', 0)]
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(b'{"id": 1, "pad": "' + b'x' * MAX_REQUEST_BYTES + b'"}\n')
+            writer.write(json.dumps({'id': 2, 'op': 'list'}).encode() + b'\n')
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in range(2)]
+            writer.close()
+            return replies
+        finally:
+            await server.close()
+
+    error, listing = asyncio.run(run())
+    assert 'longer than' in error['error']
+    assert listing['id'] == 2 and '12-TET' in listing['scales']
+
+
+@pytest.mark.parametrize('spec', [{'frequencies': 'abc'}, {'cents': {}}])
+def test_definition_lists_are_checked(spec):
+    (header, _, _), = serve({'id': 1, 'scale': spec})
+    assert 'error' in header
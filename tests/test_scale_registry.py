@@ -0,0 +1,31 @@
+import threading
+import time
+
+from microtonal import Scale, ScaleRegistry, create_example_scales
+
+
+def test_scales_build_on_first_access_only():
+    scales = create_example_scales()
+    name = next(iter(scales))
+    assert not scales.is_built(name)
+    assert scales[name] is scales[name]
+    assert scales.is_built(name)
+
+
+def test_concurrent_access_builds_a_scale_once():
+    calls = []
+
+    def build():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return Scale().generate_equal_temperament(12)
+
+    scales = ScaleRegistry({'slow': build})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scales['slow'])) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(scale is results[0] for scale in results)
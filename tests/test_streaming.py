@@ -0,0 +1,111 @@
+import wave
+
+import numpy as np
+import pytest
+
+from streaming import NullSink, StreamingEngine, WavFileSink
+
+SAMPLE_RATE = 8000
+NOTES = [(220.0, 0.11), (330.0, 0.05), (247.5, 0.002), (440.0, 0.2), (110.0, 0.07)]
+
+
+def make_engine(notes=NOTES, blocksize=256, gap=0.01, waveform='sine'):
+    engine = StreamingEngine(SAMPLE_RATE, waveform, blocksize, gap=gap)
+    engine.enqueue(notes)
+    return engine
+
+
+def render(engine, chunk=None):
+    """Everything the engine produces, pulled in chunks of the given size (default: its blocks)."""
+    if chunk is None:
+        return np.concatenate([block.copy() for block in engine.blocks()])
+    parts = []
+    buffer = np.empty(chunk)
+    while True:
+        frames = engine.fill(buffer)
+        if frames == 0:
+            return np.concatenate(parts)
+        parts.append(buffer[:frames].copy())
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 256, 1000, 4096])
+def test_output_does_not_depend_on_block_boundaries(chunk):
+    # Same length and same samples; only the phase accumulation rounds differently per chunk
+    expected = render(make_engine())
+    audio = render(make_engine(), chunk)
+    assert audio.shape == expected.shape
+    assert np.abs(audio - expected).max() < 1e-9
+
+
+def test_null_sink_counts_every_sample():
+    expected = render(make_engine())
+    sink = NullSink()
+    sink.play(make_engine())
+    assert sink.samples == len(expected)
+    assert sink.blocks == -(-len(expected) // 256)
+    assert sink.peak == pytest.approx(np.abs(expected).max())
+
+
+def test_wav_file_sink_writes_the_render(tmp_path):
+    expected = render(make_engine())
+    path = tmp_path / 'scale.wav'
+    sink = WavFileSink(str(path))
+    sink.play(make_engine())
+    with wave.open(str(path)) as wav:
+        assert wav.getframerate() == SAMPLE_RATE
+        assert wav.getnframes() == sink.samples == len(expected)
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    assert np.abs(pcm / 32767 - expected).max() < 1e-4
+
+
+def test_fades_keep_note_boundaries_continuous():
+    # Without gaps consecutive notes crossfade: no step may exceed what a sine at these pitches can do
+    audio = render(make_engine(gap=0.0))
+    max_step = 2 * np.pi * 440.0 / SAMPLE_RATE
+    assert np.abs(np.diff(audio)).max() <= max_step * 1.01
+    assert audio[0] == 0.0
+    assert abs(audio[-1]) < 1e-3
+
+
+def test_save_and_restore_state_resume_bit_identically():
+    expected = render(make_engine(blocksize=128))
+    for split in (128 * 3, 128 * 10, 128 * 17):
+        engine = make_engine(blocksize=128)
+        head = np.empty(split)
+        engine.fill(head)
+        state = engine.save_state()
+        resumed = StreamingEngine(SAMPLE_RATE, 'sine', 128, gap=0.01)
+        resumed.restore_state(state)
+        resumed.enqueue(NOTES[state['admitted']:])
+        assert np.array_equal(np.concatenate([head, render(resumed)]), expected)
+
+
+def test_advance_matches_fill():
+    engine = make_engine()
+    skipped = engine.advance(1024)
+    filled = make_engine()
+    filled.fill(np.empty(1024))
+    assert skipped == 1024
+    assert engine.save_state() == filled.save_state()
+
+
+def test_finished_does_not_change_the_output():
+    expected = render(make_engine())
+    engine = make_engine()
+    parts = []
+    block = np.empty(256)
+    while not engine.finished:
+        assert not engine.finished
+        frames = engine.fill(block)
+        parts.append(block[:frames].copy())
+    assert np.array_equal(np.concatenate(parts), expected)
+    assert engine.finished
+
+
+def test_stop_fades_out_sounding_voices():
+    engine = make_engine([(220.0, 10.0)])
+    engine.fill(np.empty(1000))
+    engine.stop()
+    tail = render(engine)
+    assert 0 < len(tail) <= int(round(0.005 * SAMPLE_RATE))
+    assert engine.finished
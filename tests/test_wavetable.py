@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import render
+import wavetable
+
+SAMPLE_RATE = 44100
+# One second, so every integer frequency falls on an FFT bin
+T = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+# Fundamentals spread over the mip levels, up to levels that keep a single harmonic
+FREQUENCIES = [55, 440, 1500, 3000, 6000, 12000]
+
+
+def rms(samples):
+    return float(np.sqrt(np.mean(samples ** 2)))
+
+
+def render_both(frequency, waveform):
+    out = np.empty((1, len(T)))
+    direct = render.evaluate_notes(np.array([frequency], dtype=np.float64), T, waveform, out.copy())[0]
+    table = wavetable.evaluate_notes(np.array([frequency], dtype=np.float64), T, waveform, out, SAMPLE_RATE)[0]
+    return direct, table
+
+
+def fundamental(samples, frequency):
+    return 2 * np.abs(np.fft.rfft(samples)[frequency]) / len(samples)
+
+
+def test_frequencies_cover_the_mip_levels():
+    levels = wavetable.mip_levels(np.array(FREQUENCIES, dtype=np.float64), SAMPLE_RATE)
+    assert len(set(levels.tolist())) == len(FREQUENCIES)
+    top = wavetable.BASE_FREQUENCY * 2 ** (levels[-1] + 1)
+    assert (SAMPLE_RATE / 2) // top == 1
+
+
+@pytest.mark.parametrize('frequency', FREQUENCIES)
+def test_sine_level_matches_direct_on_every_mip_level(frequency):
+    direct, table = render_both(frequency, 'sine')
+    assert rms(table) == pytest.approx(rms(direct), rel=0.01)
+
+
+@pytest.mark.parametrize('waveform', ['sawtooth', 'square'])
+@pytest.mark.parametrize('frequency', FREQUENCIES)
+def test_band_limited_level_follows_direct(waveform, frequency):
+    direct, table = render_both(frequency, waveform)
+    # Only the harmonics above Nyquist are missing: the fundamental keeps its level,
+    # except that square tables are scaled down to the naive waveform's peak of 1
+    if waveform == 'sawtooth':
+        assert fundamental(table, frequency) == pytest.approx(fundamental(direct, frequency), rel=0.02)
+    else:
+        assert 0.99 < fundamental(table, frequency) < fundamental(direct, frequency)
+    assert rms(table) > 0.7 * rms(direct)